@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Headless frame-time benchmark for the animated background
+Loads bench/background-bench.html in headless Chromium once per mode
+(the canvas engine in script.js and the previous DOM version) and prints
+frame times plus the style, layout and script time Chromium spent
+"""
+
+import sys
+import json
+import argparse
+import contextlib
+from pathlib import Path
+
+BENCH_PAGE = Path(__file__).resolve().parent / "background-bench.html"
+
+MODES = ['dom', 'canvas']
+
+# Chromium's cumulative main-thread timers (seconds), from the DevTools protocol
+CDP_METRICS = ['RecalcStyleDuration', 'LayoutDuration', 'ScriptDuration', 'TaskDuration']
+
+def run_page(browser, page_path, query, seconds):
+    """
+    Open a benchmark page with the given query string, wait for its
+    window.benchResult and add Chromium's main-thread time per frame
+    """
+    page = browser.new_page(viewport={'width': 1280, 'height': 800})
+    session = page.context.new_cdp_session(page)
+    session.send('Performance.enable')
+
+    page.goto(f"{page_path.as_uri()}?{query}")
+    before = {metric['name']: metric['value'] for metric in session.send('Performance.getMetrics')['metrics']}
+    page.wait_for_function('window.benchResult !== undefined', timeout=(seconds + 30) * 1000)
+    after = {metric['name']: metric['value'] for metric in session.send('Performance.getMetrics')['metrics']}
+
+    result = page.evaluate('window.benchResult')
+    for name in CDP_METRICS:
+        result[name] = (after.get(name, 0) - before.get(name, 0)) * 1000 / max(result['frames'], 1)
+    page.close()
+    return result
+
+def run_mode(browser, mode, seconds, pointer):
+    """Run the page in one mode and return its result dict"""
+    return run_page(browser, BENCH_PAGE, f"mode={mode}&seconds={seconds}&pointer={int(pointer)}", seconds)
+
+def launch_chromium():
+    """
+    Context manager for a headless Chromium, or exit with install
+    instructions when Playwright is missing
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("This benchmark needs Playwright and Chromium:")
+        print("   pip install playwright && playwright install chromium")
+        sys.exit(1)
+
+    @contextlib.contextmanager
+    def browser():
+        with sync_playwright() as playwright:
+            chromium = playwright.chromium.launch()
+            try:
+                yield chromium
+            finally:
+                chromium.close()
+
+    return browser()
+
+def print_results(results):
+    """One row per mode: frame-time percentiles and per-frame main-thread cost"""
+    print(f"{'mode':<8}{'pointer':>8}{'nodes':>7}{'fps':>7}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'max':>8}{'dropped':>9}{'style':>8}{'layout':>8}{'script':>8}")
+    for result in results:
+        print(f"{result['mode']:<8}{'yes' if result['pointer'] else 'no':>8}{result['nodes']:>7}"
+              f"{result['fps']:>7.1f}{result['p50']:>8.2f}{result['p95']:>8.2f}{result['p99']:>8.2f}"
+              f"{result['max']:>8.2f}{result['dropped']:>9}{result['RecalcStyleDuration']:>8.3f}"
+              f"{result['LayoutDuration']:>8.3f}{result['ScriptDuration']:>8.3f}")
+    print("(frame times in ms; style/layout/script are main-thread ms per frame)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame times of the canvas and DOM backgrounds")
+    parser.add_argument('--seconds', type=int, default=10,
+                        help="Measured seconds per run, after a 1 s warm-up (default: 10)")
+    parser.add_argument('--pointer', action='store_true',
+                        help="Move the pointer every frame (exercises the mousemove handlers)")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES,
+                        help="Which implementations to run (default: both)")
+    parser.add_argument('--save', metavar='PATH', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    with launch_chromium() as browser:
+        results = [run_mode(browser, mode, args.seconds, args.pointer) for mode in args.modes]
+
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Echo Bridge manual builder
+Generates synthetic manuals, times every build stage separately and
+compares the results against a stored JSON baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import build_manual  # noqa: E402
+
+STAGES = [
+    'diagrams',
+    'markdown',
+    'search',
+    'fallback_markdown',
+    'buttons',
+    'template',
+    'write',
+]
+
+DEFAULT_CONFIG = {
+    'sections': 20,
+    'tables': 10,
+    'rows': 12,
+    'diagrams': 8,
+    'buttons': 2,
+    'seed': 1,
+}
+
+def generate_manual(sections, tables, rows, diagrams, seed=1):
+    """
+    Build synthetic manual markdown with the given number of sections,
+    tables (of `rows` rows each) and json diagram blocks, spread evenly
+    over the sections
+    """
+    rng = random.Random(seed)
+    lines = ["Synthetic manual for benchmarking the builder. It has **bold**, *italic*, "
+             "`code` and [links](https://lufs.audio).", ""]
+
+    for section in range(sections):
+        lines.append(f"## Section {section + 1}")
+        lines.append("")
+        lines.append(f"Paragraph for section {section + 1} with **bold text**, _emphasis_, "
+                     f"`inline code` and a link to https://lufs.audio/section/{section}.")
+        lines.append("")
+        lines.append("- First point with **bold**")
+        lines.append("- Second point with a [link](https://lufs.audio)")
+        lines.append("")
+
+        for table in range(tables * (section + 1) // sections - tables * section // sections):
+            lines.append(f"### Table {section + 1}.{table + 1}")
+            lines.append("")
+            lines.append("| CONTROL | DESCRIPTION | NOTES |")
+            lines.append("| ------- | ----------- | ----- |")
+            for row in range(rows):
+                lines.append(f"| KNOB {row + 1} | Parameter {row + 1} | "
+                             f"**UP** - High<br/>**DOWN** - Low ({rng.randint(0, 100)}%) |")
+            lines.append("")
+
+        for diagram in range(diagrams * (section + 1) // sections - diagrams * section // sections):
+            knobs = [round(rng.random(), 2) for _ in range(6)]
+            switches = [rng.choice([0.0, 0.5, 1.0]) for _ in range(3)]
+            lines.append(f"### Patch {section + 1}.{diagram + 1}")
+            lines.append("")
+            lines.append("```json")
+            lines.append(json.dumps({'name': f"Patch {section + 1}.{diagram + 1}",
+                                     'knobs': knobs, 'switches': switches}))
+            lines.append("```")
+            lines.append("")
+
+    return '\n'.join(lines)
+
+def prepare_workdir(workdir, config):
+    """Write the synthetic manual plus template, favicon, styles and button files"""
+    workdir = Path(workdir)
+    markdown = generate_manual(config['sections'], config['tables'], config['rows'],
+                               config['diagrams'], config['seed'])
+    (workdir / 'manual.md').write_text(markdown, encoding='utf-8')
+    for name in ('template.html', 'favicon.svg', 'styles.css'):
+        shutil.copy(REPO_DIR / name, workdir / name)
+
+    button_sources = sorted(REPO_DIR.glob('*button*.html'))
+    for i in range(config['buttons']):
+        source = button_sources[i % len(button_sources)]
+        shutil.copy(source, workdir / f"bench{i}-{source.name}")
+
+    return markdown
+
+def run_stages(markdown, renderer, cache):
+    """
+    Run every stage once, in build order. Returns {stage: (seconds_wall,
+    seconds_cpu, output_bytes)}.
+    """
+    results = {}
+
+    def timed(name, func, size):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        output = func()
+        results[name] = (time.perf_counter() - wall, time.process_time() - cpu, size(output))
+        return output
+
+    text_size = lambda output: len(output.encode('utf-8'))
+
+    patches = []
+    processed = timed('diagrams', lambda: build_manual.process_diagram_blocks(
+        markdown, cache, 1, renderer, patches=patches), text_size)
+    html_content = timed('markdown', lambda: build_manual.convert_markdown_to_html(processed),
+                         text_size)
+    html_content, index = timed('search', lambda: build_manual.build_search_index(html_content, patches),
+                                lambda output: len(json.dumps(output[1], separators=(',', ':'))))
+    timed('fallback_markdown', lambda: build_manual.simple_markdown_to_html(processed), text_size)
+    timed('buttons', build_manual.collect_button_content,
+          lambda output: sum(len(part.encode('utf-8')) for part in output))
+    page = timed('template', lambda: build_manual.prepare_shared_inputs()['page_template'].render(
+        {'MARKDOWN_CONTENT': html_content,
+         build_manual.SEARCH_SLOT: build_manual.search_index_html(index, 'inline', None)}), text_size)
+
+    output_path = Path('bench-output.html')
+    output_path.unlink(missing_ok=True)
+    timed('write', lambda: build_manual.write_if_changed(output_path, page),
+          lambda output: output_path.stat().st_size)
+
+    return results
+
+def peak_memory(markdown, renderer, cache):
+    """Peak traced memory of each stage, in bytes, from one traced run"""
+    peaks = {}
+    outputs = {}
+    output_path = Path('bench-output.html')
+    output_path.unlink(missing_ok=True)
+
+    patches = []
+    stage_calls = {
+        'diagrams': lambda: build_manual.process_diagram_blocks(markdown, cache, 1, renderer,
+                                                                patches=patches),
+        'markdown': lambda: build_manual.convert_markdown_to_html(outputs['diagrams']),
+        'search': lambda: build_manual.build_search_index(outputs['markdown'], patches),
+        'fallback_markdown': lambda: build_manual.simple_markdown_to_html(outputs['diagrams']),
+        'buttons': build_manual.collect_button_content,
+        'template': lambda: build_manual.prepare_shared_inputs()['page_template'].render(
+            {'MARKDOWN_CONTENT': outputs['search'][0],
+             build_manual.SEARCH_SLOT: build_manual.search_index_html(outputs['search'][1], 'inline', None)}),
+        'write': lambda: build_manual.write_if_changed(output_path, outputs['template']),
+    }
+    for name in STAGES:
+        tracemalloc.start()
+        outputs[name] = stage_calls[name]()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return peaks
+
+def run_benchmark(config, repeat, renderer, use_cache, verbose=False):
+    """
+    Benchmark the builder on a synthetic manual. Wall and CPU times are
+    medians over `repeat` runs; peak memory comes from one extra traced run.
+    """
+    cwd = os.getcwd()
+    with contextlib.ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix='eb-bench-'))
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        markdown = prepare_workdir(workdir, config)
+        os.chdir(workdir)
+        try:
+            cache = build_manual.DiagramCache(Path(workdir) / 'cache') if use_cache else None
+            if cache is not None:
+                # Fill the cache first so every timed run measures the warm path
+                build_manual.process_diagram_blocks(markdown, cache, 1, renderer)
+
+            runs = [run_stages(markdown, renderer, cache) for _ in range(repeat)]
+            peaks = peak_memory(markdown, renderer, cache)
+        finally:
+            os.chdir(cwd)
+
+    stages = {}
+    for name in STAGES:
+        stages[name] = {
+            'wall_ms': statistics.median(run[name][0] for run in runs) * 1000,
+            'cpu_ms': statistics.median(run[name][1] for run in runs) * 1000,
+            'peak_kb': peaks[name] / 1024,
+            'output_bytes': runs[-1][name][2],
+        }
+
+    return {
+        'config': dict(config, renderer=renderer, cache=use_cache, repeat=repeat),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': stages,
+    }
+
+def bench_fallback_parser(megabytes, repeat):
+    """
+    Time simple_markdown_to_html alone on a synthetic manual grown to the
+    given size, with long lines of unbalanced * _ [ ( ` mixed in
+    """
+    section = generate_manual(20, 10, 12, 0)
+    hostile = ' '.join(['**a *b _c [d](e `f'] * 2000)
+    chunk = section + '\n\n' + hostile + '\n\n'
+    markdown = chunk * max(1, int(megabytes * 1024 * 1024 / len(chunk)))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html_content = build_manual.simple_markdown_to_html(markdown)
+        times.append(time.perf_counter() - start)
+
+    seconds = statistics.median(times)
+    size_mb = len(markdown) / (1024 * 1024)
+    print(f"📊 Fallback parser on {size_mb:.1f} MB of markdown: {seconds * 1000:.0f} ms "
+          f"({size_mb / seconds:.1f} MB/s, {len(html_content):,} bytes of HTML)")
+
+def print_results(results):
+    """Print the per-stage table"""
+    config = results['config']
+    print(f"📊 Synthetic manual: {config['sections']} sections, {config['tables']} tables x "
+          f"{config['rows']} rows, {config['diagrams']} diagrams ({config['renderer']}"
+          f"{', cached' if config['cache'] else ''}), {config['buttons']} buttons")
+    print(f"   {'Stage':<20}{'wall ms':>10}{'cpu ms':>10}{'peak KB':>11}{'output bytes':>14}")
+    for name, stage in results['stages'].items():
+        print(f"   {name:<20}{stage['wall_ms']:>10.2f}{stage['cpu_ms']:>10.2f}"
+              f"{stage['peak_kb']:>11.1f}{stage['output_bytes']:>14,}")
+
+def compare_results(results, baseline, threshold, min_delta_ms):
+    """
+    Compare wall times with a baseline. A stage regresses when it is more
+    than `threshold` (fraction) and more than `min_delta_ms` slower.
+    Returns the list of regressed stages.
+    """
+    if baseline.get('config') != results['config']:
+        print("⚠️  Baseline was recorded with a different configuration:")
+        print(f"   baseline: {baseline.get('config')}")
+        print(f"   current:  {results['config']}")
+
+    regressions = []
+    print(f"🔍 Compared with baseline from {baseline.get('timestamp', 'unknown')} "
+          f"(threshold {threshold:.0%}, min {min_delta_ms} ms)")
+    print(f"   {'Stage':<20}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, stage in results['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if before is None:
+            print(f"   {name:<20}{'-':>10}{stage['wall_ms']:>10.2f}{'new':>9}")
+            continue
+
+        delta = stage['wall_ms'] - before['wall_ms']
+        change = delta / before['wall_ms'] if before['wall_ms'] else 0.0
+        regressed = change > threshold and delta > min_delta_ms
+        marker = " ❌" if regressed else ""
+        print(f"   {name:<20}{before['wall_ms']:>10.2f}{stage['wall_ms']:>10.2f}{change:>+9.0%}{marker}")
+        if regressed:
+            regressions.append(name)
+
+    return regressions
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the manual builder stage by stage")
+    parser.add_argument('--sections', type=int, default=DEFAULT_CONFIG['sections'])
+    parser.add_argument('--tables', type=int, default=DEFAULT_CONFIG['tables'])
+    parser.add_argument('--rows', type=int, default=DEFAULT_CONFIG['rows'],
+                        help="Rows per table")
+    parser.add_argument('--diagrams', type=int, default=DEFAULT_CONFIG['diagrams'])
+    parser.add_argument('--buttons', type=int, default=DEFAULT_CONFIG['buttons'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_CONFIG['seed'])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Timed runs per stage; the median is reported (default: 5)")
+    parser.add_argument('--renderer', choices=['png', 'agg', 'svg', 'client'], default='png')
+    parser.add_argument('--cache', action='store_true',
+                        help="Measure diagrams with a warm diagram cache")
+    parser.add_argument('--fallback-mb', type=float, metavar='MB',
+                        help="Only time the fallback Markdown parser on an input of this size")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Show the builder's own status output")
+    parser.add_argument('--save', metavar='PATH',
+                        help="Store the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="Compare with a JSON baseline and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown per stage as a fraction (default: 0.25)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many ms (default: 1.0)")
+    args = parser.parse_args()
+
+    if args.fallback_mb:
+        bench_fallback_parser(args.fallback_mb, args.repeat)
+        return
+
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    results = run_benchmark(config, args.repeat, args.renderer, args.cache, args.verbose)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare_results(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"❌ Regressed stages: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No stage regressed past the threshold")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Headless scroll benchmark for script.js
+Loads bench/scroll-bench.html on a synthetic manual with many table rows,
+once with the current script.js and once with legacy-script.js, and
+prints the registered listener counts and scroll frame times
+"""
+
+import json
+import argparse
+from pathlib import Path
+
+from bench_background import launch_chromium, run_page
+
+BENCH_PAGE = Path(__file__).resolve().parent / "scroll-bench.html"
+
+MODES = ['legacy', 'current']
+
+def print_results(results):
+    """One row per mode: listeners, scroll listeners and frame-time percentiles"""
+    print(f"{'mode':<9}{'rows':>6}{'listeners':>11}{'scroll':>8}{'passive':>9}{'fps':>7}{'p50':>8}"
+          f"{'p95':>8}{'p99':>8}{'max':>8}{'dropped':>9}{'style':>8}{'layout':>8}{'script':>8}")
+    for result in results:
+        print(f"{result['mode']:<9}{result['rows']:>6}{result['listeners']:>11}"
+              f"{result['scrollListeners']:>8}{result['passiveScrollListeners']:>9}{result['fps']:>7.1f}"
+              f"{result['p50']:>8.2f}{result['p95']:>8.2f}{result['p99']:>8.2f}{result['max']:>8.2f}"
+              f"{result['dropped']:>9}{result['RecalcStyleDuration']:>8.3f}"
+              f"{result['LayoutDuration']:>8.3f}{result['ScriptDuration']:>8.3f}")
+    print("(frame times in ms; style/layout/script are main-thread ms per frame)")
+    for result in results:
+        by_type = ', '.join(f"{name} {count}" for name, count in sorted(result['byType'].items()))
+        print(f"{result['mode']} listeners: {by_type}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare listener counts and scroll frame times")
+    parser.add_argument('--rows', type=int, default=2000,
+                        help="Table rows in the synthetic manual (default: 2000)")
+    parser.add_argument('--seconds', type=int, default=10,
+                        help="Measured seconds of scrolling per run, after a 1 s warm-up (default: 10)")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES,
+                        help="Which script versions to run (default: both)")
+    parser.add_argument('--save', metavar='PATH', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    with launch_chromium() as browser:
+        results = [run_page(browser, BENCH_PAGE, f"mode={mode}&rows={args.rows}&seconds={args.seconds}",
+                            args.seconds)
+                   for mode in args.modes]
+
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+if __name__ == "__main__":
+    main()
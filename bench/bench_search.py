@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Search index benchmark on a large synthetic manual
+Builds the index for a bench_manual.py manual (5,000 sections by default),
+prints its size raw and compressed plus the build time, then has Node run
+the script.js lookup one keystroke at a time and prints query latency
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+import build_manual  # noqa: E402
+from bench_manual import generate_manual  # noqa: E402
+
+def sample_queries(index, count, seed=1):
+    """
+    Queries a reader might type: single terms, "knob 7"-style pairs and
+    section titles, drawn from the index itself
+    """
+    rng = random.Random(seed)
+    titles = [doc[1] for doc in index['docs']]
+    queries = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            queries.append(rng.choice(index['terms']))
+        elif kind == 1:
+            queries.append(f"knob {rng.randint(1, 12)}")
+        else:
+            queries.append(rng.choice(titles).lower())
+    return queries
+
+def build_index(sections, tables, rows, diagrams):
+    """Convert a synthetic manual and time build_search_index on it"""
+    markdown = generate_manual(sections, tables, rows, diagrams)
+    patches = []
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        processed = build_manual.process_diagram_blocks(markdown, None, 1, 'svg', patches=patches)
+        html_content = build_manual.convert_markdown_to_html(processed)
+    start = time.perf_counter()
+    _, index = build_manual.build_search_index(html_content, patches)
+    return index, time.perf_counter() - start, len(html_content.encode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure search index size and query latency")
+    parser.add_argument('--sections', type=int, default=5000)
+    parser.add_argument('--tables', type=int, default=5000,
+                        help="Tables spread over the sections (default: one per section)")
+    parser.add_argument('--rows', type=int, default=12, help="Rows per table")
+    parser.add_argument('--diagrams', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=300,
+                        help="Queries to type, one keystroke at a time (default: 300)")
+    parser.add_argument('--save', metavar='PATH', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    index, seconds, html_bytes = build_index(args.sections, args.tables, args.rows, args.diagrams)
+    payload = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    result = {
+        'sections': args.sections,
+        'entries': len(index['docs']),
+        'terms': len(index['terms']),
+        'html_kb': html_bytes / 1024,
+        'index_kb': len(payload) / 1024,
+        'gzip_kb': len(gzip.compress(payload, 9)) / 1024,
+        'build_ms': seconds * 1000,
+    }
+    if build_manual.has_capability('brotli'):
+        brotli = build_manual.lazy_import('brotli')
+        result['brotli_kb'] = len(brotli.compress(payload, quality=11)) / 1024
+
+    print(f"📊 Synthetic manual: {args.sections} sections, {args.tables} tables x {args.rows} rows, "
+          f"{args.diagrams} diagrams ({result['html_kb']:.0f} KB of HTML)")
+    print(f"   🔎 Index: {result['entries']:,} entries, {result['terms']:,} terms, "
+          f"built in {result['build_ms']:.0f} ms")
+    print(f"   📦 Size: {result['index_kb']:.0f} KB raw, {result['gzip_kb']:.0f} KB gzip"
+          + (f", {result['brotli_kb']:.0f} KB brotli" if 'brotli_kb' in result else ""))
+
+    node = shutil.which('node')
+    if node is None:
+        print("   Query latency needs Node.js on the PATH - skipped")
+    else:
+        with tempfile.TemporaryDirectory(prefix='eb-search-') as workdir:
+            index_path = Path(workdir) / 'index.json'
+            queries_path = Path(workdir) / 'queries.json'
+            index_path.write_bytes(payload)
+            queries_path.write_text(json.dumps(sample_queries(index, args.queries)), encoding='utf-8')
+            output = subprocess.run([node, str(BENCH_DIR / 'search-bench.js'), str(index_path),
+                                     str(queries_path)], capture_output=True, text=True, check=True)
+        latency = json.loads(output.stdout)
+        result['latency'] = latency
+        print(f"   ⏱️ First use: {latency['parse_ms']:.1f} ms to parse the index")
+        print(f"   ⌨️ {latency['keystrokes']:,} keystrokes: p50 {latency['p50']:.3f} ms, "
+              f"p95 {latency['p95']:.3f} ms, p99 {latency['p99']:.3f} ms, max {latency['max']:.2f} ms")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+
+if __name__ == "__main__":
+    main()
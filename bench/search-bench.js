@@ -0,0 +1,48 @@
+// Query latency of the manual search, run by bench_search.py under Node.
+// Loads the search functions from script.js unchanged and types every
+// query one keystroke at a time, timing searchManual() per keystroke.
+// Usage: node search-bench.js <index.json> <queries.json>
+
+const fs = require('fs');
+const path = require('path');
+const { performance } = require('perf_hooks');
+
+const source = fs.readFileSync(path.join(__dirname, '..', 'script.js'), 'utf8');
+const start = source.indexOf('const SEARCH_RESULT_LIMIT');
+const end = source.indexOf('function initializeSearch');
+if (start === -1 || end === -1) {
+    console.error('Search functions not found in script.js');
+    process.exit(1);
+}
+const { createSearchIndex, searchManual } = new Function(
+    source.slice(start, end) + '\nreturn { createSearchIndex, searchManual };'
+)();
+
+const text = fs.readFileSync(process.argv[2], 'utf8');
+const queries = JSON.parse(fs.readFileSync(process.argv[3], 'utf8'));
+
+const parseStart = performance.now();
+const index = createSearchIndex(JSON.parse(text));
+const parseMs = performance.now() - parseStart;
+
+const times = [];
+let results = 0;
+for (const query of queries) {
+    for (let i = 1; i <= query.length; i++) {
+        const t0 = performance.now();
+        results += searchManual(index, query.slice(0, i)).length;
+        times.push(performance.now() - t0);
+    }
+}
+
+times.sort((a, b) => a - b);
+const percentile = p => times[Math.min(times.length - 1, Math.floor(times.length * p))];
+console.log(JSON.stringify({
+    parse_ms: parseMs,
+    keystrokes: times.length,
+    p50: percentile(0.5),
+    p95: percentile(0.95),
+    p99: percentile(0.99),
+    max: times[times.length - 1],
+    results: results
+}));
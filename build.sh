@@ -50,11 +50,6 @@ if ! python -c "import markdown" 2>/dev/null; then
     PACKAGES_NEEDED+=("markdown")
 fi
 
-# Check for beautifulsoup4
-if ! python -c "from bs4 import BeautifulSoup" 2>/dev/null; then
-    PACKAGES_NEEDED+=("beautifulsoup4")
-fi
-
 # Check for matplotlib
 if ! python -c "import matplotlib.pyplot" 2>/dev/null; then
     PACKAGES_NEEDED+=("matplotlib")
@@ -72,7 +67,7 @@ fi
 
 # Verify packages are working
 echo -e "${BLUE}🔍 Verifying package installation...${NC}"
-if python -c "import markdown; from bs4 import BeautifulSoup; import matplotlib.pyplot; print('✅ All packages imported successfully')" 2>/dev/null; then
+if python -c "import markdown; import matplotlib.pyplot; print('✅ All packages imported successfully')" 2>/dev/null; then
     echo -e "${GREEN}✅ Package verification successful${NC}"
 else
     echo -e "${RED}❌ Package verification failed${NC}"
@@ -87,7 +82,8 @@ echo "==============================="
 export PYTHONPATH="$PROJECT_DIR:$PYTHONPATH"
 
 # Run the build script
-if python "$PROJECT_DIR/build_manual.py"; then
+# --precompress writes .gz (and .br when brotli is installed) copies for the static host
+if python "$PROJECT_DIR/build_manual.py" --precompress; then
     echo "==============================="
     echo -e "${GREEN}🎉 Build completed successfully!${NC}"
     echo -e "${BLUE}📄 Generated: index.html${NC}"
@@ -97,6 +93,10 @@ if python "$PROJECT_DIR/build_manual.py"; then
         SIZE=$(wc -c < "$PROJECT_DIR/index.html")
         echo -e "${BLUE}📊 File size: $SIZE bytes${NC}"
     fi
+    if [ -f "$PROJECT_DIR/index.html.gz" ]; then
+        GZ_SIZE=$(wc -c < "$PROJECT_DIR/index.html.gz")
+        echo -e "${BLUE}🗜️  Gzipped: $GZ_SIZE bytes${NC}"
+    fi
 else
     echo -e "${RED}❌ Build failed${NC}"
     exit 1
@@ -4,46 +4,532 @@ Build script for Echo Bridge Manual
 Converts Markdown to styled HTML using template with button integration, favicon support, and diagram generation
 """
 
+import time
+_MODULE_START = time.perf_counter()
+
 import os
 import sys
 import re
 import json
+import html
 import base64
+import gzip
+import struct
+import string
+import hashlib
+import argparse
+import contextlib
+import filecmp
+import tempfile
+import threading
+import importlib
+import importlib.util
 from pathlib import Path
 from io import BytesIO
+from html.parser import HTMLParser
 import math
 
-try:
-    import markdown
-    from bs4 import BeautifulSoup
-    import matplotlib.pyplot as plt
-    import matplotlib.patches as patches
-    from matplotlib import rcParams
-    USE_ENHANCED_PARSING = True
-    print("✅ Using enhanced markdown parsing with full feature support")
-except ImportError:
-    USE_ENHANCED_PARSING = False
-    print("⚠️  Required packages not found. Install with:")
-    print("   pip install markdown beautifulsoup4 matplotlib")
-    print("   Falling back to basic parsing...")
-
-def create_pedal_diagram(patch_settings, patch_name="Patch"):
+# Optional dependencies are imported lazily, only when the stage that needs
+# them runs, so builds that never render a diagram never load matplotlib
+OPTIONAL_DEPENDENCIES = {
+    'markdown': 'markdown',
+    'matplotlib': 'matplotlib',
+    'PIL': 'pillow',
+    'brotli': 'brotli',
+    'fontTools': 'fonttools',
+}
+
+# Packages that only serve opt-in flags are reported only when one of
+# those flags is on
+FLAG_DEPENDENCIES = {
+    'PIL': ('--optimize-images', '--webp', '--hidpi'),
+    'brotli': ('--precompress', '--subset-fonts'),
+    'fontTools': ('--subset-fonts',),
+}
+
+_capabilities = {}
+IMPORT_TIMINGS = {}
+_MODULE_LOADED = time.perf_counter()
+
+def has_capability(module_name):
+    """
+    Check whether an optional dependency is installed without importing it
+    """
+    if module_name not in _capabilities:
+        try:
+            _capabilities[module_name] = importlib.util.find_spec(module_name) is not None
+        except (ImportError, ValueError):
+            _capabilities[module_name] = False
+    return _capabilities[module_name]
+
+def lazy_import(module_name):
+    """
+    Import an optional dependency on first use and record how long it took
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMINGS[module_name] = (time.perf_counter() - start) * 1000
+    return module
+
+def report_capabilities(flags=()):
+    """Print which optional features are available for the flags in use"""
+    missing = [module for module in OPTIONAL_DEPENDENCIES
+               if not has_capability(module)
+               and (module not in FLAG_DEPENDENCIES or set(FLAG_DEPENDENCIES[module]) & set(flags))]
+    if not missing:
+        print("✅ Using enhanced markdown parsing with full feature support")
+        return
+    
+    print("⚠️  Some optional packages were not found. Install with:")
+    print(f"   pip install {' '.join(OPTIONAL_DEPENDENCIES[module] for module in missing)}")
+    if 'markdown' in missing:
+        print("   Falling back to basic markdown parsing...")
+    if 'matplotlib' in missing:
+        print("   PNG diagrams unavailable - use --renderer svg")
+    if 'PIL' in missing:
+        print("   Diagram image optimization unavailable")
+    if 'brotli' in missing:
+        print("   Brotli unavailable - only .gz files and WOFF fonts are written")
+    if 'fontTools' in missing:
+        print("   Font subsetting unavailable")
+
+def report_timings(build_seconds=None):
+    """Print the startup report: module load, lazy imports and whether matplotlib loaded"""
+    print("⏱️  Startup timings")
+    print(f"   {'builder module':<28}{(_MODULE_LOADED - _MODULE_START) * 1000:>9.1f} ms")
+    for module_name, elapsed in IMPORT_TIMINGS.items():
+        print(f"   {'import ' + module_name:<28}{elapsed:>9.1f} ms")
+    if build_seconds is not None:
+        print(f"   {'build':<28}{build_seconds * 1000:>9.1f} ms")
+    loaded = 'yes' if 'matplotlib' in sys.modules else 'no'
+    print(f"   matplotlib loaded: {loaded}")
+
+class BuildTrace:
+    """
+    Timed spans of one build, kept as Chrome trace events so the JSON
+    can be opened in chrome://tracing or Perfetto. Spans use
+    perf_counter, which is system-wide on Linux and macOS, so diagram
+    renders timed in worker processes line up with the main process.
+    """
+    
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.stages = {}
+        self.diagrams = {}
+        self.cache_hits = []
+    
+    def add(self, name, category, start, duration, pid=None, **args):
+        """Record a finished span"""
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round((start - self.origin) * 1e6, 1),
+            'dur': round(duration * 1e6, 1),
+            'pid': pid or self.pid, 'tid': pid or self.pid,
+            'args': args,
+        })
+        if category == 'stage':
+            self.stages[name] = self.stages.get(name, 0.0) + duration * 1000
+        elif category == 'diagram':
+            self.diagrams[name] = duration * 1000
+    
+    def instant(self, name, category, **args):
+        """Record a point-in-time event such as a cache hit"""
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'i', 's': 'p',
+            'ts': round((time.perf_counter() - self.origin) * 1e6, 1),
+            'pid': self.pid, 'tid': self.pid, 'args': args,
+        })
+        if category == 'cache':
+            self.cache_hits.append(args.get('patch', name))
+    
+    @contextlib.contextmanager
+    def span(self, name, category='stage', **args):
+        """Time the body; callers can add to the yielded args dict"""
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, category, start, time.perf_counter() - start, **args)
+    
+    def summary(self):
+        """Per-stage and per-diagram durations in ms, plus cache hits"""
+        return {
+            'stages': {name: round(ms, 3) for name, ms in self.stages.items()},
+            'diagrams': {name: round(ms, 3) for name, ms in self.diagrams.items()},
+            'cache_hits': self.cache_hits,
+        }
+    
+    def write(self, path, **extra):
+        """Write the Chrome trace-event JSON with the summary under otherData"""
+        trace = {
+            'traceEvents': self.events,
+            'displayTimeUnit': 'ms',
+            'otherData': dict(self.summary(), **extra),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, indent=1)
+    
+    def report(self):
+        """Print the per-stage durations"""
+        print("📈 Stage timings")
+        for name, ms in self.stages.items():
+            print(f"   {name:<28}{ms:>9.1f} ms")
+        if self.diagrams:
+            slowest = max(self.diagrams, key=self.diagrams.get)
+            print(f"   {len(self.diagrams)} diagrams rendered, slowest: {slowest} "
+                  f"({self.diagrams[slowest]:.1f} ms)")
+        if self.cache_hits:
+            print(f"   {len(self.cache_hits)} diagrams from cache")
+
+_active_trace = None
+
+def start_trace():
+    """Start collecting spans for the builds that follow"""
+    global _active_trace
+    _active_trace = BuildTrace()
+    return _active_trace
+
+def stop_trace():
+    """Stop collecting spans and return the finished trace"""
+    global _active_trace
+    trace, _active_trace = _active_trace, None
+    return trace
+
+def trace_span(name, category='stage', **args):
+    """A span on the active trace, or a no-op when tracing is off"""
+    if _active_trace is None:
+        return contextlib.nullcontext(args)
+    return _active_trace.span(name, category, **args)
+
+def trace_event(name, category, **args):
+    """A point event on the active trace, if any"""
+    if _active_trace is not None:
+        _active_trace.instant(name, category, **args)
+
+# LUFS Color Palette (matching your CSS)
+LUFS_TEAL = '#78BEBA'
+LUFS_RED = '#D35233'
+LUFS_YELLOW = '#E7B225'
+LUFS_BLUE = '#2069af'
+LUFS_BLACK = '#111111'
+LUFS_WHITE = '#fbf9e2'
+LUFS_GRAY = '#c0c0c0'
+
+# Diagram output settings - bump DIAGRAM_RENDERER_VERSION whenever the drawing
+# code changes so that cached diagrams are re-rendered
+DIAGRAM_DPI = 120
+DIAGRAM_FIGSIZE = (6, 8)
+DIAGRAM_RENDERER_VERSION = 1
+
+# Pedal layout (diagram units, y pointing up) shared by all diagram renderers
+# Compact knob layout - 2 rows of 3
+KNOB_POSITIONS = [
+    (-70, 80), (0, 80), (70, 80),     # Top row
+    (-70, 20), (0, 20), (70, 20)      # Bottom row
+]
+KNOB_LABELS = ['REVERB', 'TREM SPD', 'TREM DEP',
+               'DLY TIME', 'DLY FB', 'DLY MIX']
+SWITCH_POSITIONS = [(-70, -40), (0, -40), (70, -40)]
+SWITCH_LABELS = ['REV MODE', 'TREM WAVE', 'MAKEUP']
+FOOTSWITCH_POSITIONS = [(-50, -120), (50, -120)]
+FOOTSWITCH_LABELS = ['REVERB', 'DELAY/TREM']
+
+# Diagram cache defaults
+DIAGRAM_CACHE_DIR = ".diagram-cache"
+DIAGRAM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DIAGRAM_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# Entries are named <key>.<format>: rendered PNGs plus derived WebP variants
+DIAGRAM_CACHE_SUFFIXES = ('.png', '.webp')
+
+def diagram_style_signature():
+    """
+    Return the style constants that affect how a diagram looks
+    """
+    return {
+        'palette': [LUFS_TEAL, LUFS_RED, LUFS_YELLOW, LUFS_BLUE,
+                    LUFS_BLACK, LUFS_WHITE, LUFS_GRAY],
+        'dpi': DIAGRAM_DPI,
+        'figsize': list(DIAGRAM_FIGSIZE),
+        'version': DIAGRAM_RENDERER_VERSION,
+    }
+
+class DiagramCache:
+    """
+    Content-addressed on-disk cache for rendered pedal diagrams.
+    Entries are evicted when older than max_age or, oldest first,
+    when the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir=DIAGRAM_CACHE_DIR,
+                 max_bytes=DIAGRAM_CACHE_MAX_BYTES, max_age=DIAGRAM_CACHE_MAX_AGE):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(patch_settings, patch_name, renderer='png'):
+        """Hash the normalized diagram config together with the style constants"""
+        payload = {
+            'name': patch_name,
+            'renderer': renderer,
+            'settings': [float(value) for value in patch_settings or []],
+            'style': diagram_style_signature(),
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def derived_key(source, transform):
+        """Key for an output computed from other cached bytes by a named transform"""
+        digest = hashlib.sha256(source)
+        digest.update(b'\0' + transform.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key, suffix='png'):
+        return self.cache_dir / f"{key}.{suffix}"
+
+    def get(self, key, suffix='png'):
+        """Return cached image bytes stored with the given format suffix, or None on a miss"""
+        path = self._path(key, suffix)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                data = None
+            else:
+                data = path.read_bytes()
+        except OSError:
+            data = None
+        
+        if data is None:
+            self.misses += 1
+            return None
+        
+        # Refresh mtime so eviction drops the least recently used entries;
+        # a read-only cache still serves hits
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key, data, suffix='png'):
+        """Store image bytes atomically, named with their format's suffix"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key, suffix))
+        except OSError as e:
+            print(f"Warning: Could not write diagram cache entry: {e}")
+
+    def prune(self):
+        """Evict expired entries, then the oldest ones until under max_bytes"""
+        if not self.cache_dir.is_dir():
+            return
+        
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix not in DIAGRAM_CACHE_SUFFIXES:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        """Remove every cached diagram"""
+        if not self.cache_dir.is_dir():
+            return
+        for path in self.cache_dir.iterdir():
+            if path.suffix in DIAGRAM_CACHE_SUFFIXES + ('.tmp',):
+                path.unlink(missing_ok=True)
+
+ASSET_MANIFEST_NAME = "assets-manifest.json"
+
+ASSET_MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+class DiagramAssets:
+    """
+    Writes diagrams as separate files named by content hash, instead of
+    inlining them, and records every emitted file in a JSON manifest
+    """
+
+    def __init__(self, assets_dir, output_file="index.html", manifest_name=ASSET_MANIFEST_NAME):
+        self.assets_dir = Path(assets_dir)
+        self.manifest_name = manifest_name
+        output_dir = Path(output_file).resolve().parent
+        self.url_prefix = Path(os.path.relpath(self.assets_dir.resolve(), output_dir)).as_posix()
+        self.assets = {}
+
+    def add(self, data, extension, patch_name):
+        """Write the asset if it is new and return (url, width, height)"""
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"diagram-{digest[:16]}.{extension}"
+        self._store(filename, data)
+        
+        width, height = image_dimensions(data, extension)
+        entry = self.assets.setdefault(filename, {
+            'file': filename,
+            'sha256': digest,
+            'bytes': len(data),
+            'type': ASSET_MIME_TYPES[extension],
+            'width': width,
+            'height': height,
+            'patches': [],
+        })
+        if patch_name not in entry['patches']:
+            entry['patches'].append(patch_name)
+        
+        url = filename if self.url_prefix == '.' else f"{self.url_prefix}/{filename}"
+        return url, width, height
+
+    def _store(self, filename, data):
+        """Write a new asset file atomically; existing hashes are already correct"""
+        path = self.assets_dir / filename
+        if path.exists():
+            return
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.assets_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+    def picture_html(self, variants, patch_name):
+        """
+        Write every variant and return a <picture> with WebP and PNG
+        srcsets. variants maps a format to {scale: bytes}.
+        """
+        srcsets = {}
+        for extension, by_scale in variants.items():
+            entries = []
+            for scale, data in sorted(by_scale.items()):
+                url, width, height = self.add(data, extension, patch_name)
+                if scale == 1 and extension == 'png':
+                    src, size = url, (width, height)
+                entries.append(f"{url} {scale}x")
+            srcsets[extension] = ', '.join(entries)
+        
+        source = (f'\n        <source type="image/webp" srcset="{srcsets["webp"]}">'
+                  if 'webp' in srcsets else '')
+        return f'''<div class="pedal-diagram-container">
+    <picture>{source}
+        <img src="{src}" srcset="{srcsets['png']}" alt="{patch_name} Diagram" class="pedal-diagram" loading="lazy" decoding="async" width="{size[0]}" height="{size[1]}" />
+    </picture>
+</div>'''
+
+    def image_html(self, data, extension, patch_name):
+        """Write the asset and return the lazy-loading diagram markup"""
+        url, width, height = self.add(data, extension, patch_name)
+        return f'''<div class="pedal-diagram-container">
+    <img src="{url}" alt="{patch_name} Diagram" class="pedal-diagram" loading="lazy" decoding="async" width="{width}" height="{height}" />
+</div>'''
+
+    def write_manifest(self):
+        """Write the manifest of every asset referenced by this build"""
+        manifest = {'assets': [self.assets[name] for name in sorted(self.assets)]}
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.assets_dir / self.manifest_name
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+        return manifest_path
+
+def image_dimensions(data, extension):
+    """Pixel size of a rendered PNG or SVG diagram"""
+    if extension == 'png':
+        # Width and height are the first two fields of the IHDR chunk
+        return struct.unpack('>II', data[16:24])
+    
+    if extension == 'webp':
+        chunk = data[12:16]
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        return None, None
+    
+    match = re.search(rb'<svg[^>]*?\swidth="([\d.]+)"[^>]*?\sheight="([\d.]+)"', data)
+    if match:
+        return round(float(match.group(1))), round(float(match.group(2)))
+    return None, None
+
+def create_pedal_diagram(patch_settings, patch_name="Patch", cache=None):
     """Generate pedal diagram with specific patch settings - LUFS styled and compact"""
     
+    png_data = None
+    if cache is not None:
+        key = cache.key(patch_settings, patch_name)
+        png_data = cache.get(key)
+    
+    if png_data is None:
+        png_data = render_pedal_diagram(patch_settings, patch_name)
+        if cache is not None:
+            cache.put(key, png_data)
+    
+    return diagram_image_html(png_data, patch_name)
+
+# Placeholder for diagram image data in streaming builds; the streaming
+# writer replaces it with the base64 encoding of the PNG
+DIAGRAM_PAYLOAD_PATTERN = re.compile(r'@@pedal-diagram-data:\d+@@')
+
+def diagram_image_html(png_data, patch_name, payloads=None):
+    """
+    Wrap rendered PNG bytes in the diagram container markup. With a payloads
+    dict the image data is left out and stored under a placeholder token.
+    """
+    if payloads is not None:
+        encoded = f"@@pedal-diagram-data:{len(payloads)}@@"
+        payloads[encoded] = png_data
+    else:
+        encoded = base64.b64encode(png_data).decode('utf-8')
+    
+    # Return with CSS styling that matches your site
+    return f'''<div class="pedal-diagram-container">
+    <img src="data:image/png;base64,{encoded}" alt="{patch_name} Diagram" class="pedal-diagram" />
+</div>'''
+
+def render_pedal_diagram(patch_settings, patch_name="Patch", dpi=DIAGRAM_DPI):
+    """Draw the pedal diagram with matplotlib and return the PNG bytes"""
+    
+    plt = lazy_import('matplotlib.pyplot')
+    patches = lazy_import('matplotlib.patches')
+    
     # Set matplotlib style to match LUFS aesthetic
     plt.style.use('dark_background')
     
-    # LUFS Color Palette (matching your CSS)
-    LUFS_TEAL = '#78BEBA'
-    LUFS_RED = '#D35233'
-    LUFS_YELLOW = '#E7B225'
-    LUFS_BLUE = '#2069af'
-    LUFS_BLACK = '#111111'
-    LUFS_WHITE = '#fbf9e2'
-    LUFS_GRAY = '#c0c0c0'
-    
     # Create a much smaller, more compact figure
-    fig, ax = plt.subplots(1, 1, figsize=(6, 8))
+    fig, ax = plt.subplots(1, 1, figsize=DIAGRAM_FIGSIZE)
     ax.set_xlim(-150, 150)
     ax.set_ylim(-200, 200)
     ax.set_aspect('equal')
@@ -75,17 +561,8 @@ def create_pedal_diagram(patch_settings, patch_name="Patch"):
            fontsize=14, weight='bold', color=LUFS_WHITE,
            fontfamily='monospace')
     
-    # Compact knob layout - 2 rows of 3
-    knob_positions = [
-        (-70, 80), (0, 80), (70, 80),     # Top row
-        (-70, 20), (0, 20), (70, 20)      # Bottom row
-    ]
-    
-    knob_labels = ['REVERB', 'TREM SPD', 'TREM DEP',
-                   'DLY TIME', 'DLY FB', 'DLY MIX']
-    
     # Draw knobs with LUFS styling
-    for i, (x, y) in enumerate(knob_positions):
+    for i, (x, y) in enumerate(KNOB_POSITIONS):
         # Knob body - flat design with LUFS colors
         knob = patches.Circle((x, y), 20, facecolor=LUFS_BLACK,
                             edgecolor=LUFS_WHITE, linewidth=2)
@@ -115,18 +592,14 @@ def create_pedal_diagram(patch_settings, patch_name="Patch"):
                    fontfamily='monospace')
         
         # Label - better positioning and smaller text
-        ax.text(x, y-30, knob_labels[i], ha='center', va='center',
+        ax.text(x, y-30, KNOB_LABELS[i], ha='center', va='center',
                fontsize=8, weight='bold', color=LUFS_WHITE,
                fontfamily='monospace')
     
-    # Compact switch layout
-    switch_positions = [(-70, -40), (0, -40), (70, -40)]
-    switch_labels = ['REV MODE', 'TREM WAVE', 'MAKEUP']
-    
     # Get switch settings
     switch_settings = patch_settings[6:9] if patch_settings and len(patch_settings) > 8 else [0.5, 0.5, 0.5]
     
-    for i, (x, y) in enumerate(switch_positions):
+    for i, (x, y) in enumerate(SWITCH_POSITIONS):
         # Switch body - flat retro design
         switch = patches.Rectangle((x-12, y-8), 24, 16, 
                                  facecolor=LUFS_GRAY, edgecolor=LUFS_BLACK, linewidth=2)
@@ -147,15 +620,12 @@ def create_pedal_diagram(patch_settings, patch_name="Patch"):
                color=indicator_color, linewidth=3)
         
         # Label - better positioning
-        ax.text(x, y-25, switch_labels[i], ha='center', va='center',
+        ax.text(x, y-25, SWITCH_LABELS[i], ha='center', va='center',
                fontsize=7, weight='bold', color=LUFS_WHITE,
                fontfamily='monospace')
     
     # Compact footswitches
-    footswitch_positions = [(-50, -120), (50, -120)]
-    footswitch_labels = ['REVERB', 'DELAY/TREM']
-    
-    for i, (x, y) in enumerate(footswitch_positions):
+    for i, (x, y) in enumerate(FOOTSWITCH_POSITIONS):
         # Footswitch body - flat design
         footswitch = patches.Circle((x, y), 18, facecolor=LUFS_BLACK,
                                   edgecolor=LUFS_WHITE, linewidth=2)
@@ -173,7 +643,7 @@ def create_pedal_diagram(patch_settings, patch_name="Patch"):
         ax.add_patch(led)
         
         # Label
-        ax.text(x, y-35, footswitch_labels[i], ha='center', va='center',
+        ax.text(x, y-35, FOOTSWITCH_LABELS[i], ha='center', va='center',
                fontsize=8, weight='bold', color=LUFS_WHITE,
                fontfamily='monospace')
     
@@ -184,438 +654,2836 @@ def create_pedal_diagram(patch_settings, patch_name="Patch"):
     
     # Convert to base64 with better compression
     buf = BytesIO()
-    fig.savefig(buf, format='png', dpi=120, bbox_inches='tight', 
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', 
                facecolor=LUFS_BLACK, edgecolor='none',
                pad_inches=0.1)
     plt.close(fig)
     
-    encoded = base64.b64encode(buf.getvalue()).decode('utf-8')
-    
-    # Return with CSS styling that matches your site
-    return f'''<div class="pedal-diagram-container">
-    <img src="data:image/png;base64,{encoded}" alt="{patch_name} Diagram" class="pedal-diagram" />
-</div>'''
+    return buf.getvalue()
 
-def process_diagram_blocks(markdown_content):
-    """
-    Process diagram code blocks in markdown and replace them with generated diagrams
-    """
-    if not USE_ENHANCED_PARSING:
-        print("⚠️  Diagram generation requires matplotlib. Skipping diagrams.")
-        return markdown_content
-    
-    # Pattern to match json code blocks
-    pattern = r'```json\s*\n(.*?)\n```'
+def render_pedal_diagram_2x(patch_settings, patch_name="Patch"):
+    """The matplotlib diagram at twice DIAGRAM_DPI, for high-density screens"""
+    return render_pedal_diagram(patch_settings, patch_name, dpi=DIAGRAM_DPI * 2)
 
-    # The regex breakdown:
-    # ```json - matches the opening code fence with json language
-    # \s*\n - matches optional whitespace and newline
-    # (.*?) - captures the JSON content (non-greedy)
-    # \n``` - matches newline and closing code fence
-    
-    def replace_diagram(match):
-        try:
-            config_text = match.group(1).strip()
-            config = json.loads(config_text)
-            
-            # Check if this is a diagram config
-            if 'name' in config and 'knobs' in config:
-                patch_name = config.get('name', 'Patch')
-                knob_settings = config.get('knobs', [0.5] * 6)
-                switch_settings = config.get('switches', [0.5] * 3)
-                
-                all_settings = knob_settings + switch_settings
-                diagram_html = create_pedal_diagram(all_settings, patch_name)
-                
-                print(f"✅ Generated diagram for: {patch_name}")
-                return diagram_html
-            else:
-                return match.group(0)
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ Error parsing diagram config: {e}")
-            return f'<p><em>Error: Invalid diagram configuration - {e}</em></p>'
-        except Exception as e:
-            print(f"❌ Error generating diagram: {e}")
-            return f'<p><em>Error: Could not generate diagram - {e}</em></p>'
-    
-    processed_content = re.sub(pattern, replace_diagram, markdown_content, flags=re.DOTALL)
-    return processed_content
+# Image post-processing for raster diagrams. The drawings use a handful of
+# flat colours, so an indexed palette loses almost nothing.
+DIAGRAM_PALETTE_COLORS = 64
 
-def extract_button_content(button_file):
-    """
-    Extract button content AND styles from a button HTML file
-    Returns a tuple of (button_html, button_styles)
-    """
-    try:
-        with open(button_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        button_html = ""
-        button_styles = ""
-        
-        if USE_ENHANCED_PARSING:
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            button = soup.find('a', class_='webring-button')
-            if button:
-                button_html = str(button)
-            
-            style_tags = soup.find_all('style')
-            for style in style_tags:
-                button_styles += f"\n/* Styles from {button_file.name} */\n"
-                button_styles += style.get_text()
-            
-            if soup.head:
-                head_styles = soup.head.find_all('style')
-                for style in head_styles:
-                    if style not in style_tags:
-                        button_styles += f"\n/* Additional styles from {button_file.name} */\n"
-                        button_styles += style.get_text()
-        else:
-            pattern = r'<a[^>]*class=["\']webring-button["\'][^>]*>.*?</a>'
-            match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-            if match:
-                button_html = match.group(0)
-            
-            style_pattern = r'<style[^>]*>(.*?)</style>'
-            style_matches = re.findall(style_pattern, content, re.DOTALL | re.IGNORECASE)
-            for style_content in style_matches:
-                button_styles += f"\n/* Styles from {button_file.name} */\n"
-                button_styles += style_content
-        
-        if not button_html:
-            print(f"Warning: No webring-button found in {button_file}")
-        
-        return button_html, button_styles
-            
-    except Exception as e:
-        print(f"Warning: Could not read {button_file}: {e}")
-        return "", ""
+def quantize_png(png_data, colors=DIAGRAM_PALETTE_COLORS):
+    """Re-encode a truecolor PNG as an indexed-palette PNG with maximum compression"""
+    Image = lazy_import('PIL.Image')
+    with Image.open(BytesIO(png_data)) as image:
+        indexed = image.convert('RGB').quantize(
+            colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+        )
+    buf = BytesIO()
+    indexed.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+def encode_webp(png_data):
+    """Lossless WebP copy of a PNG"""
+    Image = lazy_import('PIL.Image')
+    with Image.open(BytesIO(png_data)) as image:
+        buf = BytesIO()
+        image.save(buf, format='WEBP', lossless=True, method=6)
+    return buf.getvalue()
 
-def collect_button_content():
+def pixel_difference(reference_data, candidate_data):
+    """(max, mean) absolute channel difference between two images of the same size"""
+    Image = lazy_import('PIL.Image')
+    ImageChops = lazy_import('PIL.ImageChops')
+    ImageStat = lazy_import('PIL.ImageStat')
+    with Image.open(BytesIO(reference_data)) as reference, Image.open(BytesIO(candidate_data)) as candidate:
+        difference = ImageChops.difference(reference.convert('RGB'), candidate.convert('RGB'))
+    stat = ImageStat.Stat(difference)
+    return max(high for _, high in difference.getextrema()), sum(stat.mean) / len(stat.mean)
+
+class DiagramImages:
     """
-    Collect all button HTML files and combine their content and styles
-    Returns a tuple of (combined_html, combined_styles)
+    Post-processing for rendered raster diagrams: palette quantization,
+    optional lossless WebP copies and 2x variants. Every variant is checked
+    against the unprocessed render at its scale and listed in a size report.
     """
-    button_files = []
     
-    for file_path in Path('.').glob('*button*.html'):
-        if file_path.name not in ['index.html', 'template.html']:
-            button_files.append(file_path)
-    
-    if not button_files:
-        print("No button HTML files found (looking for *button*.html)")
-        return "", ""
+    def __init__(self, quantize=True, colors=DIAGRAM_PALETTE_COLORS, webp=False, hidpi=False,
+                 cache=None):
+        self.quantize = quantize
+        self.colors = colors
+        self.webp = webp
+        self.hidpi = hidpi
+        self.cache = cache
+        self.rows = []
     
-    print(f"Found button files: {[f.name for f in button_files]}")
+    @property
+    def scales(self):
+        return (1, 2) if self.hidpi else (1,)
     
-    all_buttons = []
-    all_styles = []
+    def signature(self):
+        """Everything that changes the processed output"""
+        return {'quantize': self.quantize, 'colors': self.colors,
+                'webp': self.webp, 'hidpi': self.hidpi}
     
-    for button_file in sorted(button_files):
-        button_html, button_styles = extract_button_content(button_file)
-        if button_html:
-            all_buttons.append(button_html)
-        if button_styles:
-            all_styles.append(button_styles)
+    def _derived(self, source, transform, compute, suffix='png'):
+        if self.cache is None:
+            return compute(source)
+        key = DiagramCache.derived_key(source, transform)
+        data = self.cache.get(key, suffix)
+        if data is None:
+            data = compute(source)
+            self.cache.put(key, data, suffix)
+        return data
     
-    combined_html = '\n                '.join(all_buttons)
-    combined_styles = '\n'.join(all_styles)
+    def process(self, renders, patch_name):
+        """
+        Turn {scale: raw PNG} into {format: {scale: bytes}} and add each
+        variant to the report
+        """
+        variants = {'png': {}}
+        for scale, png_data in sorted(renders.items()):
+            output = png_data
+            if self.quantize:
+                output = self._derived(png_data, f'quantize-{self.colors}',
+                                       lambda data: quantize_png(data, self.colors))
+            variants['png'][scale] = output
+            self._report(patch_name, f'{scale}x png', png_data, output)
+            if self.webp:
+                webp_data = self._derived(output, 'webp-lossless', encode_webp, 'webp')
+                variants.setdefault('webp', {})[scale] = webp_data
+                self._report(patch_name, f'{scale}x webp', png_data, webp_data)
+        return variants
     
-    return combined_html, combined_styles
-
-def get_favicon_svg(favicon_file="favicon.svg"):
-    """
-    Load and prepare favicon SVG for insertion into template
-    """
-    if not Path(favicon_file).exists():
-        print(f"Warning: {favicon_file} not found - using fallback text logo")
-        return "LUFS"
+    def _report(self, patch_name, variant, original, output):
+        max_diff, mean_diff = pixel_difference(original, output)
+        self.rows.append((patch_name, variant, len(original), len(output), max_diff, mean_diff))
     
-    try:
-        with open(favicon_file, 'r', encoding='utf-8') as f:
-            favicon_svg = f.read()
-        
-        favicon_svg = re.sub(r'<\?xml[^>]*\?>', '', favicon_svg).strip()
-        
-        if 'viewBox' not in favicon_svg and 'svg' in favicon_svg:
-            width_match = re.search(r'width=["\']([^"\']+)["\']', favicon_svg)
-            height_match = re.search(r'height=["\']([^"\']+)["\']', favicon_svg)
-            
-            if width_match and height_match:
-                width = width_match.group(1)
-                height = height_match.group(1)
-                width = re.sub(r'[a-zA-Z%]+', '', width)
-                height = re.sub(r'[a-zA-Z%]+', '', height)
-                viewbox = f'viewBox="0 0 {width} {height}"'
-                favicon_svg = re.sub(r'<svg([^>]*)', f'<svg {viewbox}\\1', favicon_svg)
-        
-        return favicon_svg
-        
-    except Exception as e:
-        print(f"Warning: Could not process favicon: {e}")
-        return "LUFS"
+    def report(self, max_mean_difference=1.0):
+        """Print sizes against the unprocessed renders and the pixel-diff check"""
+        if not self.rows:
+            return
+        print("🖼️ Diagram images (size and pixel difference vs. the unprocessed render)")
+        print(f"   {'Patch':<22}{'variant':<10}{'original':>10}{'output':>10}{'change':>8}"
+              f"{'max diff':>10}{'mean diff':>11}")
+        totals = {}
+        for patch_name, variant, original, output, max_diff, mean_diff in self.rows:
+            flag = " ⚠️" if mean_diff > max_mean_difference else ""
+            print(f"   {patch_name[:21]:<22}{variant:<10}{original:>10,}{output:>10,}"
+                  f"{output / original - 1:>+8.0%}{max_diff:>10}{mean_diff:>11.2f}{flag}")
+            total = totals.setdefault(variant, [0, 0])
+            total[0] += original
+            total[1] += output
+        for variant, (original, output) in totals.items():
+            print(f"   {'total':<22}{variant:<10}{original:>10,}{output:>10,}{output / original - 1:>+8.0%}")
 
-def convert_markdown_to_html(markdown_content):
-    """
-    Convert markdown to HTML using the best available method
-    """
-    if USE_ENHANCED_PARSING:
-        md = markdown.Markdown(extensions=[
-            'tables',
-            'fenced_code',
-            'codehilite',
-            'toc',
-            'nl2br',
-            'attr_list',
-            'def_list',
-            'footnotes',
-            'md_in_html'
-        ])
-        return md.convert(markdown_content)
-    else:
-        return simple_markdown_to_html(markdown_content)
+# Static chassis for the Agg overlay renderer, drawn once per process
+_AGG_CHASSIS = None
 
-def simple_markdown_to_html(markdown_text):
+def _agg_chassis():
     """
-    Enhanced fallback markdown parser using only built-in Python libraries
+    Draw everything that is identical in every diagram onto an Agg canvas
+    (no pyplot state machine) and keep the pixels for reuse. The per-patch
+    artists are created once as animated artists and updated for each patch.
     """
-    import html
+    global _AGG_CHASSIS
+    if _AGG_CHASSIS is not None:
+        return _AGG_CHASSIS
     
-    lines = markdown_text.split('\n')
-    html_lines = []
-    in_table = False
+    patches = lazy_import('matplotlib.patches')
+    Figure = lazy_import('matplotlib.figure').Figure
+    FigureCanvasAgg = lazy_import('matplotlib.backends.backend_agg').FigureCanvasAgg
     
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if not line:
-            if not in_table:
-                html_lines.append('')
-            i += 1
-            continue
-        
-        # Headers
-        if line.startswith('# '):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            html_lines.append(f'<h1>{html.escape(line[2:])}</h1>')
-        elif line.startswith('## '):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            html_lines.append(f'<h2>{html.escape(line[3:])}</h2>')
-        elif line.startswith('### '):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            html_lines.append(f'<h3>{html.escape(line[4:])}</h3>')
-        elif line.startswith('#### '):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            html_lines.append(f'<h4>{html.escape(line[5:])}</h4>')
-        
-        # Tables
-        elif '|' in line and not in_table:
-            in_table = True
-            table_headers = [cell.strip() for cell in line.split('|')[1:-1]]
-            html_lines.append('<table>')
-            html_lines.append('<thead>')
-            html_lines.append('<tr>')
-            for header in table_headers:
-                html_lines.append(f'<th>{html.escape(header)}</th>')
-            html_lines.append('</tr>')
-            html_lines.append('</thead>')
-            html_lines.append('<tbody>')
-            
-            i += 1
-            if i < len(lines) and '---' in lines[i]:
-                i += 1
-                continue
-        
-        elif '|' in line and in_table:
-            cells = [cell.strip() for cell in line.split('|')[1:-1]]
-            html_lines.append('<tr>')
-            for cell in cells:
-                formatted_cell = process_inline_formatting(cell)
-                html_lines.append(f'<td>{formatted_cell}</td>')
-            html_lines.append('</tr>')
-        
-        elif in_table and '|' not in line:
-            if line.startswith('#'):
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-                if line.startswith('#### '):
-                    html_lines.append(f'<h4>{html.escape(line[5:])}</h4>')
-                elif line.startswith('### '):
-                    html_lines.append(f'<h3>{html.escape(line[4:])}</h3>')
-                elif line.startswith('## '):
-                    html_lines.append(f'<h2>{html.escape(line[3:])}</h2>')
-                elif line.startswith('# '):
-                    html_lines.append(f'<h1>{html.escape(line[2:])}</h1>')
-            else:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-                continue
-        
-        # Lists
-        elif line.startswith('* ') or line.startswith('- '):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            
-            if i == 0 or not (lines[i-1].strip().startswith('* ') or lines[i-1].strip().startswith('- ')):
-                html_lines.append('<ul>')
-            
-            list_content = process_inline_formatting(line[2:])
-            html_lines.append(f'<li>{list_content}</li>')
-            
-            if i == len(lines) - 1 or not (i + 1 < len(lines) and (lines[i+1].strip().startswith('* ') or lines[i+1].strip().startswith('- '))):
-                html_lines.append('</ul>')
-        
-        elif re.match(r'^\d+\. ', line):
-            if in_table:
-                html_lines.append('</tbody>')
-                html_lines.append('</table>')
-                in_table = False
-            
-            if i == 0 or not re.match(r'^\d+\. ', lines[i-1].strip()):
-                html_lines.append('<ol>')
-            
-            list_content = process_inline_formatting(re.sub(r'^\d+\. ', '', line))
-            html_lines.append(f'<li>{list_content}</li>')
-            
-            if i == len(lines) - 1 or not (i + 1 < len(lines) and re.match(r'^\d+\. ', lines[i+1].strip())):
-                html_lines.append('</ol>')
-        
-        elif not in_table:
-            formatted_line = process_inline_formatting(line)
-            html_lines.append(f'<p>{formatted_line}</p>')
-        
-        i += 1
+    fig = Figure(figsize=DIAGRAM_FIGSIZE, dpi=DIAGRAM_DPI, facecolor=LUFS_BLACK)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlim(-150, 150)
+    ax.set_ylim(-200, 200)
+    ax.set_aspect('equal')
+    ax.axis('off')
+    ax.set_facecolor(LUFS_BLACK)
     
-    if in_table:
-        html_lines.append('</tbody>')
-        html_lines.append('</table>')
+    text_style = dict(ha='center', va='center', weight='bold', fontfamily='monospace')
     
-    return '\n'.join(html_lines)
-
-def process_inline_formatting(text):
-    """
-    Process inline markdown formatting
-    """
-    import html
+    ax.add_patch(patches.Rectangle((-140, -190), 280, 380, facecolor=LUFS_BLACK,
+                                   edgecolor=LUFS_TEAL, linewidth=3))
+    ax.add_patch(patches.Rectangle((-140, 187), 280, 3, facecolor=LUFS_TEAL,
+                                   edgecolor='none'))
+    
+    knob_lines = []
+    value_texts = []
+    for i, (x, y) in enumerate(KNOB_POSITIONS):
+        ax.add_patch(patches.Circle((x, y), 20, facecolor=LUFS_BLACK,
+                                    edgecolor=LUFS_WHITE, linewidth=2))
+        ax.add_patch(patches.Circle((x, y), 15, facecolor=LUFS_GRAY,
+                                    edgecolor=LUFS_BLACK, linewidth=1))
+        ax.text(x, y-30, KNOB_LABELS[i], fontsize=8, color=LUFS_WHITE, **text_style)
+        knob_lines.append(ax.plot([x, x], [y, y], color=LUFS_BLUE, linewidth=3, animated=True)[0])
+        value_texts.append(ax.text(x, y-10, "", fontsize=7, color=LUFS_BLACK,
+                                   animated=True, **text_style))
     
-    text = html.escape(text)
+    switch_lines = []
+    for i, (x, y) in enumerate(SWITCH_POSITIONS):
+        ax.add_patch(patches.Rectangle((x-12, y-8), 24, 16, facecolor=LUFS_GRAY,
+                                       edgecolor=LUFS_BLACK, linewidth=2))
+        ax.text(x, y-25, SWITCH_LABELS[i], fontsize=7, color=LUFS_WHITE, **text_style)
+        switch_lines.append(ax.plot([x-8, x+8], [y, y], color=LUFS_BLUE, linewidth=3, animated=True)[0])
     
-    # Bold
-    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
-    text = re.sub(r'__(.*?)__', r'<strong>\1</strong>', text)
+    for i, (x, y) in enumerate(FOOTSWITCH_POSITIONS):
+        ax.add_patch(patches.Circle((x, y), 18, facecolor=LUFS_BLACK,
+                                    edgecolor=LUFS_WHITE, linewidth=2))
+        ax.add_patch(patches.Circle((x, y), 12, facecolor='#333333',
+                                    edgecolor=LUFS_GRAY, linewidth=1))
+        led_color = LUFS_RED if i == 0 else LUFS_BLACK
+        ax.add_patch(patches.Circle((x, y+25), 3, facecolor=led_color,
+                                    edgecolor=LUFS_WHITE, linewidth=1))
+        ax.text(x, y-35, FOOTSWITCH_LABELS[i], fontsize=8, color=LUFS_WHITE, **text_style)
     
-    # Italic
-    text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
-    text = re.sub(r'_(.*?)_', r'<em>\1</em>', text)
+    ax.text(0, -170, 'Echo Bridge', fontsize=8, color=LUFS_TEAL, alpha=0.7, **text_style)
+    title = ax.text(0, 160, "", fontsize=14, color=LUFS_WHITE, animated=True, **text_style)
     
-    # Code
-    text = re.sub(r'`(.*?)`', r'<code>\1</code>', text)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
     
-    # Links
-    text = re.sub(r'\[([^\]]*)\]\(([^)]*)\)', r'<a href="\2">\1</a>', text)
-    text = re.sub(r'(https?://[^\s]+)', r'<a href="\1">\1</a>', text)
+    # Same crop as savefig(bbox_inches='tight', pad_inches=0.1), in pixel rows/columns
+    tight = fig.get_tightbbox(canvas.get_renderer()).padded(0.1)
+    height = int(fig.bbox.height)
+    crop = (slice(height - round(tight.y1 * DIAGRAM_DPI), height - round(tight.y0 * DIAGRAM_DPI)),
+            slice(round(tight.x0 * DIAGRAM_DPI), round(tight.x1 * DIAGRAM_DPI)))
     
-    return text
+    _AGG_CHASSIS = {
+        'canvas': canvas, 'ax': ax, 'background': background, 'crop': crop,
+        'title': title, 'knob_lines': knob_lines, 'value_texts': value_texts,
+        'switch_lines': switch_lines,
+    }
+    return _AGG_CHASSIS
 
-def inject_button_styles(template_html, button_styles):
+def render_pedal_overlay(patch_settings, patch_name="Patch"):
     """
-    Inject button styles into the HTML template
+    Raster renderer that composites the per-patch elements (title, knob
+    indicators, value text, switch positions) over the pre-drawn chassis
+    and returns the PNG bytes
+    """
+    np = lazy_import('numpy')
+    image = lazy_import('matplotlib.image')
+    
+    chassis = _agg_chassis()
+    canvas = chassis['canvas']
+    ax = chassis['ax']
+    canvas.restore_region(chassis['background'])
+    
+    chassis['title'].set_text(patch_name)
+    
+    for i, (x, y) in enumerate(KNOB_POSITIONS):
+        value_text = chassis['value_texts'][i]
+        if patch_settings and i < len(patch_settings):
+            angle = patch_settings[i] * 270 - 135  # Convert 0-1 to -135 to +135 degrees
+            value_text.set_text(f"{int(patch_settings[i] * 100)}%")
+        else:
+            angle = 0
+            value_text.set_text("")
+        indicator_x = x + 12 * math.sin(math.radians(angle))
+        indicator_y = y + 12 * math.cos(math.radians(angle))
+        chassis['knob_lines'][i].set_data([x, indicator_x], [y, indicator_y])
+    
+    # Get switch settings
+    switch_settings = patch_settings[6:9] if patch_settings and len(patch_settings) > 8 else [0.5, 0.5, 0.5]
+    
+    for i, (x, y) in enumerate(SWITCH_POSITIONS):
+        if switch_settings[i] < 0.33:
+            indicator_y = y - 4
+        elif switch_settings[i] < 0.67:
+            indicator_y = y
+        else:
+            indicator_y = y + 4
+        chassis['switch_lines'][i].set_ydata([indicator_y, indicator_y])
+    
+    # Lines first, then text on top - the same z-order as the pyplot figure
+    for artist in chassis['knob_lines'] + chassis['switch_lines']:
+        ax.draw_artist(artist)
+    for artist in chassis['value_texts'] + [chassis['title']]:
+        ax.draw_artist(artist)
+    
+    pixels = np.asarray(canvas.buffer_rgba())
+    rows, cols = chassis['crop']
+    
+    buf = BytesIO()
+    image.imsave(buf, pixels[rows, cols], format='png', dpi=DIAGRAM_DPI)
+    return buf.getvalue()
+
+# SVG diagram geometry. The matplotlib figure maps one diagram unit to
+# ~1.109pt, so line widths and font sizes (in points) are divided by that
+# scale to draw the SVG version at the same proportions.
+# The viewBox matches the PNG's tight bbox: the full axes plus 0.1in padding.
+SVG_POINTS_PER_UNIT = DIAGRAM_FIGSIZE[1] * 0.77 * 72 / 400
+SVG_PIXELS_PER_UNIT = SVG_POINTS_PER_UNIT * DIAGRAM_DPI / 72
+_SVG_PAD = 0.1 * 72 / SVG_POINTS_PER_UNIT
+SVG_VIEWBOX = tuple(round(v, 2) for v in (-150 - _SVG_PAD, -200 - _SVG_PAD,
+                                          300 + 2 * _SVG_PAD, 400 + 2 * _SVG_PAD))
+
+def _svg_num(value):
+    """Format a number compactly for SVG attributes"""
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+def _svg_pt(points):
+    """Convert a matplotlib size in points to diagram units"""
+    return _svg_num(points / SVG_POINTS_PER_UNIT)
+
+def _svg_text(x, y, text, size, color, extra=""):
+    """Centered monospace label at diagram coordinates"""
+    return (f'<text x="{_svg_num(x)}" y="{_svg_num(-y)}" font-size="{_svg_pt(size)}" '
+            f'fill="{color}"{extra}>{html.escape(str(text))}</text>')
+
+def svg_diagram_symbols():
+    """
+    Shared SVG <symbol> definitions for the pedal chassis: enclosure, knob
+    body, switch body and footswitch, plus every static label.
+    """
+    parts = [
+        f'<symbol id="eb-knob" overflow="visible">'
+        f'<circle r="20" fill="{LUFS_BLACK}" stroke="{LUFS_WHITE}" stroke-width="{_svg_pt(2)}"/>'
+        f'<circle r="15" fill="{LUFS_GRAY}" stroke="{LUFS_BLACK}" stroke-width="{_svg_pt(1)}"/>'
+        f'</symbol>',
+        f'<symbol id="eb-switch" overflow="visible">'
+        f'<rect x="-12" y="-8" width="24" height="16" fill="{LUFS_GRAY}" stroke="{LUFS_BLACK}" stroke-width="{_svg_pt(2)}"/>'
+        f'</symbol>',
+        f'<symbol id="eb-footswitch" overflow="visible">'
+        f'<circle r="18" fill="{LUFS_BLACK}" stroke="{LUFS_WHITE}" stroke-width="{_svg_pt(2)}"/>'
+        f'<circle r="12" fill="#333333" stroke="{LUFS_GRAY}" stroke-width="{_svg_pt(1)}"/>'
+        f'</symbol>',
+    ]
+    
+    chassis = [
+        f'<symbol id="eb-chassis" overflow="visible">',
+        f'<rect x="-140" y="-190" width="280" height="380" fill="{LUFS_BLACK}" stroke="{LUFS_TEAL}" stroke-width="{_svg_pt(3)}"/>',
+        f'<rect x="-140" y="-190" width="280" height="3" fill="{LUFS_TEAL}"/>',
+    ]
+    for i, (x, y) in enumerate(KNOB_POSITIONS):
+        chassis.append(f'<use href="#eb-knob" x="{x}" y="{-y}"/>')
+        chassis.append(_svg_text(x, y - 30, KNOB_LABELS[i], 8, LUFS_WHITE))
+    for i, (x, y) in enumerate(SWITCH_POSITIONS):
+        chassis.append(f'<use href="#eb-switch" x="{x}" y="{-y}"/>')
+        chassis.append(_svg_text(x, y - 25, SWITCH_LABELS[i], 7, LUFS_WHITE))
+    for i, (x, y) in enumerate(FOOTSWITCH_POSITIONS):
+        led_color = LUFS_RED if i == 0 else LUFS_BLACK
+        chassis.append(f'<use href="#eb-footswitch" x="{x}" y="{-y}"/>')
+        chassis.append(f'<circle cx="{x}" cy="{-(y + 25)}" r="3" fill="{led_color}" '
+                       f'stroke="{LUFS_WHITE}" stroke-width="{_svg_pt(1)}"/>')
+        chassis.append(_svg_text(x, y - 35, FOOTSWITCH_LABELS[i], 8, LUFS_WHITE))
+    chassis.append(_svg_text(0, -170, 'Echo Bridge', 8, LUFS_TEAL, ' opacity="0.7"'))
+    chassis.append('</symbol>')
+    
+    return ''.join(parts) + ''.join(chassis)
+
+def svg_diagram_sprite(geometry=False):
+    """
+    Hidden inline SVG holding the shared diagram symbols. With geometry set
+    it also carries svg_diagram_geometry() for the client renderer.
+    """
+    data = (f' data-geometry="{html.escape(json.dumps(svg_diagram_geometry(), separators=(",", ":")))}"'
+            if geometry else '')
+    return (f'<svg class="pedal-diagram-sprite" width="0" height="0" aria-hidden="true" '
+            f'style="position:absolute" font-family="monospace" font-weight="bold" '
+            f'text-anchor="middle" dominant-baseline="central"{data}>'
+            f'<defs>{svg_diagram_symbols()}</defs></svg>')
+
+def svg_diagram_geometry():
+    """
+    Everything script.js needs to draw the per-patch part of a diagram on
+    top of the shared chassis, the same way render_pedal_svg does
+    """
+    return {
+        'viewBox': list(SVG_VIEWBOX),
+        'knobs': [list(position) for position in KNOB_POSITIONS],
+        'switches': [list(position) for position in SWITCH_POSITIONS],
+        'titleSize': _svg_pt(14),
+        'valueSize': _svg_pt(7),
+        'stroke': _svg_pt(3),
+        'colors': {'background': LUFS_BLACK, 'title': LUFS_WHITE, 'value': LUFS_BLACK,
+                   'indicator': LUFS_BLUE},
+    }
+
+def _svg_diagram_open(patch_name, attributes=''):
+    """Opening <svg> tag of a diagram, sized like the PNG"""
+    minx, miny, width, height = SVG_VIEWBOX
+    return (f'class="pedal-diagram" viewBox="{minx} {miny} {width} {height}" '
+            f'width="{round(width * SVG_PIXELS_PER_UNIT)}" height="{round(height * SVG_PIXELS_PER_UNIT)}" '
+            f'role="img" aria-label="{html.escape(str(patch_name))} Diagram" font-family="monospace" '
+            f'font-weight="bold" text-anchor="middle" dominant-baseline="central"{attributes}>')
+
+# Diagrams left for script.js to draw carry this class until they are drawn
+CLIENT_DIAGRAM_CLASS = 'pedal-diagram-pending'
+
+def validate_diagram_settings(patch_name, all_settings):
+    """
+    Check a parsed diagram config before it is sent to the browser as is:
+    a patch name, six knob and three switch values from 0 to 1. Raises
+    ValueError naming the first problem.
+    """
+    if not isinstance(patch_name, str) or not patch_name.strip():
+        raise ValueError("the patch name must be a non-empty string")
+    if len(all_settings) != len(KNOB_POSITIONS) + len(SWITCH_POSITIONS):
+        raise ValueError(f"expected {len(KNOB_POSITIONS)} knobs and {len(SWITCH_POSITIONS)} switches, "
+                         f"got {len(all_settings)} values")
+    for i, value in enumerate(all_settings):
+        control = (f"knob {i + 1}" if i < len(KNOB_POSITIONS)
+                   else f"switch {i - len(KNOB_POSITIONS) + 1}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+            raise ValueError(f"{control} is {json.dumps(value)}, expected a number from 0 to 1")
+
+def client_diagram_html(all_settings, patch_name):
+    """
+    An empty diagram <svg> with the patch in data attributes, sized like
+    the rendered one so nothing moves when script.js draws it
+    """
+    knobs = ','.join(repr(float(value)) for value in all_settings[:len(KNOB_POSITIONS)])
+    switches = ','.join(repr(float(value)) for value in all_settings[len(KNOB_POSITIONS):])
+    data = (f' data-patch="{html.escape(patch_name)}" data-knobs="{knobs}" data-switches="{switches}"')
+    return '<svg ' + _svg_diagram_open(patch_name, data).replace(
+        'class="pedal-diagram"', f'class="pedal-diagram {CLIENT_DIAGRAM_CLASS}"', 1) + '</svg>'
+
+def render_pedal_svg(patch_settings, patch_name="Patch", standalone=False):
+    """
+    Draw the pedal diagram as inline SVG markup. The chassis is referenced
+    with <use>, so the sprite from svg_diagram_sprite() must be in the page
+    unless standalone is set, which embeds the symbols in the SVG itself.
+    """
+    knob_path = []
+    value_texts = []
+    for i, (x, y) in enumerate(KNOB_POSITIONS):
+        # Knob indicator (position based on patch settings)
+        if patch_settings and i < len(patch_settings):
+            angle = patch_settings[i] * 270 - 135  # Convert 0-1 to -135 to +135 degrees
+            value_texts.append(_svg_text(x, y - 10, f"{int(patch_settings[i] * 100)}%", 7, LUFS_BLACK))
+        else:
+            angle = 0
+        indicator_x = x + 12 * math.sin(math.radians(angle))
+        indicator_y = y + 12 * math.cos(math.radians(angle))
+        knob_path.append(f'M{x} {-y}L{_svg_num(indicator_x)} {_svg_num(-indicator_y)}')
+    
+    # Get switch settings
+    switch_settings = patch_settings[6:9] if patch_settings and len(patch_settings) > 8 else [0.5, 0.5, 0.5]
+    
+    switch_path = []
+    for i, (x, y) in enumerate(SWITCH_POSITIONS):
+        if switch_settings[i] < 0.33:
+            indicator_y = y - 4
+        elif switch_settings[i] < 0.67:
+            indicator_y = y
+        else:
+            indicator_y = y + 4
+        switch_path.append(f'M{x - 8} {-indicator_y}H{x + 8}')
+    
+    minx, miny, width, height = SVG_VIEWBOX
+    return ''.join([
+        f'<svg xmlns="http://www.w3.org/2000/svg" ' if standalone else '<svg ',
+        _svg_diagram_open(patch_name),
+        f'<defs>{svg_diagram_symbols()}</defs>' if standalone else '',
+        f'<rect x="{minx}" y="{miny}" width="{width}" height="{height}" fill="{LUFS_BLACK}"/>',
+        '<use href="#eb-chassis"/>',
+        _svg_text(0, 160, patch_name, 14, LUFS_WHITE),
+        f'<path d="{"".join(knob_path + switch_path)}" stroke="{LUFS_BLUE}" '
+        f'stroke-width="{_svg_pt(3)}" stroke-linecap="square" fill="none"/>',
+        ''.join(value_texts),
+        '</svg>',
+    ])
+
+# Raster renderers: the original pyplot figure, and the composited Agg chassis
+RASTER_RENDERERS = {
+    'png': render_pedal_diagram,
+    'agg': render_pedal_overlay,
+}
+
+# Pattern to match json code blocks
+DIAGRAM_BLOCK_PATTERN = re.compile(r'```json\s*\n(.*?)\n```', re.DOTALL)
+
+# The regex breakdown:
+# ```json - matches the opening code fence with json language
+# \s*\n - matches optional whitespace and newline
+# (.*?) - captures the JSON content (non-greedy)
+# \n``` - matches newline and closing code fence
+
+def parse_diagram_config(config_text):
+    """
+    Parse a json code block into (patch_name, settings).
+    Returns None when the block is not a diagram config.
+    """
+    config = json.loads(config_text.strip())
+    
+    # Check if this is a diagram config
+    if 'name' in config and 'knobs' in config:
+        patch_name = config.get('name', 'Patch')
+        knob_settings = config.get('knobs', [0.5] * 6)
+        switch_settings = config.get('switches', [0.5] * 3)
+        return patch_name, knob_settings + switch_settings
+    
+    return None
+
+def process_diagram_blocks(markdown_content, cache=None, jobs=1, renderer='png', assets=None,
+                           payloads=None, images=None, patches=None, noscript=False):
+    """
+    Process diagram code blocks in markdown and replace them with generated diagrams.
+    All blocks are collected in one scan, rendered (on a process pool when
+    jobs > 1) and spliced back in document order.
+    renderer is 'png' (matplotlib), 'agg' (pre-drawn chassis plus per-patch
+    overlay), 'svg' (inline SVG, no matplotlib needed) or 'client' (only the
+    validated settings; script.js draws them, and noscript adds an SVG
+    image for browsers without JavaScript). With a DiagramAssets
+    writer the diagrams become separate hashed files instead of inline data;
+    with a payloads dict PNG data is kept out of the markdown for streaming.
+    A DiagramImages post-processes raster renders; when it asks for 2x
+    variants those are rendered alongside the 1x ones. A patches list
+    receives the name of every generated diagram, in document order.
+    """
+    # Fast path: manuals without json blocks never need matplotlib
+    matches = list(DIAGRAM_BLOCK_PATTERN.finditer(markdown_content))
+    if not matches:
+        return markdown_content
+    
+    if renderer in RASTER_RENDERERS and not has_capability('matplotlib'):
+        print("⚠️  Diagram generation requires matplotlib. Skipping diagrams.")
+        return markdown_content
+    
+    # First pass: parse every block and look up cached renders
+    replacements = [None] * len(matches)
+    diagrams = {}
+    pending = {}
+    renderers = {}
+    hidpi = images is not None and images.hidpi and renderer in RASTER_RENDERERS
+    for index, match in enumerate(matches):
+        try:
+            parsed = parse_diagram_config(match.group(1))
+        except json.JSONDecodeError as e:
+            print(f"❌ Error parsing diagram config: {e}")
+            replacements[index] = f'<p><em>Error: Invalid diagram configuration - {e}</em></p>'
+            continue
+        except Exception as e:
+            print(f"❌ Error generating diagram: {e}")
+            replacements[index] = f'<p><em>Error: Could not generate diagram - {e}</em></p>'
+            continue
+        
+        if parsed is None:
+            replacements[index] = match.group(0)
+            continue
+        
+        patch_name, all_settings = parsed
+        if renderer == 'client':
+            try:
+                validate_diagram_settings(patch_name, all_settings)
+            except ValueError as e:
+                print(f"❌ Error parsing diagram config: {e}")
+                replacements[index] = f'<p><em>Error: Invalid diagram configuration - {e}</em></p>'
+                continue
+        try:
+            key = DiagramCache.key(all_settings, patch_name, renderer)
+        except Exception as e:
+            print(f"❌ Error generating diagram: {e}")
+            replacements[index] = f'<p><em>Error: Could not generate diagram - {e}</em></p>'
+            continue
+        
+        if renderer in ('svg', 'client'):
+            diagrams[index] = (key, patch_name)
+            pending[key] = (None, all_settings, patch_name)
+            continue
+        
+        # 2x variants always come from the matplotlib figure at double DPI
+        scaled = {1: (key, RASTER_RENDERERS[renderer])}
+        if hidpi:
+            scaled[2] = (DiagramCache.key(all_settings, patch_name, f'{renderer}@2x'),
+                         render_pedal_diagram_2x)
+        diagrams[index] = (key, patch_name, {scale: item[0] for scale, item in scaled.items()})
+        for scale_key, render in scaled.values():
+            if scale_key in pending:
+                continue
+            png_data = cache.get(scale_key) if cache is not None else None
+            if png_data is not None:
+                trace_event(patch_name, 'cache', patch=patch_name, cache='hit')
+            pending[scale_key] = (png_data, all_settings, patch_name)
+            renderers[scale_key] = render
+    
+    if renderer == 'svg':
+        return _splice_svg_diagrams(markdown_content, matches, replacements, diagrams, pending, assets,
+                                    patches)
+    if renderer == 'client':
+        return _splice_client_diagrams(markdown_content, matches, replacements, diagrams, pending,
+                                       assets, patches, noscript)
+    
+    # Second pass: render everything that was not cached
+    rendered = {}
+    to_render = {key: (renderers[key],) + item[1:] for key, item in pending.items() if item[0] is None}
+    if jobs > 1 and len(to_render) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(to_render))) as pool:
+            futures = {key: pool.submit(_timed_render, *args)
+                       for key, args in to_render.items()}
+            for key, future in futures.items():
+                try:
+                    rendered[key] = _record_render(to_render[key][2], renderer, *future.result())
+                except Exception as e:
+                    rendered[key] = e
+    else:
+        for key, args in to_render.items():
+            try:
+                rendered[key] = _record_render(args[2], renderer, *_timed_render(*args))
+            except Exception as e:
+                rendered[key] = e
+    
+    for key, png_data in rendered.items():
+        if cache is not None and not isinstance(png_data, Exception):
+            cache.put(key, png_data)
+    
+    # Splice the results back in document order
+    processed = {}
+    for index, (key, patch_name, scale_keys) in diagrams.items():
+        png_data = pending[key][0] or rendered[key]
+        if isinstance(png_data, Exception):
+            print(f"❌ Error generating diagram: {png_data}")
+            replacements[index] = f'<p><em>Error: Could not generate diagram - {png_data}</em></p>'
+            continue
+        
+        print(f"✅ Generated diagram for: {patch_name}")
+        if patches is not None:
+            patches.append(patch_name)
+        variants = {'png': {1: png_data}}
+        if images is not None:
+            if key not in processed:
+                renders = {1: png_data}
+                for scale, scale_key in scale_keys.items():
+                    data = pending[scale_key][0] or rendered[scale_key]
+                    if isinstance(data, Exception):
+                        print(f"⚠️  No {scale}x diagram for {patch_name}: {data}")
+                    else:
+                        renders[scale] = data
+                processed[key] = images.process(renders, patch_name)
+            variants = processed[key]
+        
+        if assets is not None and (len(variants) > 1 or len(variants['png']) > 1):
+            replacements[index] = assets.picture_html(variants, patch_name)
+        elif assets is not None:
+            replacements[index] = assets.image_html(variants['png'][1], 'png', patch_name)
+        else:
+            replacements[index] = diagram_image_html(variants['png'][1], patch_name, payloads)
+    
+    return _splice_blocks(markdown_content, matches, replacements)
+
+def _timed_render(render, all_settings, patch_name):
+    """Run a diagram renderer (possibly in a worker) and time it"""
+    start = time.perf_counter()
+    output = render(all_settings, patch_name)
+    return output, start, time.perf_counter() - start, os.getpid()
+
+def _record_render(patch_name, renderer, output, start, duration, pid):
+    """Add a timed render to the active trace and return its output"""
+    if _active_trace is not None:
+        _active_trace.add(patch_name, 'diagram', start, duration, pid,
+                          renderer=renderer, cache='miss')
+    return output
+
+def _splice_svg_diagrams(markdown_content, matches, replacements, diagrams, pending, assets=None,
+                         patches=None):
+    """Render SVG diagrams in place; the shared sprite goes with the first one"""
+    sprite = svg_diagram_sprite()
+    for index, (key, patch_name) in diagrams.items():
+        _, all_settings, _ = pending[key]
+        try:
+            with trace_span(patch_name, 'diagram', renderer='svg'):
+                svg = render_pedal_svg(all_settings, patch_name, standalone=assets is not None)
+        except Exception as e:
+            print(f"❌ Error generating diagram: {e}")
+            replacements[index] = f'<p><em>Error: Could not generate diagram - {e}</em></p>'
+            continue
+        
+        print(f"✅ Generated diagram for: {patch_name}")
+        if patches is not None:
+            patches.append(patch_name)
+        if assets is not None:
+            replacements[index] = assets.image_html(svg.encode('utf-8'), 'svg', patch_name)
+            continue
+        
+        replacements[index] = f'''<div class="pedal-diagram-container">
+    {sprite}{svg}
+</div>'''
+        sprite = ""
+    
+    return _splice_blocks(markdown_content, matches, replacements)
+
+def _splice_client_diagrams(markdown_content, matches, replacements, diagrams, pending, assets=None,
+                            patches=None, noscript=False):
+    """
+    Leave diagrams for script.js to draw; the sprite with the chassis and
+    geometry goes with the first one. With noscript set each also gets a
+    standalone SVG image, as an asset file when assets is given.
+    """
+    sprite = svg_diagram_sprite(geometry=True)
+    # Without JavaScript the empty placeholders give way to the images; every
+    # fallback carries the rule so it still applies on split pages
+    hide_pending = f'<style>.{CLIENT_DIAGRAM_CLASS}{{display:none}}</style>'
+    for index, (key, patch_name) in diagrams.items():
+        _, all_settings, _ = pending[key]
+        fallback = ''
+        if noscript:
+            with trace_span(patch_name, 'diagram', renderer='svg'):
+                svg = render_pedal_svg(all_settings, patch_name, standalone=True).encode('utf-8')
+            if assets is not None:
+                url, width, height = assets.add(svg, 'svg', patch_name)
+            else:
+                url = f"data:image/svg+xml;base64,{base64.b64encode(svg).decode('ascii')}"
+                width, height = image_dimensions(svg, 'svg')
+            fallback = (f'\n    <noscript>{hide_pending}<img src="{url}" alt="{patch_name} Diagram" '
+                        f'class="pedal-diagram" loading="lazy" width="{width}" height="{height}" /></noscript>')
+        
+        print(f"✅ Prepared diagram for: {patch_name}")
+        if patches is not None:
+            patches.append(patch_name)
+        replacements[index] = f'''<div class="pedal-diagram-container">
+    {sprite}{client_diagram_html(all_settings, patch_name)}{fallback}
+</div>'''
+        sprite = ""
+    
+    return _splice_blocks(markdown_content, matches, replacements)
+
+def _splice_blocks(markdown_content, matches, replacements):
+    """Replace each matched block with its replacement, in document order"""
+    pieces = []
+    last_end = 0
+    for match, replacement in zip(matches, replacements):
+        pieces.append(markdown_content[last_end:match.start()])
+        pieces.append(replacement)
+        last_end = match.end()
+    pieces.append(markdown_content[last_end:])
+    
+    return ''.join(pieces)
+
+def compare_diagram_renderers(markdown_file, repeat=5):
+    """
+    Time every diagram renderer on each diagram block of a manual and
+    print a per-diagram comparison table (best of `repeat` runs, in ms)
+    """
+    with open(markdown_file, 'r', encoding='utf-8') as f:
+        markdown_content = f.read()
+    
+    configs = []
+    for match in DIAGRAM_BLOCK_PATTERN.finditer(markdown_content):
+        try:
+            parsed = parse_diagram_config(match.group(1))
+        except Exception:
+            continue
+        if parsed is not None:
+            configs.append(parsed)
+    
+    if not configs:
+        print(f"No diagram blocks found in {markdown_file}")
+        return
+    
+    renderers = dict(RASTER_RENDERERS, svg=render_pedal_svg)
+    
+    # Warm up once so one-off setup (font cache, chassis drawing) is reported separately
+    setup = {}
+    for name, render in renderers.items():
+        start = time.perf_counter()
+        render(configs[0][1], configs[0][0])
+        setup[name] = (time.perf_counter() - start) * 1000
+    
+    print(f"⏱️  Diagram render times (ms, best of {repeat})")
+    print(f"   {'Patch':<24}" + ''.join(f"{name:>10}" for name in renderers))
+    totals = dict.fromkeys(renderers, 0.0)
+    for patch_name, all_settings in configs:
+        row = []
+        for name, render in renderers.items():
+            best = min(_time_call(render, all_settings, patch_name) for _ in range(repeat))
+            totals[name] += best
+            row.append(f"{best:>10.3f}")
+        print(f"   {patch_name[:24]:<24}" + ''.join(row))
+    print(f"   {'Mean':<24}" + ''.join(f"{totals[name] / len(configs):>10.3f}" for name in renderers))
+    print(f"   {'First call':<24}" + ''.join(f"{setup[name]:>10.3f}" for name in renderers))
+
+def _time_call(func, *args):
+    """Wall time of a single call in milliseconds"""
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+# Serialization rules for button snippets match BeautifulSoup's str(tag)
+# with the html.parser builder, so the extracted HTML is unchanged
+_VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+])
+_MULTI_VALUED_ATTRIBUTES = frozenset(['class', 'rel', 'rev', 'accept-charset', 'headers', 'accesskey'])
+_RAW_TEXT_ELEMENTS = frozenset(['script', 'style'])
+_PRESERVE_WHITESPACE_ELEMENTS = frozenset(['pre', 'textarea'])
+
+def _escape_markup(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _quote_attribute(value):
+    value = _escape_markup(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', '&quot;') + '"'
+
+class _ButtonStop(Exception):
+    """Raised once the button and every style block have been seen"""
+
+class ButtonExtractor(HTMLParser):
+    """
+    Pull the first <a class="webring-button"> and the text of every
+    <style> block out of a button file from the parser's event stream,
+    stopping as soon as nothing more can be found
+    """
+    
+    def __init__(self, last_style_pos=None):
+        super().__init__(convert_charrefs=True)
+        self.last_style_pos = last_style_pos
+        self.styles_done = last_style_pos is None
+        self.button = []
+        self.button_depth = 0
+        self.button_done = False
+        self.styles = []
+        self.in_style = False
+        self.raw_text = None
+        self.preserve_whitespace = 0
+        self.text = []
+    
+    def _check_done(self):
+        if self.button_done and self.styles_done and not self.in_style:
+            raise _ButtonStop()
+    
+    def _start_tag(self, tag, attrs):
+        values = {}
+        for name, value in attrs:
+            if value is None:
+                value = ''
+            elif name in _MULTI_VALUED_ATTRIBUTES:
+                value = ' '.join(value.split())
+            values[name] = value
+        rendered = ''.join(f' {name}={_quote_attribute(value)}'
+                           for name, value in sorted(values.items()))
+        return f'<{tag}{rendered}{"/" if tag in _VOID_ELEMENTS else ""}>'
+    
+    def _flush_text(self):
+        """Emit the text since the last tag; whitespace-only runs collapse to one character"""
+        if not self.text:
+            return
+        data = ''.join(self.text)
+        self.text = []
+        if not self.preserve_whitespace and not data.strip(' \t\n\r\f'):
+            data = '\n' if '\n' in data else ' '
+        if self.in_style:
+            self.styles[-1] += data
+        if self.button_depth:
+            self.button.append(data if self.raw_text else _escape_markup(data))
+    
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in _PRESERVE_WHITESPACE_ELEMENTS:
+            self.preserve_whitespace += 1
+        if self.button_depth:
+            self.button.append(self._start_tag(tag, attrs))
+            if tag == 'a':
+                self.button_depth += 1
+        elif (tag == 'a' and not self.button_done
+                and 'webring-button' in (dict(attrs).get('class') or '').split()):
+            self.button.append(self._start_tag(tag, attrs))
+            self.button_depth = 1
+        
+        if tag in _RAW_TEXT_ELEMENTS:
+            self.raw_text = tag
+        if tag == 'style':
+            self.in_style = True
+            self.styles.append('')
+            if not self.styles_done and self.getpos() >= self.last_style_pos:
+                self.styles_done = True
+        if tag in _VOID_ELEMENTS:
+            self._end_void(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_ELEMENTS:
+            self.handle_endtag(tag)
+    
+    def _end_void(self, tag):
+        if self.raw_text == tag:
+            self.raw_text = None
+    
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag in _VOID_ELEMENTS:
+            return
+        if tag in _PRESERVE_WHITESPACE_ELEMENTS and self.preserve_whitespace:
+            self.preserve_whitespace -= 1
+        if tag == self.raw_text:
+            self.raw_text = None
+        if tag == 'style':
+            self.in_style = False
+        if self.button_depth:
+            self.button.append(f'</{tag}>')
+            if tag == 'a':
+                self.button_depth -= 1
+                if not self.button_depth:
+                    self.button_done = True
+        self._check_done()
+    
+    def handle_data(self, data):
+        self.text.append(data)
+    
+    def handle_comment(self, data):
+        self._flush_text()
+        if self.button_depth:
+            self.button.append(f'<!--{data}-->')
+
+# Extracted (button_html, button_styles) keyed by (path, size, mtime)
+_BUTTON_CACHE = {}
+
+# Position (line, column) of the last <style> tells the parser when it may stop
+_STYLE_TAG_PATTERN = re.compile(r'<style', re.IGNORECASE)
+
+def extract_button_content(button_file):
+    """
+    Extract button content AND styles from a button HTML file
+    Returns a tuple of (button_html, button_styles)
+    """
+    try:
+        button_file = Path(button_file)
+        stat = button_file.stat()
+        cache_key = (str(button_file.resolve()), stat.st_size, stat.st_mtime_ns)
+        if cache_key in _BUTTON_CACHE:
+            return _BUTTON_CACHE[cache_key]
+        
+        with open(button_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        last_style = None
+        for last_style in _STYLE_TAG_PATTERN.finditer(content):
+            pass
+        last_style_pos = None
+        if last_style:
+            offset = last_style.start()
+            last_style_pos = (content.count('\n', 0, offset) + 1,
+                              offset - content.rfind('\n', 0, offset) - 1)
+        parser = ButtonExtractor(last_style_pos)
+        try:
+            parser.feed(content)
+            parser.close()
+        except _ButtonStop:
+            pass
+        
+        button_html = ''.join(parser.button)
+        button_styles = ''.join(f"\n/* Styles from {button_file.name} */\n{style}"
+                                for style in parser.styles)
+        
+        if not button_html:
+            print(f"Warning: No webring-button found in {button_file}")
+        
+        _BUTTON_CACHE[cache_key] = (button_html, button_styles)
+        return button_html, button_styles
+            
+    except Exception as e:
+        print(f"Warning: Could not read {button_file}: {e}")
+        return "", ""
+
+# Directory listings keyed by directory, reused while its mtime is unchanged
+_BUTTON_LISTINGS = {}
+
+def find_button_files(buttons_dir='.'):
+    """
+    Return the *button*.html files in buttons_dir, sorted by name
+    """
+    directory = Path(buttons_dir)
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except OSError:
+        return []
+    
+    listing = _BUTTON_LISTINGS.get(str(directory.resolve()))
+    if listing and listing[0] == mtime:
+        return list(listing[1])
+    
+    button_files = []
+    
+    for file_path in directory.glob('*button*.html'):
+        if file_path.name not in ['index.html', 'template.html']:
+            button_files.append(file_path)
+    
+    button_files.sort()
+    _BUTTON_LISTINGS[str(directory.resolve())] = (mtime, button_files)
+    return list(button_files)
+
+def collect_button_content(buttons_dir='.'):
+    """
+    Collect all button HTML files and combine their content and styles
+    Returns a tuple of (combined_html, combined_styles)
+    """
+    button_files = find_button_files(buttons_dir)
+    
+    if not button_files:
+        print("No button HTML files found (looking for *button*.html)")
+        return "", ""
+    
+    print(f"Found button files: {[f.name for f in button_files]}")
+    
+    all_buttons = []
+    all_styles = []
+    
+    for button_file in button_files:
+        button_html, button_styles = extract_button_content(button_file)
+        if button_html:
+            all_buttons.append(button_html)
+        if button_styles:
+            all_styles.append(button_styles)
+    
+    combined_html = '\n                '.join(all_buttons)
+    combined_styles = '\n'.join(all_styles)
+    
+    return combined_html, combined_styles
+
+def get_favicon_svg(favicon_file="favicon.svg"):
+    """
+    Load and prepare favicon SVG for insertion into template
+    """
+    if not Path(favicon_file).exists():
+        print(f"Warning: {favicon_file} not found - using fallback text logo")
+        return "LUFS"
+    
+    try:
+        with open(favicon_file, 'r', encoding='utf-8') as f:
+            favicon_svg = f.read()
+        
+        favicon_svg = re.sub(r'<\?xml[^>]*\?>', '', favicon_svg).strip()
+        
+        if 'viewBox' not in favicon_svg and 'svg' in favicon_svg:
+            width_match = re.search(r'width=["\']([^"\']+)["\']', favicon_svg)
+            height_match = re.search(r'height=["\']([^"\']+)["\']', favicon_svg)
+            
+            if width_match and height_match:
+                width = width_match.group(1)
+                height = height_match.group(1)
+                width = re.sub(r'[a-zA-Z%]+', '', width)
+                height = re.sub(r'[a-zA-Z%]+', '', height)
+                viewbox = f'viewBox="0 0 {width} {height}"'
+                favicon_svg = re.sub(r'<svg([^>]*)', f'<svg {viewbox}\\1', favicon_svg)
+        
+        return favicon_svg
+        
+    except Exception as e:
+        print(f"Warning: Could not process favicon: {e}")
+        return "LUFS"
+
+MARKDOWN_EXTENSIONS = [
+    'tables',
+    'fenced_code',
+    'codehilite',
+    'toc',
+    'nl2br',
+    'attr_list',
+    'def_list',
+    'footnotes',
+    'md_in_html'
+]
+
+# Documents using these need state shared by the whole document, so they
+# are converted in one piece instead of section by section
+_WHOLE_DOCUMENT_PATTERN = re.compile(r'\[\^[^\]]+\]|^\s*\[TOC\]\s*$|\{:?[^}\n]*#[\w-]', re.MULTILINE)
+_SECTION_HEADING_PATTERN = re.compile(r'^#{1,2} ')
+_REFERENCE_DEFINITION_PATTERN = re.compile(r'^ {0,3}\[[^\]^]+\]:\s*\S.*$', re.MULTILINE)
+_HEADING_ID_PATTERN = re.compile(r'(<h[1-6][^>]*? id=")([^"]*)(")')
+_TOC_ID_COUNT_PATTERN = re.compile(r'^(.*)_([0-9]+)$')
+_SECTION_END = '@@markdown-section-end@@'
+
+_markdown_converter = None
+
+def markdown_converter():
+    """One Markdown instance for the whole process, reset between documents"""
+    global _markdown_converter
+    if _markdown_converter is None:
+        markdown = lazy_import('markdown')
+        _markdown_converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return _markdown_converter.reset()
+
+def split_markdown_sections(markdown_content):
+    """
+    Split markdown before each # or ## heading that starts a new block,
+    skipping headings inside fenced code and unclosed <div> blocks
+    """
+    sections = []
+    current = []
+    fence = None
+    open_divs = 0
+    previous_blank = True
+    
+    for line in markdown_content.split('\n'):
+        stripped = line.strip()
+        if fence is not None:
+            if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+        elif stripped.startswith('```') or stripped.startswith('~~~'):
+            fence = stripped[:3]
+        else:
+            if (previous_blank and open_divs == 0 and current
+                    and _SECTION_HEADING_PATTERN.match(line)):
+                sections.append('\n'.join(current))
+                current = []
+            open_divs += line.count('<div') - line.count('</div>')
+        current.append(line)
+        previous_blank = not stripped
+    
+    sections.append('\n'.join(current))
+    return sections
+
+def _convert_section(section):
+    """
+    Convert one section. A marker paragraph is appended and cut off again
+    so the fragment keeps the whitespace that would separate it from the
+    next block in a whole-document conversion.
+    """
+    fragment = markdown_converter().convert(f"{section}\n\n{_SECTION_END}")
+    marker = f"<p>{_SECTION_END}</p>"
+    if fragment.endswith(marker):
+        return fragment[:-len(marker)]
+    return markdown_converter().convert(section) + '\n'
+
+def _unique_heading_id(heading_id, used_ids):
+    """The toc extension's rule: append _1, _2... until the id is unused"""
+    while heading_id in used_ids or not heading_id:
+        match = _TOC_ID_COUNT_PATTERN.match(heading_id)
+        if match:
+            heading_id = f"{match.group(1)}_{int(match.group(2)) + 1}"
+        else:
+            heading_id = f"{heading_id}_1"
+    used_ids.add(heading_id)
+    return heading_id
+
+def convert_markdown_to_html(markdown_content, section_cache=None):
+    """
+    Convert markdown to HTML using the best available method.
+    The document is converted one top-level section at a time and each
+    section's HTML is memoized by content hash in section_cache, which is
+    left holding only this document's sections.
+    """
+    if not has_capability('markdown'):
+        return simple_markdown_to_html(markdown_content)
+    
+    if _WHOLE_DOCUMENT_PATTERN.search(markdown_content):
+        if section_cache is not None:
+            section_cache.clear()
+        return markdown_converter().convert(markdown_content)
+    
+    # Reference definitions may be used in any section
+    definitions = '\n'.join(_REFERENCE_DEFINITION_PATTERN.findall(markdown_content))
+    previous = dict(section_cache or {})
+    converted = {}
+    fragments = []
+    for section in split_markdown_sections(markdown_content):
+        if definitions:
+            section = f"{section}\n\n{definitions}"
+        key = hash_bytes(section)
+        if key not in converted:
+            converted[key] = previous.get(key)
+            if converted[key] is None:
+                converted[key] = _convert_section(section)
+        fragments.append(converted[key])
+    
+    if section_cache is not None:
+        section_cache.clear()
+        section_cache.update(converted)
+    
+    # Heading ids are only unique within a section; renumber across sections
+    used_ids = set()
+    def unique_id(match):
+        return f"{match.group(1)}{_unique_heading_id(match.group(2), used_ids)}{match.group(3)}"
+    return ''.join(_HEADING_ID_PATTERN.sub(unique_id, fragment) for fragment in fragments).strip()
+
+# Fallback parser: one pass over the lines with precompiled patterns,
+# and an inline scanner that touches each character a bounded number of times
+_FENCE_PATTERN = re.compile(r'^(`{3,}|~{3,})\s*([\w+-]*)')
+_HEADER_PATTERN = re.compile(r'^(#{1,4}) ')
+_LIST_ITEM_PATTERN = re.compile(r'^(?:([*-])|(\d+)\.) ')
+_INLINE_TOKEN_PATTERN = re.compile(r'https?://[^\s<>*`\[\]]+|\*\*|__|[*_`\[]')
+_URL_TRAILING_PUNCTUATION = '.,:;!?'
+
+def _close_table(html_lines):
+    html_lines.append('</tbody>')
+    html_lines.append('</table>')
+
+def _table_cells(line):
+    return [cell.strip() for cell in line.split('|')[1:-1]]
+
+class _ListStack:
+    """Open (possibly nested) lists; an item's </li> waits until we know it has no sublist"""
+    
+    def __init__(self, html_lines):
+        self.html_lines = html_lines
+        self.levels = []  # (indent, tag, index of the open <li> line or None)
+    
+    def _close_item(self):
+        indent, tag, item = self.levels[-1]
+        if item is not None:
+            if item == len(self.html_lines) - 1:
+                self.html_lines[item] += '</li>'
+            else:
+                self.html_lines.append('</li>')
+            self.levels[-1] = (indent, tag, None)
+    
+    def _close_level(self):
+        self._close_item()
+        self.html_lines.append(f'</{self.levels.pop()[1]}>')
+    
+    def close(self):
+        while self.levels:
+            self._close_level()
+    
+    def add_item(self, indent, tag, content):
+        while self.levels and indent < self.levels[-1][0]:
+            self._close_level()
+        if self.levels and indent == self.levels[-1][0] and tag != self.levels[-1][1]:
+            self._close_level()
+        if self.levels and indent == self.levels[-1][0]:
+            self._close_item()
+        elif not self.levels or indent > self.levels[-1][0]:
+            self.html_lines.append(f'<{tag}>')
+            self.levels.append((indent, tag, None))
+        self.html_lines.append(f'<li>{content}')
+        self.levels[-1] = (indent, tag, len(self.html_lines) - 1)
+
+def simple_markdown_to_html(markdown_text):
+    """
+    Enhanced fallback markdown parser using only built-in Python libraries
+    """
+    html_lines = []
+    lists = _ListStack(html_lines)
+    in_table = False
+    expect_separator = False
+    fence = None
+    code_lines = []
+    
+    for raw_line in markdown_text.split('\n'):
+        if fence is not None:
+            if raw_line.strip().startswith(fence[0]) and not raw_line.strip().strip(fence[0][0]):
+                code = html.escape('\n'.join(code_lines) + '\n', quote=False) if code_lines else ''
+                css_class = f' class="language-{fence[1]}"' if fence[1] else ''
+                html_lines.append(f'<pre><code{css_class}>{code}</code></pre>')
+                fence = None
+            else:
+                code_lines.append(raw_line)
+            continue
+        
+        line = raw_line.strip()
+        if not line:
+            lists.close()
+            if not in_table:
+                html_lines.append('')
+            continue
+        
+        if in_table:
+            if expect_separator:
+                expect_separator = False
+                if '---' in line:
+                    continue
+            if '|' in line:
+                html_lines.append('<tr>')
+                for cell in _table_cells(line):
+                    html_lines.append(f'<td>{process_inline_formatting(cell)}</td>')
+                html_lines.append('</tr>')
+                continue
+            _close_table(html_lines)
+            in_table = False
+        
+        item = _LIST_ITEM_PATTERN.match(line)
+        if item is None or '|' in line:
+            lists.close()
+        
+        fence_match = _FENCE_PATTERN.match(line)
+        header = _HEADER_PATTERN.match(line)
+        if fence_match:
+            fence = (fence_match.group(1), fence_match.group(2))
+            code_lines = []
+        
+        elif header:
+            level = len(header.group(1))
+            html_lines.append(f'<h{level}>{html.escape(line[level + 1:])}</h{level}>')
+        
+        # Tables: a separator row right after the header is skipped
+        elif '|' in line:
+            html_lines.append('<table>')
+            html_lines.append('<thead>')
+            html_lines.append('<tr>')
+            for cell in _table_cells(line):
+                html_lines.append(f'<th>{html.escape(cell)}</th>')
+            html_lines.append('</tr>')
+            html_lines.append('</thead>')
+            html_lines.append('<tbody>')
+            in_table = True
+            expect_separator = True
+        
+        # Lists, nested by indentation (a tab counts as four spaces)
+        elif item:
+            indent = len(raw_line.expandtabs(4)) - len(raw_line.expandtabs(4).lstrip())
+            tag = 'ul' if item.group(1) else 'ol'
+            lists.add_item(indent, tag, process_inline_formatting(line[item.end():]))
+        
+        # Raw HTML (e.g. generated diagrams) passes through untouched
+        elif line.startswith('<'):
+            html_lines.append(line)
+        
+        else:
+            html_lines.append(f'<p>{process_inline_formatting(line)}</p>')
+    
+    lists.close()
+    if in_table:
+        _close_table(html_lines)
+    if fence is not None:
+        code = html.escape('\n'.join(code_lines) + '\n', quote=False) if code_lines else ''
+        html_lines.append(f'<pre><code>{code}</code></pre>')
+    
+    return '\n'.join(html_lines)
+
+class _NextIndex:
+    """
+    Position of the next occurrence of a string at or after a cursor that
+    only moves forward, so repeated lookups scan the text once in total
+    """
+    
+    def __init__(self, text, target):
+        self.text = text
+        self.target = target
+        self.found = -2
+    
+    def at_or_after(self, position):
+        if self.found == -1 or self.found >= position:
+            return self.found
+        self.found = self.text.find(self.target, position)
+        return self.found
+
+def process_inline_formatting(text):
+    """
+    Process inline markdown formatting in a single left-to-right scan:
+    code spans, links, bare URLs and **/__ strong and */_ emphasis
+    """
+    pieces = []
+    openers = []  # (delimiter, index into pieces)
+    backticks = _NextIndex(text, '`')
+    brackets = _NextIndex(text, ']')
+    parens = _NextIndex(text, ')')
+    position = 0
+    
+    for token in _INLINE_TOKEN_PATTERN.finditer(text):
+        start = token.start()
+        if start < position:
+            continue
+        pieces.append(html.escape(text[position:start]))
+        delimiter = token.group()
+        position = token.end()
+        
+        if delimiter == '`':
+            end = backticks.at_or_after(position)
+            if end == -1:
+                pieces.append('`')
+            else:
+                pieces.append(f'<code>{html.escape(text[position:end])}</code>')
+                position = end + 1
+        
+        elif delimiter == '[':
+            label_end = brackets.at_or_after(position)
+            url_end = parens.at_or_after(label_end + 2) if label_end != -1 else -1
+            if label_end != -1 and text.startswith('(', label_end + 1) and url_end != -1:
+                label = process_inline_formatting(text[position:label_end])
+                url = html.escape(text[label_end + 2:url_end])
+                pieces.append(f'<a href="{url}">{label}</a>')
+                position = url_end + 1
+            else:
+                pieces.append('[')
+        
+        elif delimiter.startswith('http'):
+            url = delimiter.rstrip(_URL_TRAILING_PUNCTUATION)
+            position = start + len(url)
+            url = html.escape(url)
+            pieces.append(f'<a href="{url}">{url}</a>')
+        
+        else:
+            for depth in range(len(openers) - 1, -1, -1):
+                if openers[depth][0] == delimiter:
+                    tag = 'strong' if len(delimiter) == 2 else 'em'
+                    pieces[openers[depth][1]] = f'<{tag}>'
+                    pieces.append(f'</{tag}>')
+                    del openers[depth:]
+                    break
+            else:
+                openers.append((delimiter, len(pieces)))
+                pieces.append(delimiter)
+    
+    pieces.append(html.escape(text[position:]))
+    return ''.join(pieces)
+
+def button_styles_tag(button_styles):
+    """
+    Wrap the collected button styles in the <style> block injected into <head>
+    """
+    if not button_styles:
+        return ""
+    return f"\n    <!-- Button Styles -->\n    <style>\n{button_styles}\n    </style>\n"
+
+def inject_button_styles(template_html, button_styles):
+    """
+    Inject button styles into the HTML template
     """
     if not button_styles:
         return template_html
     
-    style_tag = f"\n    <!-- Button Styles -->\n    <style>\n{button_styles}\n    </style>\n"
+    style_tag = button_styles_tag(button_styles)
+    
+    head_close_index = template_html.rfind('</head>')
+    if head_close_index != -1:
+        return template_html[:head_close_index] + style_tag + template_html[head_close_index:]
+    else:
+        print("Warning: No </head> tag found in template. Button styles may not work correctly.")
+        return template_html
+
+# Diagram-specific CSS styles that match the LUFS aesthetic
+DIAGRAM_STYLES = """
+    <!-- Pedal Diagram Styles -->
+    <style>
+    .pedal-diagram-container {
+        display: flex;
+        justify-content: center;
+        margin: var(--spacing-lg) 0;
+        padding: var(--spacing-md);
+        background: var(--lufs-black);
+        border: 2px solid var(--lufs-teal);
+        border-radius: 0;
+    }
+    
+    .pedal-diagram {
+        max-width: 100%;
+        height: auto;
+        border: 1px solid var(--lufs-teal);
+        border-radius: 0;
+        background: var(--lufs-black);
+        image-rendering: crisp-edges;
+        image-rendering: -moz-crisp-edges;
+        image-rendering: pixelated;
+    }
+    
+    /* Responsive diagram sizing */
+    @media (max-width: 768px) {
+        .pedal-diagram-container {
+            padding: var(--spacing-sm);
+        }
+        
+        .pedal-diagram {
+            max-width: 90%;
+        }
+    }
+    
+    @media (max-width: 480px) {
+        .pedal-diagram {
+            max-width: 85%;
+        }
+    }
+    </style>
+"""
+
+def inject_diagram_styles(template_html):
+    """
+    Inject diagram-specific CSS styles that match the LUFS aesthetic
+    """
+    head_close_index = template_html.rfind('</head>')
+    if head_close_index != -1:
+        return template_html[:head_close_index] + DIAGRAM_STYLES + template_html[head_close_index:]
+    else:
+        print("Warning: No </head> tag found in template. Diagram styles may not work correctly.")
+        return template_html
+
+# Template slots are {{NAME}} placeholders; HEAD_INJECTION is the position
+# just before the template's closing </head> tag
+TEMPLATE_SLOT_PATTERN = re.compile(r'\{\{([A-Z_]+)\}\}')
+HEAD_SLOT = 'HEAD_INJECTION'
+# Slots that fill whole lines: the placeholder's line (indent and newline
+# included) is replaced, so an empty value leaves no blank line behind
+LINE_SLOTS = frozenset(['SEARCH_INDEX'])
+
+class CompiledTemplate:
+    """
+    A template parsed once into static text segments and named slots,
+    rendered in a single pass. segments always has one more entry than
+    slots: segments[0], slots[0], segments[1], slots[1], ... segments[-1].
+    """
+
+    def __init__(self, segments, slots, lines=None):
+        self.segments = segments
+        self.slots = slots
+        self.lines = lines or {}
+
+    @classmethod
+    def compile(cls, template_text):
+        """Split template text into static segments and slots"""
+        markers = []
+        lines = {}
+        for m in TEMPLATE_SLOT_PATTERN.finditer(template_text):
+            start, end, name = m.start(), m.end(), m.group(1)
+            if name in LINE_SLOTS:
+                line_start = template_text.rfind('\n', 0, start) + 1
+                line_end = template_text.find('\n', end)
+                line_end = len(template_text) if line_end == -1 else line_end + 1
+                if not template_text[line_start:start].strip() and not template_text[end:line_end].strip():
+                    start, end = line_start, line_end
+                    lines[name] = template_text[start:end]
+            markers.append((start, end, name))
+        head_close_index = template_text.rfind('</head>')
+        if head_close_index != -1:
+            markers.append((head_close_index, head_close_index, HEAD_SLOT))
+        markers.sort(key=lambda marker: marker[0])
+        
+        segments = []
+        slots = []
+        position = 0
+        for start, end, name in markers:
+            segments.append(template_text[position:start])
+            slots.append(name)
+            position = end
+        segments.append(template_text[position:])
+        return cls(segments, slots, lines)
+
+    def _fill(self, name, values):
+        if name in values:
+            return values[name]
+        # Unfilled placeholders stay as written, like str.replace would leave them
+        if name in self.lines:
+            return self.lines[name]
+        return "" if name == HEAD_SLOT else f"{{{{{name}}}}}"
+
+    def bind(self, **values):
+        """Return a new template with some slots filled in and merged into the static text"""
+        segments = [self.segments[0]]
+        slots = []
+        for name, segment in zip(self.slots, self.segments[1:]):
+            if name in values:
+                segments[-1] += values[name] + segment
+            else:
+                slots.append(name)
+                segments.append(segment)
+        return CompiledTemplate(segments, slots, self.lines)
+
+    def iter_chunks(self, values):
+        """Yield the rendered document as a stream of chunks"""
+        yield self.segments[0]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            yield self._fill(name, values)
+            yield segment
+
+    def render(self, values):
+        """Render the whole document in one pass"""
+        return ''.join(self.iter_chunks(values))
+
+    def write_to(self, stream, values):
+        """Write the rendered document chunk by chunk to an open text stream"""
+        for chunk in self.iter_chunks(values):
+            stream.write(chunk)
+
+_COMPILED_TEMPLATES = {}
+
+def load_template(template_file):
+    """
+    Read and compile a template, reusing the compiled form while the
+    template's contents stay the same
+    """
+    with open(template_file, 'r', encoding='utf-8') as f:
+        template_text = f.read()
+    
+    key = hash_bytes(template_text)
+    if key not in _COMPILED_TEMPLATES:
+        _COMPILED_TEMPLATES[key] = CompiledTemplate.compile(template_text)
+    return _COMPILED_TEMPLATES[key]
+
+# CSS optimization: every style source is parsed into one stylesheet in
+# cascade order, deduplicated, pruned against the final page and minified
+_CSS_SCAN_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{};]')
+_CSS_COMMENT_PATTERN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.DOTALL)
+_CSS_GROUP_RULE_PATTERN = re.compile(r'@(?:-\w+-)?(?:media|supports|document|layer|container)\b', re.IGNORECASE)
+_CSS_KEYFRAMES_PATTERN = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)', re.IGNORECASE)
+_CSS_PSEUDO_PATTERN = re.compile(r'::?[\w-]+(?:\([^()]*(?:\([^()]*\)[^()]*)*\))?')
+_CSS_ATTRIBUTE_PATTERN = re.compile(r'\[[^\]]*\]')
+_CSS_TYPE_PATTERN = re.compile(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)')
+_CSS_NAME_PATTERN = re.compile(r'[\w-]+')
+_JS_STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`')
+_STYLE_BLOCK_PATTERN = re.compile(r'<style[^>]*>(.*?)</style>', re.DOTALL | re.IGNORECASE)
+
+def _split_css(text, separator):
+    """Split on a separator outside strings, parentheses and brackets"""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote and text[index - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:index])
+            start = index + 1
+    parts.append(text[start:])
+    return parts
+
+def _css_block_end(css, position):
+    """Index of the } closing the block that starts at position"""
+    depth = 1
+    for match in _CSS_SCAN_PATTERN.finditer(css, position):
+        if match.group() == '{':
+            depth += 1
+        elif match.group() == '}':
+            depth -= 1
+            if depth == 0:
+                return match.start()
+    return len(css)
+
+def parse_css(css, position=0):
+    """
+    Parse CSS into nodes: ('rule', selectors, declarations),
+    ('group', prelude, children) for @media and friends,
+    ('keyframes', prelude, name, children) and ('statement', text)
+    for @import/@charset. Returns (nodes, end position).
+    """
+    nodes = []
+    start = position
+    while True:
+        match = _CSS_SCAN_PATTERN.search(css, position)
+        if match is None:
+            if css[start:].strip():
+                nodes.append(('statement', css[start:].strip()))
+            return nodes, len(css)
+        token = match.group()
+        position = match.end()
+        if token[0] in '"\'':
+            continue
+        
+        text = css[start:match.start()].strip()
+        if token == ';':
+            if text:
+                nodes.append(('statement', text))
+        elif token == '}':
+            return nodes, position
+        elif _CSS_GROUP_RULE_PATTERN.match(text):
+            children, position = parse_css(css, position)
+            nodes.append(('group', text, children))
+        else:
+            end = _css_block_end(css, position)
+            keyframes = _CSS_KEYFRAMES_PATTERN.match(text)
+            if keyframes:
+                children, _ = parse_css(css[position:end])
+                nodes.append(('keyframes', text, keyframes.group(1), children))
+            else:
+                nodes.append(('rule', text, css[position:end]))
+            position = end + 1
+        start = position
+
+def _minify_selectors(selectors):
+    parts = []
+    for selector in _split_css(selectors, ','):
+        selector = ' '.join(selector.split())
+        selector = re.sub(r'\s*([>+~])\s*', r'\1', selector)
+        parts.append(selector)
+    return ','.join(part for part in parts if part)
+
+def _minify_declarations(declarations):
+    minified = []
+    for declaration in _split_css(declarations, ';'):
+        name, colon, value = declaration.partition(':')
+        if not colon:
+            continue
+        value = ' '.join(value.split())
+        value = ','.join(part.strip() for part in _split_css(value, ','))
+        value = value.replace(' !important', '!important')
+        minified.append(f"{name.strip()}:{value}")
+    return ';'.join(minified)
+
+def serialize_css(nodes):
+    """Write nodes back out as minified CSS"""
+    out = []
+    for node in nodes:
+        if node[0] == 'rule':
+            out.append(f"{_minify_selectors(node[1])}{{{_minify_declarations(node[2])}}}")
+        elif node[0] == 'group':
+            out.append(f"{' '.join(node[1].split())}{{{serialize_css(node[2])}}}")
+        elif node[0] == 'keyframes':
+            out.append(f"{' '.join(node[1].split())}{{{serialize_css(node[3])}}}")
+        else:
+            out.append(f"{' '.join(node[1].split())};")
+    return ''.join(out)
+
+class DocumentNames(HTMLParser):
+    """Tags, classes and ids used by a page, plus the words in its script strings"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.tags = set(['html', 'body'])
+        self.classes = set()
+        self.ids = set()
+        self.script_words = set()
+        self.in_script = False
+    
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == 'class' and value:
+                self.classes.update(value.split())
+            elif name == 'id' and value:
+                self.ids.add(value)
+        self.in_script = tag == 'script'
+    
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self.in_script = False
+    
+    def handle_data(self, data):
+        if self.in_script:
+            self.add_script(data)
+    
+    def add_script(self, source):
+        """Any word inside a JS string literal may become a class, id, tag or animation"""
+        for literal in _JS_STRING_PATTERN.findall(source):
+            self.script_words.update(_CSS_NAME_PATTERN.findall(literal))
+    
+    def selector_may_match(self, selector):
+        """
+        False only if the selector needs a tag, class or id the page never
+        has. Pseudo-classes and attribute selectors are ignored, which can
+        only make a selector look like it matches more.
+        """
+        if '\\' in selector:
+            return True
+        simplified = _CSS_ATTRIBUTE_PATTERN.sub('', _CSS_PSEUDO_PATTERN.sub('', selector))
+        for name in re.findall(r'\.([\w-]+)', simplified):
+            if name not in self.classes and name not in self.script_words:
+                return False
+        for name in re.findall(r'#([\w-]+)', simplified):
+            if name not in self.ids and name not in self.script_words:
+                return False
+        for name in _CSS_TYPE_PATTERN.findall(re.sub(r'[.#][\w-]+', ' ', simplified)):
+            name = name.lower()
+            if name not in self.tags and name not in self.script_words:
+                return False
+        return True
+
+def _rename_animations(declarations, renames):
+    def rename(match):
+        return renames.get(match.group(0), match.group(0))
+    parts = []
+    for declaration in _split_css(declarations, ';'):
+        name, colon, value = declaration.partition(':')
+        if colon and name.strip().lower() in ('animation', 'animation-name'):
+            declaration = name + colon + _CSS_NAME_PATTERN.sub(rename, value)
+        parts.append(declaration)
+    return ';'.join(parts)
+
+def _used_animations(nodes, names):
+    for node in nodes:
+        if node[0] == 'rule':
+            for declaration in _split_css(node[2], ';'):
+                name, colon, value = declaration.partition(':')
+                if colon and name.strip().lower() in ('animation', 'animation-name'):
+                    names.update(_CSS_NAME_PATTERN.findall(value))
+        elif node[0] == 'group':
+            _used_animations(node[2], names)
+    return names
+
+def optimize_css(css_sources, document):
+    """
+    Combine CSS sources (in cascade order) into one minified stylesheet.
+    Identical @keyframes are merged under the first name, repeated rules
+    keep only their last copy, and selectors that cannot match `document`
+    (a DocumentNames) are dropped along with keyframes nothing uses.
+    Returns (nodes, stats).
+    """
+    stats = {'keyframes': 0, 'rules': 0, 'selectors': 0}
+    nodes = []
+    for css in css_sources:
+        nodes.extend(parse_css(_CSS_COMMENT_PATTERN.sub(lambda m: m.group(1) or '', css))[0])
+    
+    # Identical keyframes: later copies of a name win, equal bodies share one name
+    last_keyframes = {}
+    for index, node in enumerate(nodes):
+        if node[0] == 'keyframes':
+            last_keyframes[node[2]] = index
+    renames = {}
+    by_body = {}
+    for name, index in sorted(last_keyframes.items(), key=lambda item: item[1]):
+        body = serialize_css(nodes[index][3])
+        if body in by_body and name not in document.script_words:
+            renames[name] = by_body[body]
+        else:
+            by_body[body] = name
+    kept_keyframes = set(last_keyframes[name] for name in by_body.values())
+    stats['keyframes'] = sum(1 for node in nodes if node[0] == 'keyframes') - len(kept_keyframes)
+    
+    def rebuild(nodes, top_level):
+        result = []
+        for index, node in enumerate(nodes):
+            if node[0] == 'keyframes' and top_level and index not in kept_keyframes:
+                continue
+            if node[0] == 'rule' and not node[1].startswith('@'):
+                selectors = [selector for selector in _split_css(node[1], ',')
+                             if document.selector_may_match(selector.strip())]
+                stats['selectors'] += len(_split_css(node[1], ',')) - len(selectors)
+                if not selectors:
+                    continue
+                declarations = _rename_animations(node[2], renames) if renames else node[2]
+                node = ('rule', ','.join(selectors), declarations)
+            elif node[0] == 'group':
+                children = rebuild(node[2], False)
+                if not children:
+                    continue
+                node = ('group', node[1], children)
+            result.append(node)
+        
+        # Repeated identical rules: only the last copy matters to the cascade
+        seen = set()
+        deduplicated = []
+        for node in reversed(result):
+            key = serialize_css([node])
+            if node[0] == 'rule' and key in seen:
+                stats['rules'] += 1
+                continue
+            seen.add(key)
+            deduplicated.append(node)
+        return deduplicated[::-1]
+    
+    nodes = rebuild(nodes, True)
+    
+    # Keyframes nothing refers to any more
+    used = _used_animations(nodes, set()) | document.script_words
+    unused = [node for node in nodes if node[0] == 'keyframes' and node[2] not in used]
+    stats['keyframes'] += len(unused)
+    nodes = [node for node in nodes if not (node[0] == 'keyframes' and node[2] not in used)]
+    return nodes, stats
+
+def critical_css(nodes, document):
+    """The rules that can match `document` (the top of the page) plus what they need"""
+    def select(nodes):
+        result = []
+        for node in nodes:
+            if node[0] == 'rule' and not node[1].startswith('@'):
+                selectors = [selector for selector in _split_css(node[1], ',')
+                             if document.selector_may_match(selector.strip())]
+                if selectors:
+                    result.append(('rule', ','.join(selectors), node[2]))
+            elif node[0] == 'group':
+                children = select(node[2])
+                if children:
+                    result.append(('group', node[1], children))
+            elif node[0] != 'keyframes':
+                result.append(node)
+        return result
+    
+    selected = select(nodes)
+    used = _used_animations(selected, set())
+    return [node for node in nodes if node[0] == 'keyframes' and node[2] in used] + selected
+
+def document_names(page_html, script_files=()):
+    """Collect the names a page (and its external scripts) can use"""
+    names = DocumentNames()
+    names.feed(page_html)
+    names.close()
+    for script_file in script_files:
+        try:
+            names.add_script(Path(script_file).read_text(encoding='utf-8'))
+        except OSError:
+            pass
+    return names
+
+def optimize_page_css(page_html, head_injection, css_file, script_file, output_file, critical=False):
+    """
+    Replace the page's linked stylesheet and injected <style> blocks with
+    one optimized stylesheet written next to output_file as <name>.min.css.
+    With critical set, the rules that can match the top of the page (up to
+    the first ## heading) are inlined and the full stylesheet loads without
+    blocking rendering. Returns (page_html, report dict).
+    """
+    sources = []
+    try:
+        sources.append(Path(css_file).read_text(encoding='utf-8'))
+    except OSError as e:
+        print(f"Warning: Could not read {css_file}: {e}")
+    sources.extend(_STYLE_BLOCK_PATTERN.findall(head_injection))
+    
+    nodes, stats = optimize_css(sources, document_names(page_html, [script_file]))
+    stylesheet = serialize_css(nodes)
+    css_path = Path(output_file).with_name(f"{Path(output_file).stem}.min.css")
+    write_if_changed(css_path, stylesheet)
+    
+    stats['before'] = sum(len(source.encode('utf-8')) for source in sources)
+    stats['after'] = len(stylesheet.encode('utf-8'))
+    stats['file'] = str(css_path)
+    
+    tags = f'<link rel="stylesheet" href="{css_path.name}">'
+    if critical:
+        content_start = page_html.find('class="manual-content"')
+        fold = page_html.find('<h2', max(content_start, 0))
+        top = page_html[:fold] if fold != -1 else page_html
+        inline = serialize_css(critical_css(nodes, document_names(top, [script_file])))
+        stats['critical'] = len(inline.encode('utf-8'))
+        tags = (f'<style>{inline}</style>\n'
+                f'    <link rel="preload" href="{css_path.name}" as="style" '
+                f'onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+                f'    <noscript>{tags}</noscript>')
+    
+    link_pattern = re.compile(r'<link rel="stylesheet" href="' + re.escape(Path(css_file).name) + r'">')
+    if head_injection:
+        page_html = page_html.replace(head_injection, '', 1)
+    page_html, replaced = link_pattern.subn(lambda match: tags, page_html, count=1)
+    if not replaced:
+        head_end = page_html.rfind('</head>')
+        page_html = page_html[:head_end] + f"    {tags}\n" + page_html[head_end:]
+    
+    return page_html, stats
+
+# Search index: headings, table rows and diagram patches of the converted
+# HTML, as a sorted term list with delta-encoded postings. script.js finds
+# a prefix's term range by binary search, so nothing is scanned at runtime.
+SEARCH_SLOT = 'SEARCH_INDEX'
+SEARCH_MODES = ('inline', 'file', 'off')
+SEARCH_HEADING, SEARCH_PATCH, SEARCH_ROW = 0, 1, 2
+# Row descriptions are cut to this length; results show one line anyway
+SEARCH_CONTEXT_CHARS = 100
+_SEARCH_TOKEN_PATTERN = re.compile(
+    r'<h([1-6])((?:\s[^>]*)?)>(.*?)</h\1>|<tr>(.*?)</tr>|<div class="pedal-diagram-container">',
+    re.DOTALL
+)
+_SEARCH_ID_PATTERN = re.compile(r'\sid="([^"]*)"')
+_SEARCH_CELL_PATTERN = re.compile(r'<td\b[^>]*>(.*?)</td>', re.DOTALL)
+_SEARCH_TAG_PATTERN = re.compile(r'<[^>]+>')
+_SEARCH_TERM_PATTERN = re.compile(r'[^\W_]+')
+
+def _search_text(fragment):
+    """Visible text of an HTML fragment, whitespace collapsed"""
+    return ' '.join(html.unescape(_SEARCH_TAG_PATTERN.sub(' ', fragment)).split())
+
+def search_terms(text):
+    """Lowercased words with accents removed; the same rule as script.js"""
+    folded = text.lower()
+    if not folded.isascii():
+        import unicodedata
+        folded = ''.join(character for character in unicodedata.normalize('NFKD', folded)
+                         if not unicodedata.category(character).startswith('M'))
+    return _SEARCH_TERM_PATTERN.findall(folded)
+
+def _heading_slug(text):
+    """An id for headings the fallback parser leaves without one"""
+    return re.sub(r'[-\s]+', '-', re.sub(r'[^\w\s-]', '', text).strip().lower())
+
+def build_search_index(html_content, patches=()):
+    """
+    Walk converted HTML and index its headings, table body rows and
+    diagrams (named from `patches`, in document order). Headings without
+    an id, indexed rows and diagrams get one so every result has an anchor.
+    Each entry is [kind, title, anchor, context, parent], parent being the
+    entry of the enclosing heading (or -1) so section titles are stored
+    once. Returns (html_content, index dict).
+    """
+    docs = []
+    postings = {}
+    used_ids = set(_SEARCH_ID_PATTERN.findall(html_content))
+    patches = iter(patches)
+    headings = []
+    section, section_anchor = -1, ''
+    row_counts = {}
+    pieces = []
+    position = 0
+    
+    def add(kind, title, anchor, context, parent, text):
+        for term in set(search_terms(text)):
+            postings.setdefault(term, []).append(len(docs))
+        if len(context) > SEARCH_CONTEXT_CHARS:
+            context = context[:SEARCH_CONTEXT_CHARS - 1].rstrip() + '…'
+        docs.append([kind, title, anchor, context, parent])
+    
+    for match in _SEARCH_TOKEN_PATTERN.finditer(html_content):
+        level, attributes, inner, row = match.group(1), match.group(2), match.group(3), match.group(4)
+        replacement = None
+        if level:
+            title = _search_text(inner)
+            id_match = _SEARCH_ID_PATTERN.search(attributes or '')
+            if id_match:
+                anchor = id_match.group(1)
+            else:
+                anchor = _unique_heading_id(_heading_slug(title), used_ids)
+                replacement = f'<h{level}{attributes} id="{anchor}">{inner}</h{level}>'
+            # The parent is the enclosing heading, e.g. the patch a "Settings" heading belongs to
+            depth = int(level)
+            headings = [heading for heading in headings if heading[0] < depth]
+            section, section_anchor = len(docs), anchor
+            add(SEARCH_HEADING, title, anchor, '', headings[-1][1] if headings else -1, title)
+            headings.append((depth, section))
+        elif row is not None:
+            cells = [_search_text(cell) for cell in _SEARCH_CELL_PATTERN.findall(row)]
+            if not any(cells):
+                continue
+            row_counts[section_anchor] = row_counts.get(section_anchor, 0) + 1
+            anchor = _unique_heading_id(f"{section_anchor or 'row'}-row-{row_counts[section_anchor]}",
+                                        used_ids)
+            replacement = f'<tr id="{anchor}">{row}</tr>'
+            add(SEARCH_ROW, cells[0] or cells[-1], anchor, ' · '.join(filter(None, cells[1:])),
+                section, ' '.join(cells))
+        else:
+            name = next(patches, None)
+            if name is None:
+                continue
+            anchor = _unique_heading_id(f"{_heading_slug(name) or 'patch'}-diagram", used_ids)
+            replacement = f'<div class="pedal-diagram-container" id="{anchor}">'
+            add(SEARCH_PATCH, name, anchor, '', section, name)
+        
+        if replacement is not None:
+            pieces.append(html_content[position:match.start()])
+            pieces.append(replacement)
+            position = match.end()
+    pieces.append(html_content[position:])
+    
+    terms = sorted(postings)
+    encoded = []
+    for term in terms:
+        previous = 0
+        deltas = []
+        for doc in postings[term]:
+            deltas.append(doc - previous)
+            previous = doc
+        encoded.append(deltas)
+    return ''.join(pieces), {'docs': docs, 'terms': terms, 'postings': encoded}
+
+def search_index_path(output_file):
+    """Where --search file writes the index: <output stem>.search.json"""
+    return Path(output_file).with_name(f"{Path(output_file).stem}.search.json")
+
+# The search box, shown by script.js once the page has an index
+SEARCH_BOX = """    <div class="manual-search" id="manual-search" role="search" hidden>
+        <input type="search" id="search-input" placeholder="Search the manual (press /)" autocomplete="off"
+               spellcheck="false" aria-label="Search the manual" aria-controls="search-results">
+        <ul class="search-results" id="search-results" role="listbox" hidden></ul>
+    </div>
+"""
+
+def search_index_html(index, mode, output_file):
+    """
+    The markup for the search slot: the search box plus the JSON inline,
+    or a reference to the index file, which is written here
+    """
+    payload = json.dumps(index, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    if mode == 'file':
+        index_path = search_index_path(output_file)
+        write_if_changed(index_path, payload)
+        return (f'{SEARCH_BOX}    <script type="application/json" id="search-index" '
+                f'data-src="{index_path.name}"></script>\n')
+    # Keep the JSON from closing the script element early
+    payload = payload.replace('</', '<\\/')
+    return f'{SEARCH_BOX}    <script type="application/json" id="search-index">{payload}</script>\n'
+
+# Multi-page output: the converted HTML split at its ## headings into one
+# page per section. Every page is the same rendered template around its
+# own section, so the stylesheet, script and fonts are shared and cached.
+SPLIT_PAGE_SUFFIX = '.html'
+# Every split page has the pager, so leftovers from earlier builds can be told apart
+_PAGE_PAGER_MARKER = '<nav class="page-pager"'
+# Up to this many pages every page lists them all; beyond it only the first
+# page carries the contents and the others link back to it
+SPLIT_TOC_PAGES = 40
+# Longer page reports list only the heaviest pages and those over budget
+REPORT_PAGE_ROWS = 20
+_SPLIT_PATTERN = re.compile(r'(?=<h2[\s>])')
+_SPLIT_HEADING_PATTERN = re.compile(r'<h([12])((?:\s[^>]*)?)>(.*?)</h\1>', re.DOTALL)
+_LOCAL_LINK_PATTERN = re.compile(r'(<a\s[^>]*?href=")#([^"]+)"')
+_TITLE_PATTERN = re.compile(r'<title>(.*?)</title>', re.DOTALL)
+_DATA_URI_PATTERN = re.compile(r'data:[^"\s]+')
+
+def split_manual_pages(html_content, output_file):
+    """
+    Split converted HTML at its ## headings. Text before the first one
+    becomes the first page, written to output_file; when there is none
+    the first section is. The other pages are named <stem>-<heading id>.html.
+    Links to anchors on another page are rewritten to point there, and
+    pages with inline SVG diagrams get their own copy of the sprite.
+    Returns a list of {'name', 'title', 'content'} dicts in page order.
+    """
+    chunks = _SPLIT_PATTERN.split(html_content)
+    if len(chunks) > 1 and not _search_text(chunks[0]):
+        chunks[1] = chunks[0] + chunks[1]
+        chunks = chunks[1:]
+    
+    stem = Path(output_file).stem
+    used_stems = {stem}
+    pages = []
+    for number, chunk in enumerate(chunks):
+        heading = _SPLIT_HEADING_PATTERN.search(chunk)
+        title = _search_text(heading.group(3)) if heading else "Overview"
+        if number == 0:
+            name = Path(output_file).name
+        else:
+            id_match = _SEARCH_ID_PATTERN.search(heading.group(2) or '') if heading else None
+            slug = id_match.group(1) if id_match else _heading_slug(title) or f"page-{number}"
+            name = _unique_heading_id(f"{stem}-{slug}", used_stems) + SPLIT_PAGE_SUFFIX
+        pages.append({'name': name, 'title': title, 'content': chunk})
+    
+    for page in pages:
+        if 'id="eb-chassis"' in page['content']:
+            continue
+        if CLIENT_DIAGRAM_CLASS in page['content']:
+            page['content'] = svg_diagram_sprite(geometry=True) + page['content']
+        elif '<use href="#eb-chassis"/>' in page['content']:
+            page['content'] = svg_diagram_sprite() + page['content']
+    
+    anchor_pages = {}
+    for page in pages:
+        for anchor in _SEARCH_ID_PATTERN.findall(page['content']):
+            anchor_pages.setdefault(anchor, page['name'])
+    
+    for page in pages:
+        def relink(match, name=page['name']):
+            target = anchor_pages.get(match.group(2), name)
+            return match.group(0) if target == name else f'{match.group(1)}{target}#{match.group(2)}"'
+        page['content'] = _LOCAL_LINK_PATTERN.sub(relink, page['content'])
+    return pages
+
+def page_anchors(pages):
+    """Map every id in the pages to '<page>#<id>'"""
+    anchors = {}
+    for page in pages:
+        for anchor in _SEARCH_ID_PATTERN.findall(page['content']):
+            anchors.setdefault(anchor, f"{page['name']}#{anchor}")
+    return anchors
+
+def page_navigation(pages, number):
+    """
+    The contents list and previous/next links for page `number`, as
+    (markup before the section, markup after it)
+    """
+    page = pages[number]
+    contents = ''
+    if number == 0 or len(pages) <= SPLIT_TOC_PAGES:
+        items = []
+        for other in pages:
+            current = ' aria-current="page"' if other is page else ''
+            items.append(f'<li><a href="{other["name"]}"{current}>{html.escape(other["title"])}</a></li>')
+        contents = (f'<nav class="manual-pages" id="manual-pages" aria-label="Manual sections">'
+                    f'<ol>{"".join(items)}</ol></nav>\n')
+    
+    links = []
+    if number > 0:
+        previous = pages[number - 1]
+        links.append(f'<a class="page-prev" href="{previous["name"]}" rel="prev">← '
+                     f'{html.escape(previous["title"])}</a>')
+    if not contents:
+        links.append(f'<a class="page-contents" href="{pages[0]["name"]}#manual-pages">Contents</a>')
+    if number < len(pages) - 1:
+        following = pages[number + 1]
+        links.append(f'<a class="page-next" href="{following["name"]}" rel="next">'
+                     f'{html.escape(following["title"])} →</a>')
+    pager = f'\n<nav class="page-pager" aria-label="Pages">{"".join(links)}</nav>' if links else ''
+    return contents, pager
+
+def write_pages(page_html, sections, pages, output_file):
+    """
+    Cut the rendered page around its joined sections and write one file per
+    page next to output_file, each only when its bytes changed. Returns
+    (whether any page was written, sha256 over all pages, weight rows).
+    """
+    content = ''.join(sections)
+    start = page_html.find(content)
+    if start == -1:
+        raise ValueError("Page content was changed after rendering - cannot split it into pages")
+    prefix, suffix = page_html[:start], page_html[start + len(content):]
+    
+    directory = Path(output_file).parent
+    written = False
+    digest = hashlib.sha256()
+    rows = []
+    for number, (page, section) in enumerate(zip(pages, sections)):
+        text = page_head(prefix, pages, number) + section + suffix
+        written = write_if_changed(directory / page['name'], text) or written
+        digest.update(text.encode('utf-8'))
+        rows.append(page_weight(page['name'], text))
+    return written, digest.hexdigest(), rows
+
+def remove_stale_pages(output_file, pages, previous=()):
+    """
+    Delete split pages next to output_file left over from earlier builds:
+    the previous build's pages and any <stem>-*.html with a page pager
+    that the current pages (None when not splitting) no longer include.
+    Returns the names removed.
+    """
+    directory = Path(output_file).parent
+    current = {page['name'] for page in pages or []} | {Path(output_file).name}
+    candidates = {directory / name for name in previous}
+    for path in directory.glob(f"{Path(output_file).stem}-*{SPLIT_PAGE_SUFFIX}"):
+        try:
+            if _PAGE_PAGER_MARKER in path.read_text(encoding='utf-8'):
+                candidates.add(path)
+        except (OSError, UnicodeDecodeError):
+            pass
+    removed = []
+    for path in sorted(candidates):
+        if path.name in current:
+            continue
+        try:
+            path.unlink()
+            removed.append(path.name)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not remove stale page {path}: {e}")
+    return removed
+
+def page_head(page_prefix, pages, number):
+    """The rendered page up to the section, with its own title and a prefetch of the next page"""
+    if number > 0:
+        page_prefix = _TITLE_PATTERN.sub(
+            lambda match: f"<title>{html.escape(pages[number]['title'])} · {match.group(1)}</title>",
+            page_prefix, count=1)
+    if number < len(pages) - 1:
+        head_end = page_prefix.rfind('</head>')
+        if head_end != -1:
+            page_prefix = (page_prefix[:head_end] + f'    <link rel="prefetch" href="{pages[number + 1]["name"]}">\n'
+                           + page_prefix[head_end:])
+    return page_prefix
+
+def report_page_weights(rows, budget=None):
+    """
+    Print one row per page: raw and gzipped size, inline image bytes and
+    element count. budget is a limit in bytes on each page's raw size;
+    returns False when a page exceeds it.
+    """
+    over = [row['name'] for row in rows if budget is not None and row['raw'] > budget]
+    shown = rows
+    if len(rows) > REPORT_PAGE_ROWS:
+        heaviest = {row['name'] for row in sorted(rows, key=lambda row: -row['raw'])[:REPORT_PAGE_ROWS // 2]}
+        shown = [row for row in rows if row['name'] in heaviest or row['name'] in over]
+    
+    print("📑 Pages" + (f" (the {len(shown)} heaviest of {len(rows)})" if shown is not rows else ""))
+    print(f"   {'page':<40}{'raw KB':>9}{'gzip KB':>9}{'images KB':>11}{'elements':>10}")
+    for row in shown:
+        marker = " ❌" if row['name'] in over else ""
+        print(f"   {row['name'][:39]:<40}{row['raw'] / 1024:>9.1f}{row['gzip'] / 1024:>9.1f}"
+              f"{row['images'] / 1024:>11.1f}{row['elements']:>10,}{marker}")
+    largest = max(rows, key=lambda row: row['raw'])
+    print(f"   {len(rows)} pages, largest {largest['name']} at {largest['raw'] / 1024:.1f} KB")
+    
+    if budget is None:
+        return True
+    if over:
+        print(f"❌ Page budget exceeded by {len(over)} page{'s' if len(over) > 1 else ''} "
+              f"(budget {budget / 1024:.0f} KB): {', '.join(over)}")
+        return False
+    print(f"   ✅ Every page is within the {budget / 1024:.0f} KB budget")
+    return True
+
+def page_weight(name, page_html):
+    """Size row for report_page_weights"""
+    data = page_html.encode('utf-8')
+    return {
+        'name': name,
+        'raw': len(data),
+        'gzip': len(gzip.compress(data, 6)),
+        'images': sum(len(uri) for uri in _DATA_URI_PATTERN.findall(page_html)),
+        'elements': page_html.count('<') - page_html.count('</') - page_html.count('<!'),
+    }
+
+# Font subsetting: the variable fonts in fonts/ cut down to the characters,
+# weight range and styles the page actually uses
+FONTS_DIR = "fonts"
+FONT_SUBSET_DIR = "subset"
+_FONT_WEIGHT_PATTERN = re.compile(r'font-weight\s*:\s*(\d{3}|bold|normal)', re.IGNORECASE)
+_FONT_ITALIC_PATTERN = re.compile(r'font-style\s*:\s*(?:italic|oblique)', re.IGNORECASE)
+_CSS_CONTENT_PATTERN = re.compile(r'content\s*:\s*("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_FONT_BODY_PATTERN = re.compile(r"--font-body\s*:\s*['\"]([^'\"]+)")
+_GOOGLE_FONTS_PATTERN = re.compile(r'[ \t]*<link\b[^>]*fonts\.(?:googleapis|gstatic)\.com[^>]*>\n?')
+_BOLD_ELEMENTS = {'b', 'strong', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+_ITALIC_ELEMENTS = {'i', 'em', 'cite', 'var', 'dfn'}
+_TEXT_ATTRIBUTES = {'placeholder', 'value', 'title'}
+
+class PageText(HTMLParser):
+    """The characters a page can render, and the tags it uses"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.characters = set()
+        self.tags = set()
+        self.skip = 0
+    
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        if tag in ('script', 'style'):
+            self.skip += 1
+        for name, value in attrs:
+            if name in _TEXT_ATTRIBUTES and value:
+                self.characters.update(value)
+    
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.skip:
+            self.skip -= 1
+    
+    def handle_data(self, data):
+        if not self.skip:
+            self.characters.update(data)
+
+def font_face_info(font_path):
+    """(family, italic, (min, max) weight axis) of a variable font file"""
+    TTFont = lazy_import('fontTools.ttLib').TTFont
+    font = TTFont(font_path, lazy=True)
+    try:
+        names = font['name']
+        family = names.getDebugName(16) or names.getDebugName(1)
+        italic = bool(font['OS/2'].fsSelection & 1)
+        axes = {axis.axisTag: (axis.minValue, axis.maxValue) for axis in font['fvar'].axes}
+    finally:
+        font.close()
+    return family, italic, axes.get('wght')
+
+def subset_font(font_path, characters, weights, flavor):
+    """
+    Subset a variable font to the given characters and limit its weight
+    axis to weights (min, max). Returns the font file bytes in flavor.
+    """
+    TTFont = lazy_import('fontTools.ttLib').TTFont
+    subset = lazy_import('fontTools.subset')
+    instancer = lazy_import('fontTools.varLib.instancer')
+    
+    font = TTFont(font_path)
+    options = subset.Options()
+    options.layout_features = ['*']
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=[ord(character) for character in characters])
+    subsetter.subset(font)
+    # Limit the axis after subsetting; fewer glyphs make it much cheaper
+    low, high = weights
+    font = instancer.instantiateVariableFont(font, {'wght': low if low == high else (low, high)})
+    
+    font.flavor = flavor
+    buf = BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+def used_font_weights(css_sources, tags, axis):
+    """(min, max) weight the page can ask for, clamped to the font's axis"""
+    keywords = {'normal': 400, 'bold': 700}
+    weights = {400}
+    for source in css_sources:
+        for value in _FONT_WEIGHT_PATTERN.findall(source):
+            weights.add(keywords.get(value.lower()) or int(value))
+    if tags & _BOLD_ELEMENTS:
+        weights.add(700)
+    
+    low, high = axis
+    return max(low, min(weights)), min(high, max(weights))
+
+def subset_page_fonts(page_html, css_sources, script_file, output_file, fonts_dir=FONTS_DIR, jobs=1):
+    """
+    Subset the variable fonts in fonts_dir to what page_html uses and write
+    them next to output_file (fonts/subset/). The Google Fonts links are
+    replaced by @font-face rules for the subsets and a preload for the
+    body text face. Returns (page_html, report dict), or (page_html, None)
+    when there is nothing to subset.
+    """
+    text = PageText()
+    text.feed(page_html)
+    text.close()
+    characters = text.characters | set(string.digits) | {' '}
+    try:
+        for literal in _JS_STRING_PATTERN.findall(Path(script_file).read_text(encoding='utf-8')):
+            characters.update(literal[1:-1])
+    except OSError:
+        pass
+    for source in css_sources:
+        for literal in _CSS_CONTENT_PATTERN.findall(source):
+            characters.update(literal[1:-1])
+    characters = ''.join(sorted(character for character in characters
+                                if character.isprintable() or character == ' '))
+    
+    italic_used = bool(text.tags & _ITALIC_ELEMENTS) or any(
+        _FONT_ITALIC_PATTERN.search(source) for source in css_sources)
+    all_css = '\n'.join(css_sources)
+    
+    faces = []
+    for font_path in sorted(Path(fonts_dir).glob('*VariableFont_wght.ttf')):
+        family, italic, axis = font_face_info(font_path)
+        if axis is None or family not in all_css or (italic and not italic_used):
+            continue
+        faces.append((font_path, family, italic, used_font_weights(css_sources, text.tags, axis)))
+    if not faces:
+        return page_html, None
     
-    head_close_index = template_html.rfind('</head>')
-    if head_close_index != -1:
-        return template_html[:head_close_index] + style_tag + template_html[head_close_index:]
+    # WOFF2 needs the brotli module; fall back to zlib-compressed WOFF
+    flavor = 'woff2' if has_capability('brotli') else 'woff'
+    subset_dir = Path(output_file).parent / FONTS_DIR / FONT_SUBSET_DIR
+    url_prefix = Path(os.path.relpath(os.path.abspath(subset_dir),
+                                      os.path.dirname(os.path.abspath(output_file)))).as_posix()
+    
+    # Subsets are named by everything that determines them, so reruns are free
+    outputs = {}
+    to_subset = {}
+    for font_path, family, italic, weights in faces:
+        digest = hashlib.sha256(Path(font_path).read_bytes())
+        digest.update(json.dumps([characters, weights, flavor,
+                                  lazy_import('fontTools').version]).encode('utf-8'))
+        path = subset_dir / f"{font_path.stem}-{digest.hexdigest()[:12]}.{flavor}"
+        outputs[font_path] = path
+        if not path.exists():
+            to_subset[font_path] = (font_path, characters, weights, flavor)
+    
+    if to_subset:
+        subset_dir.mkdir(parents=True, exist_ok=True)
+        if jobs > 1 and len(to_subset) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(jobs, len(to_subset))) as pool:
+                results = dict(zip(to_subset, pool.map(subset_font, *zip(*to_subset.values()))))
+        else:
+            results = {font_path: subset_font(*args) for font_path, args in to_subset.items()}
+        for font_path, data in results.items():
+            outputs[font_path].write_bytes(data)
+    
+    body_family = _FONT_BODY_PATTERN.search(all_css)
+    body_family = body_family.group(1) if body_family else faces[0][1]
+    rules = []
+    preload = ''
+    report = {'faces': [], 'characters': len(characters), 'flavor': flavor,
+              'subset_bytes': 0, 'source_bytes': 0, 'subset': len(to_subset)}
+    for font_path, family, italic, weights in faces:
+        url = f"{url_prefix}/{outputs[font_path].name}"
+        weight = str(weights[0]) if weights[0] == weights[1] else f"{weights[0]} {weights[1]}"
+        rules.append(f"@font-face {{ font-family: '{family}'; "
+                     f"src: url('{url}') format('{flavor}'); font-weight: {weight}; "
+                     f"font-style: {'italic' if italic else 'normal'}; font-display: swap; }}")
+        if family == body_family and not italic:
+            preload = (f'<link rel="preload" href="{url}" as="font" '
+                       f'type="font/{flavor}" crossorigin>\n    ')
+        size = outputs[font_path].stat().st_size
+        report['faces'].append((font_path.name, Path(font_path).stat().st_size, size, weight))
+        report['source_bytes'] += Path(font_path).stat().st_size
+        report['subset_bytes'] += size
+    report['fonts_dir_bytes'] = sum(path.stat().st_size for path in Path(fonts_dir).glob('*.ttf'))
+    
+    tags = preload + "<style>\n        " + "\n        ".join(rules) + "\n    </style>\n"
+    match = _GOOGLE_FONTS_PATTERN.search(page_html)
+    if match:
+        indent = match.group(0)[:len(match.group(0)) - len(match.group(0).lstrip())]
+        page_html = (page_html[:match.start()] + indent + tags
+                     + _GOOGLE_FONTS_PATTERN.sub('', page_html[match.start():]))
     else:
-        print("Warning: No </head> tag found in template. Button styles may not work correctly.")
-        return template_html
+        head_end = page_html.rfind('</head>')
+        page_html = page_html[:head_end] + "    " + tags + page_html[head_end:]
+    return page_html, report
 
-def inject_diagram_styles(template_html):
+def prepare_shared_inputs(template_file="template.html", favicon_file="favicon.svg", run_stage=None,
+                          buttons_dir='.'):
     """
-    Inject diagram-specific CSS styles that match the LUFS aesthetic
+    Read the template and fill in everything that does not depend on the
+    manual: buttons, favicon, button styles and diagram styles. Returns a
+    dict with the compiled page template (only {{MARKDOWN_CONTENT}} and
+    {{SEARCH_INDEX}} left) so it can be shared across many manuals.
     """
-    diagram_styles = """
-    <!-- Pedal Diagram Styles -->
-    <style>
-    .pedal-diagram-container {
-        display: flex;
-        justify-content: center;
-        margin: var(--spacing-lg) 0;
-        padding: var(--spacing-md);
-        background: var(--lufs-black);
-        border: 2px solid var(--lufs-teal);
-        border-radius: 0;
-    }
+    if run_stage is None:
+        run_stage = lambda name, inputs, compute: compute()
     
-    .pedal-diagram {
-        max-width: 100%;
-        height: auto;
-        border: 1px solid var(--lufs-teal);
-        border-radius: 0;
-        background: var(--lufs-black);
-        image-rendering: crisp-edges;
-        image-rendering: -moz-crisp-edges;
-        image-rendering: pixelated;
-    }
+    # Compiled HTML template
+    template = load_template(template_file)
     
-    /* Responsive diagram sizing */
-    @media (max-width: 768px) {
-        .pedal-diagram-container {
-            padding: var(--spacing-sm);
-        }
-        
-        .pedal-diagram {
-            max-width: 90%;
-        }
-    }
+    # Collect button content and styles from separate HTML files
+    button_html, button_styles = run_stage('buttons', {
+        str(path): hash_file(path) for path in find_button_files(buttons_dir)
+    }, lambda: list(collect_button_content(buttons_dir)))
     
-    @media (max-width: 480px) {
-        .pedal-diagram {
-            max-width: 85%;
-        }
-    }
-    </style>
-"""
+    # Get favicon SVG content
+    favicon_svg = run_stage('favicon', {
+        'favicon': hash_file(favicon_file),
+    }, lambda: get_favicon_svg(favicon_file))
     
-    head_close_index = template_html.rfind('</head>')
-    if head_close_index != -1:
-        return template_html[:head_close_index] + diagram_styles + template_html[head_close_index:]
-    else:
+    if HEAD_SLOT not in template.slots:
+        if button_styles:
+            print("Warning: No </head> tag found in template. Button styles may not work correctly.")
         print("Warning: No </head> tag found in template. Diagram styles may not work correctly.")
-        return template_html
+    
+    # Fill every slot except the markdown content; button and diagram
+    # styles go into the head injection slot
+    head_injection = button_styles_tag(button_styles) + DIAGRAM_STYLES
+    page_template = template.bind(
+        BUTTON_CONTENT=button_html,
+        FAVICON_SVG=favicon_svg,
+        HEAD_INJECTION=head_injection
+    )
+    
+    return {'page_template': page_template, 'has_buttons': bool(button_html),
+            'head_injection': head_injection if HEAD_SLOT in template.slots else ''}
+
+BUILD_CACHE_DIR = ".build-cache"
+
+def hash_bytes(data):
+    """SHA-256 hex digest of bytes or text"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(file_path):
+    """SHA-256 of a file's contents, or None if it does not exist"""
+    try:
+        return hash_bytes(Path(file_path).read_bytes())
+    except OSError:
+        return None
+
+class BuildManifest:
+    """
+    Records a content hash for every build input and every stage output,
+    and stores stage outputs so that stages whose inputs did not change
+    can be skipped on the next build of the same output file.
+    """
+
+    # Stage outputs kept in memory across rebuilds of a resident process (--watch)
+    _memory = {}
+
+    def __init__(self, output_file, build_dir=BUILD_CACHE_DIR):
+        self.build_dir = Path(build_dir)
+        output_id = hash_bytes(str(Path(output_file).resolve()))[:16]
+        self.path = self.build_dir / f"manifest-{output_id}.json"
+        self.skipped = []
+        self.ran = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault('inputs', {})
+        self.data.setdefault('stages', {})
+        
+        # Stored stage outputs are only valid for the builder that produced them
+        builder = hash_file(__file__)
+        if self.data.get('builder') != builder:
+            self.data['builder'] = builder
+            self.data['stages'] = {}
+
+    def record_inputs(self, file_paths):
+        """Store the content hash of each input file"""
+        self.data['inputs'] = {str(path): hash_file(path) for path in file_paths}
+
+    def _blob_path(self, output_hash):
+        return self.build_dir / 'stages' / f"{output_hash}.json"
+
+    def run(self, name, inputs, compute, valid=None):
+        """
+        Return the stored output of stage `name` if its inputs hash the same
+        as last time, otherwise compute it and store the new output.
+        `valid` can reject a stored output (e.g. when files it refers to are gone).
+        """
+        key = hash_bytes(json.dumps(inputs, sort_keys=True))
+        previous = self.data['stages'].get(name)
+        
+        if previous and previous.get('key') == key:
+            output = self._load(previous['output'])
+            if output is not None and (valid is None or valid(output)):
+                self.skipped.append(name)
+                return output
+        
+        output = compute()
+        encoded = json.dumps(output, sort_keys=True)
+        output_hash = hash_bytes(encoded)
+        self._store(output_hash, encoded, output)
+        self.data['stages'][name] = {'key': key, 'output': output_hash}
+        self.ran.append(name)
+        return output
+
+    def previous(self, name):
+        """The last stored output of stage `name`, whatever its inputs were"""
+        stage = self.data['stages'].get(name)
+        return self._load(stage['output']) if stage else None
+
+    def _load(self, output_hash):
+        if output_hash in self._memory:
+            return self._memory[output_hash]
+        try:
+            with open(self._blob_path(output_hash), 'r', encoding='utf-8') as f:
+                output = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._memory[output_hash] = output
+        return output
+
+    def _store(self, output_hash, encoded, output):
+        self._memory[output_hash] = output
+        blob_path = self._blob_path(output_hash)
+        if blob_path.exists():
+            return
+        try:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            blob_path.write_text(encoded, encoding='utf-8')
+        except OSError as e:
+            print(f"Warning: Could not store {blob_path}: {e}")
+
+    def save(self, output_hash):
+        """Write the manifest and drop stage outputs it no longer references"""
+        self.data['output'] = output_hash
+        try:
+            self.build_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"Warning: Could not write build manifest: {e}")
+            return
+        
+        referenced = set()
+        for manifest_path in self.build_dir.glob('manifest-*.json'):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    stages = json.load(f).get('stages', {})
+            except (OSError, ValueError):
+                continue
+            referenced.update(stage['output'] for stage in stages.values())
+        for blob_path in (self.build_dir / 'stages').glob('*.json'):
+            if blob_path.stem not in referenced:
+                blob_path.unlink(missing_ok=True)
+                self._memory.pop(blob_path.stem, None)
+
+def write_if_changed(output_file, content):
+    """
+    Write content to output_file only if the bytes differ, so unchanged
+    builds keep the file's mtime. Returns True if the file was written.
+    """
+    data = content.encode('utf-8')
+    try:
+        if Path(output_file).read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    
+    with open(output_file, 'wb') as f:
+        f.write(data)
+    return True
+
+# Precompressed copies for static hosts that serve .gz/.br files as-is
+PRECOMPRESS_SUFFIXES = {'gzip': '.gz', 'brotli': '.br'}
+
+def _compressors():
+    """Maximum-compression encoders for every available format"""
+    # mtime=0 keeps the gzip header, and so the file, reproducible
+    compressors = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if has_capability('brotli'):
+        brotli = lazy_import('brotli')
+        compressors['brotli'] = lambda data: brotli.compress(data, quality=11)
+    return compressors
+
+def precompress_file(path):
+    """
+    Write path.gz, plus path.br when brotli is installed. Each copy takes
+    the source's mtime, so one with a matching mtime is reused as-is.
+    Returns the raw and compressed sizes (None for a missing format).
+    """
+    path = Path(path)
+    source = path.stat()
+    sizes = {'file': str(path), 'raw': source.st_size, 'gzip': None, 'brotli': None}
+    data = None
+    for name, compress in _compressors().items():
+        target = path.with_name(path.name + PRECOMPRESS_SUFFIXES[name])
+        try:
+            existing = target.stat()
+            if existing.st_mtime_ns == source.st_mtime_ns:
+                sizes[name] = existing.st_size
+                continue
+        except OSError:
+            pass
+        
+        if data is None:
+            data = path.read_bytes()
+        compressed = compress(data)
+        # Batch builds may compress the shared script and favicon concurrently
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+        os.chmod(tmp_path, 0o644)
+        os.utime(tmp_path, ns=(source.st_atime_ns, source.st_mtime_ns))
+        os.replace(tmp_path, target)
+        sizes[name] = len(compressed)
+    return sizes
+
+def precompress_outputs(paths):
+    """
+    Precompress every existing file in paths on a thread pool (zlib and
+    brotli release the GIL). Returns the size rows in the order given.
+    """
+    paths = [Path(path) for path in paths if Path(path).is_file()]
+    if not paths:
+        return []
+    
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        return list(pool.map(precompress_file, paths))
+
+def report_compression(rows, budget=None):
+    """
+    Print raw vs compressed sizes. budget is a limit in bytes on the total
+    gzip size; returns False when it is exceeded.
+    """
+    def size(value):
+        return f"{value:,}" if value is not None else "-"
+    
+    print("🗜️ Precompressed outputs")
+    print(f"   {'file':<36}{'raw':>11}{'gzip':>11}{'ratio':>7}{'brotli':>11}{'ratio':>7}")
+    totals = {'raw': 0, 'gzip': 0, 'brotli': 0}
+    for row in rows + [None]:
+        if row is None:
+            row = dict(totals, file='total', brotli=totals['brotli'] if has_capability('brotli') else None)
+        else:
+            for name in totals:
+                totals[name] += row[name] or 0
+        ratios = [f"{row[name] / row['raw']:.0%}" if row[name] is not None and row['raw'] else "-"
+                  for name in ('gzip', 'brotli')]
+        print(f"   {Path(row['file']).name[:35]:<36}{size(row['raw']):>11}{size(row['gzip']):>11}"
+              f"{ratios[0]:>7}{size(row['brotli']):>11}{ratios[1]:>7}")
+    
+    if budget is None:
+        return True
+    if totals['gzip'] > budget:
+        print(f"❌ Size budget exceeded: {totals['gzip']:,} bytes gzipped, budget {budget:,} bytes")
+        return False
+    print(f"   ✅ Within size budget: {totals['gzip']:,} of {budget:,} bytes gzipped")
+    return True
+
+# Raw bytes per base64 slice; a multiple of 3 so the slices concatenate cleanly
+BASE64_CHUNK_BYTES = 3 * 16 * 1024
+
+def stream_output(output_file, chunks, payloads):
+    """
+    Write a document given as text chunks to output_file without building
+    it in memory. Diagram payload tokens are expanded by base64-encoding the
+    PNG bytes slice by slice directly into the file. The data goes to a temp
+    file that atomically replaces output_file, unless the bytes are
+    unchanged. Returns (written, sha256 of the output).
+    """
+    output_path = Path(output_file)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.",
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            def emit(data):
+                f.write(data)
+                digest.update(data)
+            
+            for chunk in chunks:
+                position = 0
+                for match in DIAGRAM_PAYLOAD_PATTERN.finditer(chunk):
+                    emit(chunk[position:match.start()].encode('utf-8'))
+                    data = payloads[match.group(0)]
+                    for offset in range(0, len(data), BASE64_CHUNK_BYTES):
+                        emit(base64.b64encode(data[offset:offset + BASE64_CHUNK_BYTES]))
+                    position = match.end()
+                emit(chunk[position:].encode('utf-8'))
+        
+        if output_path.is_file() and filecmp.cmp(tmp_path, output_path, shallow=False):
+            os.unlink(tmp_path)
+            return False, digest.hexdigest()
+        
+        # mkstemp creates the file as 0600; give it the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, output_path)
+        return True, digest.hexdigest()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def build_inputs(markdown_file, template_file, css_file, favicon_file, buttons_dir='.',
+                 script_file="script.js"):
+    """Every file the build reads"""
+    return [Path(markdown_file), Path(template_file), Path(css_file),
+            Path(favicon_file), Path(script_file)] + find_button_files(buttons_dir)
 
 def build_manual(
     markdown_file="Echo-Bridge.md",
     template_file="template.html", 
     output_file="index.html",
     css_file="styles.css",
-    favicon_file="favicon.svg"
+    favicon_file="favicon.svg",
+    use_cache=True,
+    cache_dir=DIAGRAM_CACHE_DIR,
+    clear_cache=False,
+    jobs=1,
+    renderer='png',
+    assets_dir=None,
+    incremental=True,
+    asset_manifest_name=ASSET_MANIFEST_NAME,
+    shared=None,
+    stream=False,
+    buttons_dir='.',
+    script_file="script.js",
+    optimize_css=False,
+    critical_css=False,
+    optimize_images=False,
+    palette_colors=DIAGRAM_PALETTE_COLORS,
+    webp=False,
+    hidpi=False,
+    precompress=False,
+    size_budget=None,
+    subset_fonts=False,
+    fonts_dir=FONTS_DIR,
+    search='off',
+    split_pages=False,
+    page_budget=None,
+    noscript_diagrams=False
 ):
     """
-    Build the manual by injecting markdown content into HTML template
+    Build the manual by injecting markdown content into HTML template.
+    With incremental set, stages whose inputs are unchanged since the last
+    build of output_file are skipped and the output is only rewritten when
+    its contents change. `shared` takes the result of prepare_shared_inputs()
+    so batch builds fill the template, buttons and favicon only once.
+    With stream set, the page is written chunk by chunk and diagram data
+    is base64-encoded straight into the output file. optimize_css replaces
+    the stylesheet and injected styles with one pruned, minified file;
+    critical_css also inlines the above-the-fold rules. optimize_images
+    palette-quantizes raster diagrams; webp and hidpi add WebP and 2x
+    variants to a srcset and need assets_dir. precompress writes .gz (and
+    .br) copies of the page, stylesheet, script and favicon; size_budget
+    (bytes, gzipped total) fails the build when exceeded and implies it.
+    subset_fonts replaces the Google Fonts links with subsets of the
+    variable fonts in fonts_dir. search embeds the search index ('inline'),
+    writes it next to the output ('file') or leaves it out ('off').
+    split_pages writes one page per ## section with shared navigation and
+    prints their weights; page_budget (bytes, raw) fails the build when a
+    page exceeds it. noscript_diagrams adds fallback images to diagrams
+    left for script.js to draw (renderer 'client').
     """
+    optimize_css = optimize_css or critical_css
+    if optimize_css and stream:
+        print("Warning: --optimize-css needs the whole page and is skipped with --stream")
+        optimize_css = False
+    
+    if split_pages and stream:
+        print("Warning: --split-pages needs the whole page and is skipped with --stream")
+        split_pages = False
+    if split_pages and search == 'inline':
+        # One cached index for every page instead of a copy in each
+        search = 'file'
+    
+    if subset_fonts and stream:
+        print("Warning: --subset-fonts needs the whole page and is skipped with --stream")
+        subset_fonts = False
+    if subset_fonts and not has_capability('fontTools'):
+        print("Warning: font subsetting requires fonttools and is skipped")
+        subset_fonts = False
+    
+    if noscript_diagrams and renderer != 'client':
+        print("Warning: --noscript-diagrams only applies to --renderer client and is ignored")
+        noscript_diagrams = False
+    
+    if (webp or hidpi) and not assets_dir:
+        print("Warning: --webp and --hidpi need --assets-dir and are ignored")
+        webp = hidpi = False
+    images = None
+    if optimize_images or webp or hidpi:
+        if renderer not in RASTER_RENDERERS:
+            print(f"Warning: image optimization does not apply to the {renderer} renderer")
+        elif not has_capability('PIL'):
+            print("Warning: image optimization requires pillow and is skipped")
+        else:
+            images = DiagramImages(optimize_images, palette_colors, webp, hidpi)
     
     files_to_check = [markdown_file, template_file]
     for file_path in files_to_check:
@@ -626,78 +3494,920 @@ def build_manual(
     if not Path(css_file).exists():
         print(f"Warning: {css_file} not found - styling won't work!")
     
+    diagram_cache = DiagramCache(cache_dir) if use_cache or clear_cache else None
+    if clear_cache:
+        diagram_cache.clear()
+        print(f"🧹 Cleared diagram cache: {cache_dir}")
+        if not use_cache:
+            diagram_cache = None
+    
+    if images is not None:
+        images.cache = diagram_cache
+    
+    manifest = BuildManifest(output_file) if incremental else None
+    
+    def run_stage(name, inputs, compute, valid=None):
+        with trace_span(name) as span:
+            if manifest is None:
+                return compute()
+            output = manifest.run(name, inputs, compute, valid)
+            span['skipped'] = name in manifest.skipped
+            return output
+    
     try:
         # Read markdown content
-        with open(markdown_file, 'r', encoding='utf-8') as f:
+        with trace_span('read'), open(markdown_file, 'r', encoding='utf-8') as f:
             markdown_content = f.read()
         
         # Process diagram blocks BEFORE converting to HTML
-        markdown_content = process_diagram_blocks(markdown_content)
+        diagram_assets = (DiagramAssets(assets_dir, output_file, asset_manifest_name)
+                          if assets_dir else None)
         
-        # Convert markdown to HTML
-        html_content = convert_markdown_to_html(markdown_content)
+        # Streaming builds keep PNG data out of the document until it is written
+        payloads = {} if stream and renderer in RASTER_RENDERERS and not assets_dir else None
         
-        # Read HTML template
-        with open(template_file, 'r', encoding='utf-8') as f:
-            template = f.read()
+        def render_diagrams():
+            patches = []
+            processed = process_diagram_blocks(
+                markdown_content, diagram_cache, jobs, renderer, diagram_assets, payloads, images,
+                patches, noscript_diagrams
+            )
+            return {'markdown': processed, 'patches': patches,
+                    'assets': diagram_assets.assets if diagram_assets else None}
         
-        # Collect button content and styles from separate HTML files
-        button_html, button_styles = collect_button_content()
+        def assets_present(output):
+            # Manifests from before the search index have no patch names
+            return 'patches' in output and all(
+                (Path(assets_dir) / name).exists() for name in output['assets'] or {})
         
-        # Get favicon SVG content
-        favicon_svg = get_favicon_svg(favicon_file)
+        if payloads is not None:
+            # The payloads live in memory only, so this stage always runs
+            with trace_span('diagrams'):
+                diagram_stage = render_diagrams()
+        else:
+            diagram_inputs = {
+                'markdown': hash_bytes(markdown_content),
+                'renderer': renderer,
+                'style': diagram_style_signature(),
+                'assets_dir': assets_dir and diagram_assets.url_prefix,
+            }
+            if renderer == 'client':
+                diagram_inputs['noscript'] = noscript_diagrams
+            if images is not None:
+                diagram_inputs['images'] = images.signature()
+            diagram_stage = run_stage('diagrams', diagram_inputs, render_diagrams, assets_present)
+        if images is not None:
+            images.report()
+        markdown_content = diagram_stage['markdown']
+        if diagram_assets is not None:
+            diagram_assets.assets = diagram_stage['assets']
+        
+        # Convert markdown to HTML, reusing the last build's unchanged sections
+        previous = manifest.previous('markdown') if manifest is not None else None
+        section_cache = dict(previous['sections']) if previous else {}
+        
+        def render_markdown():
+            html_content = convert_markdown_to_html(markdown_content, section_cache)
+            return {'html': html_content, 'sections': section_cache}
+        
+        markdown_stage = run_stage('markdown', {
+            'markdown': hash_bytes(markdown_content),
+            'enhanced': has_capability('markdown'),
+        }, render_markdown)
+        html_content = markdown_stage['html']
         
-        # Replace placeholders
-        final_html = template.replace('{{MARKDOWN_CONTENT}}', html_content)
-        final_html = final_html.replace('{{BUTTON_CONTENT}}', button_html)
-        final_html = final_html.replace('{{FAVICON_SVG}}', favicon_svg)
+        # Search index over headings, table rows and diagrams
+        search_index = None
+        if search != 'off':
+            def index_search():
+                content, index = build_search_index(html_content, diagram_stage['patches'])
+                return {'html': content, 'index': index}
+            
+            search_stage = run_stage('search', {
+                'html': hash_bytes(html_content),
+                'patches': diagram_stage['patches'],
+            }, index_search)
+            html_content = search_stage['html']
+            search_index = search_stage['index']
+        
+        # One page per ## section; search results then point at '<page>#<id>'
+        pages = None
+        if split_pages:
+            with trace_span('split') as span:
+                pages = split_manual_pages(html_content, output_file)
+                span['pages'] = len(pages)
+            if search_index is not None:
+                anchors = page_anchors(pages)
+                search_index = dict(search_index, docs=[
+                    doc[:2] + [anchors.get(doc[2], doc[2])] + doc[3:] for doc in search_index['docs']
+                ])
+        search_html = search_index_html(search_index, search, output_file) if search_index else ''
         
-        # Inject button styles into the HTML
-        final_html = inject_button_styles(final_html, button_styles)
+        # Template with buttons, favicon and styles already filled in
+        if shared is None:
+            shared = prepare_shared_inputs(template_file, favicon_file, run_stage, buttons_dir)
         
-        # Inject diagram styles into the HTML
-        final_html = inject_diagram_styles(final_html)
+        # Fill the markdown slot and write the output only when it changed
+        page_values = {'MARKDOWN_CONTENT': html_content, SEARCH_SLOT: search_html}
+        if pages is not None:
+            # Render once with every section so fonts and CSS cover all pages
+            sections = []
+            for number, page in enumerate(pages):
+                contents, pager = page_navigation(pages, number)
+                sections.append(contents + page['content'] + pager)
+            page_values['MARKDOWN_CONTENT'] = ''.join(sections)
+        if stream:
+            with trace_span('write', streamed=True):
+                written, output_hash = stream_output(
+                    output_file, shared['page_template'].iter_chunks(page_values), payloads or {}
+                )
+        else:
+            with trace_span('template'):
+                final_html = shared['page_template'].render(page_values)
+            font_stats = None
+            if subset_fonts:
+                css_sources = _STYLE_BLOCK_PATTERN.findall(shared['head_injection'])
+                try:
+                    css_sources.insert(0, Path(css_file).read_text(encoding='utf-8'))
+                except OSError:
+                    pass
+                with trace_span('fonts'):
+                    final_html, font_stats = subset_page_fonts(
+                        final_html, css_sources, script_file, output_file, fonts_dir, jobs
+                    )
+            css_stats = None
+            if optimize_css:
+                with trace_span('css'):
+                    final_html, css_stats = optimize_page_css(
+                        final_html, shared['head_injection'], css_file, script_file,
+                        output_file, critical_css
+                    )
+            with trace_span('write') as span:
+                if pages is None:
+                    written = write_if_changed(output_file, final_html)
+                    output_hash = hash_bytes(final_html)
+                else:
+                    written, output_hash, page_rows = write_pages(final_html, sections, pages, output_file)
+                span['bytes'] = len(final_html)
         
-        # Write output file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(final_html)
+        with trace_span('manifest'):
+            previous_pages = manifest.data.get('pages', []) if manifest is not None else []
+            stale_pages = remove_stale_pages(output_file, pages, previous_pages)
+            if manifest is not None:
+                manifest.data['pages'] = [page['name'] for page in pages] if pages else []
+                manifest.record_inputs(build_inputs(markdown_file, template_file, css_file, favicon_file,
+                                                 buttons_dir, script_file))
+                manifest.save(output_hash)
         
         print(f"✅ Manual built successfully!")
         print(f"   📄 Markdown: {markdown_file}")
-        print(f"   🌐 Output: {output_file}")
+        print(f"   🌐 Output: {output_file}" + (f" and {len(pages) - 1} more pages" if pages else ""))
         print(f"   🎨 Styling: {css_file}")
-        if button_html:
+        if shared['has_buttons']:
             print(f"   🔘 Buttons: Included from separate HTML files (with styles!)")
         if Path(favicon_file).exists():
             print(f"   🎯 Favicon: {favicon_file} integrated into logos")
         print(f"   🎛️ Diagrams: Styled to match LUFS aesthetic")
+        if search != 'off':
+            index = search_stage['index']
+            if search == 'file':
+                size, where = search_index_path(output_file).stat().st_size, f"in {search_index_path(output_file)}"
+            else:
+                size, where = len(search_html.encode('utf-8')), "inline"
+            print(f"   🔎 Search: {len(index['docs'])} entries, {len(index['terms'])} terms, "
+                  f"{size / 1024:.1f} KB {where}")
+        if manifest is not None and manifest.skipped:
+            print(f"   ⏭️ Unchanged stages skipped: {', '.join(manifest.skipped)}")
+        if optimize_css and css_stats:
+            saved = 1 - css_stats['after'] / css_stats['before'] if css_stats['before'] else 0
+            print(f"   🎨 CSS: {css_stats['before'] / 1024:.1f} KB → {css_stats['after'] / 1024:.1f} KB "
+                  f"(-{saved:.0%}) in {css_stats['file']}")
+            print(f"      dropped {css_stats['keyframes']} duplicate or unused keyframes, "
+                  f"{css_stats['rules']} duplicate rules and {css_stats['selectors']} unused selectors")
+            if 'critical' in css_stats:
+                print(f"      {css_stats['critical'] / 1024:.1f} KB of critical CSS inlined, the rest deferred")
+        if subset_fonts and font_stats:
+            saved = 1 - font_stats['subset_bytes'] / font_stats['source_bytes']
+            print(f"   🔤 Fonts: {len(font_stats['faces'])} faces subset to {font_stats['characters']} "
+                  f"characters as {font_stats['flavor'].upper()}: {font_stats['source_bytes'] / 1024:.0f} KB "
+                  f"→ {font_stats['subset_bytes'] / 1024:.0f} KB (-{saved:.0%})")
+            print(f"      only {FONTS_DIR}/{FONT_SUBSET_DIR}/ needs deploying, not the "
+                  f"{font_stats['fonts_dir_bytes'] / (1024 * 1024):.1f} MB of TTFs in {fonts_dir}/")
+            for name, source_bytes, subset_bytes, weight in font_stats['faces']:
+                print(f"      {name:<42}{source_bytes / 1024:>7.0f} KB → {subset_bytes / 1024:>4.0f} KB  "
+                      f"weight {weight}")
+            if font_stats['flavor'] != 'woff2':
+                print("      Install brotli for WOFF2 subsets (about 30% smaller than WOFF)")
+        elif subset_fonts:
+            print(f"   🔤 Fonts: no variable fonts in {fonts_dir}/ match the stylesheet - nothing subset")
+        if stale_pages:
+            print(f"   🧹 Removed {len(stale_pages)} stale page(s): {', '.join(stale_pages)}")
+        if not written:
+            print(f"   💤 Output unchanged - {output_file} not rewritten")
+        if diagram_assets is not None:
+            manifest_path = diagram_assets.write_manifest()
+            print(f"   🖼️ Assets: {len(diagram_assets.assets)} diagram files, manifest at {manifest_path}")
+        if diagram_cache is not None:
+            diagram_cache.prune()
+            print(f"   🗄️ Diagram cache: {diagram_cache.hits} hits, {diagram_cache.misses} misses")
         
-        return True
+        within_budget = True
+        if pages is not None:
+            print()
+            within_budget = report_page_weights(page_rows, page_budget)
+        
+        if precompress or size_budget is not None:
+            outputs = [Path(output_file).parent / page['name'] for page in pages] if pages else [output_file]
+            targets = outputs + [css_stats['file'] if optimize_css and css_stats else css_file,
+                       script_file, favicon_file]
+            if diagram_assets is not None:
+                targets += [diagram_assets.assets_dir / name for name in sorted(diagram_assets.assets)
+                            if name.endswith('.svg')]
+            if search == 'file':
+                targets.append(search_index_path(output_file))
+            with trace_span('compress'):
+                rows = precompress_outputs(targets)
+            print()
+            return report_compression(rows, size_budget) and within_budget
+        
+        return within_budget
         
     except Exception as e:
         print(f"Error building manual: {e}")
         return False
 
+def find_batch_sources(batch):
+    """
+    Expand a batch argument into markdown source paths. The argument is
+    either a glob pattern or a list file with one path per line (blank
+    lines and # comments are ignored, relative paths are relative to it).
+    """
+    list_file = Path(batch)
+    if list_file.is_file() and list_file.suffix.lower() not in ('.md', '.markdown'):
+        sources = []
+        for line in list_file.read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            source = Path(line)
+            if not source.is_absolute():
+                source = list_file.parent / source
+            sources.append(source)
+        return sources
+    
+    import glob
+    return sorted(Path(path) for path in glob.glob(batch, recursive=True))
+
+def _build_batch_manual(source, output_file, build_options, shared):
+    """
+    Build one manual of a batch with its log captured.
+    Returns (success, seconds, log).
+    """
+    import io
+    
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            success = build_manual(str(source), output_file=str(output_file),
+                                   shared=shared, **build_options)
+        except Exception as e:
+            print(f"Error building manual: {e}")
+            success = False
+    return success, time.perf_counter() - start, log.getvalue()
+
+def build_batch(batch, out_dir, build_options, jobs=1):
+    """
+    Build every manual matched by `batch` in one process (or spread over
+    `jobs` worker processes), sharing the template, buttons, favicon and
+    injected styles. Prints a per-manual summary and returns True only if
+    every manual built.
+    """
+    sources = find_batch_sources(batch)
+    if not sources:
+        print(f"Error: No markdown sources found for {batch}")
+        return False
+    
+    stems = [source.stem for source in sources]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        print(f"Error: Several sources would write the same output: {', '.join(duplicates)}")
+        return False
+    
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    
+    batch_start = time.perf_counter()
+    shared = prepare_shared_inputs(build_options['template_file'], build_options['favicon_file'],
+                                   buttons_dir=build_options.get('buttons_dir', '.'))
+    
+    if build_options.get('clear_cache'):
+        DiagramCache(build_options['cache_dir']).clear()
+        print(f"🧹 Cleared diagram cache: {build_options['cache_dir']}")
+    
+    # Manuals are the unit of parallelism, so each one renders its diagrams serially
+    options = {key: value for key, value in build_options.items()
+               if key not in ('markdown_file', 'output_file')}
+    options.update(jobs=1, clear_cache=False)
+    
+    tasks = {}
+    for source in sources:
+        task_options = dict(options, asset_manifest_name=f"assets-manifest-{source.stem}.json")
+        tasks[source] = (source, out_dir / f"{source.stem}.html", task_options, shared)
+    
+    print(f"📚 Building {len(sources)} manuals into {out_dir}/ ...")
+    results = {}
+    if jobs > 1 and len(sources) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sources))) as pool:
+            futures = {source: pool.submit(_build_batch_manual, *task)
+                       for source, task in tasks.items()}
+            for source, future in futures.items():
+                try:
+                    results[source] = future.result()
+                except Exception as e:
+                    results[source] = (False, 0.0, f"Error building manual: {e}\n")
+    else:
+        for source, task in tasks.items():
+            results[source] = _build_batch_manual(*task)
+    
+    failed = [source for source, (success, _, _) in results.items() if not success]
+    
+    print()
+    print("📊 Batch summary")
+    for source in sources:
+        success, seconds, _ = results[source]
+        status = "✅" if success else "❌"
+        print(f"   {status} {str(source):<40}{seconds * 1000:>9.0f} ms  → {tasks[source][1]}")
+    print(f"   {len(sources) - len(failed)} built, {len(failed)} failed "
+          f"in {time.perf_counter() - batch_start:.2f} s")
+    
+    for source in failed:
+        print()
+        print(f"❌ Log for {source}:")
+        print(results[source][2].rstrip())
+    
+    return not failed
+
+def snapshot_inputs(paths):
+    """(mtime_ns, size) of every path, or None for a missing file"""
+    state = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            state[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[str(path)] = None
+    return state
+
+def changed_inputs(current, last):
+    """Paths whose snapshot entry differs, sorted"""
+    return sorted(path for path in set(current) | set(last) if current.get(path) != last.get(path))
+
+def watch_manual(build_options, interval=0.1):
+    """
+    Build once, then poll the build inputs and rebuild incrementally
+    whenever one of them changes. Runs until interrupted.
+    """
+    def snapshot():
+        return snapshot_inputs(build_inputs(
+            build_options['markdown_file'], build_options['template_file'],
+            build_options['css_file'], build_options['favicon_file'],
+            build_options.get('buttons_dir', '.'), build_options.get('script_file', "script.js")
+        ))
+    
+    build_manual(**build_options)
+    build_options = dict(build_options, clear_cache=False)
+    last = snapshot()
+    print()
+    print(f"👀 Watching {len(last)} inputs for changes (Ctrl+C to stop)...")
+    
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot()
+            if current == last:
+                continue
+            
+            changed = changed_inputs(current, last)
+            last = current
+            print()
+            print(f"🔄 Changed: {', '.join(changed)}")
+            start = time.perf_counter()
+            success = build_manual(**build_options)
+            elapsed = (time.perf_counter() - start) * 1000
+            status = "Rebuilt" if success else "Build failed"
+            print(f"⏱️  {status} in {elapsed:.0f} ms")
+    except KeyboardInterrupt:
+        print()
+        print("👋 Stopped watching")
+
+class MemoryAssets(DiagramAssets):
+    """Diagram assets kept in memory and served by URL by the dev server"""
+    
+    url_prefix = '_assets'
+    
+    def __init__(self):
+        self.assets = {}
+        self.files = {}
+    
+    def _store(self, filename, data):
+        self.files[filename] = data
+
+class MemoryDiagramCache:
+    """
+    In-memory layer over an optional DiagramCache. sweep() drops every
+    entry the last build did not use, so a long session stays bounded.
+    """
+    
+    def __init__(self, backing=None):
+        self.backing = backing
+        self.entries = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, suffix='png'):
+        self.used.add(key)
+        data = self.entries.get(key)
+        if data is None and self.backing is not None:
+            data = self.backing.get(key, suffix)
+            if data is not None:
+                self.entries[key] = data
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+    
+    def put(self, key, data, suffix='png'):
+        self.used.add(key)
+        self.entries[key] = data
+        if self.backing is not None:
+            self.backing.put(key, data, suffix)
+    
+    def sweep(self):
+        self.entries = {key: data for key, data in self.entries.items() if key in self.used}
+        self.used = set()
+
+LIVE_RELOAD_PATH = '/_events'
+
+# Pages written by --split-pages, the only HTML serve reads from disk
+_STATIC_PAGE_PATTERN = re.compile(r'index-[\w-]+\.html')
+LIVE_RELOAD_SCRIPT = f"""<script>
+new EventSource('{LIVE_RELOAD_PATH}').addEventListener('reload', () => location.reload());
+</script>
+"""
+
+# Build output worth showing while serving; per-diagram progress lines are not
+_SERVE_LOG_PATTERN = re.compile(r'\s*(?:❌|⚠️|Warning|Error)')
+
+class DevServer:
+    """
+    The resident builder behind `serve`. The page is built in memory with
+    diagrams served from memory by URL. A rebuild re-reads the template,
+    buttons and favicon only when one of them changed, renders only new
+    diagrams and converts only changed markdown sections. Pages opened
+    from the server reload through server-sent events. The search index,
+    when on, is always inline.
+    """
+    
+    def __init__(self, markdown_file="Echo-Bridge.md", template_file="template.html",
+                 css_file="styles.css", favicon_file="favicon.svg", script_file="script.js",
+                 buttons_dir='.', renderer='png', jobs=1, cache=None, search=False):
+        self.markdown_file = markdown_file
+        self.template_file = template_file
+        self.css_file = css_file
+        self.favicon_file = favicon_file
+        self.script_file = script_file
+        self.buttons_dir = buttons_dir
+        self.renderer = renderer
+        self.jobs = jobs
+        self.search = search
+        self.root = Path(css_file).resolve().parent
+        self.diagram_cache = MemoryDiagramCache(cache)
+        self.section_cache = {}
+        self.assets = MemoryAssets()
+        self.shared = None
+        self.markdown_hash = None
+        self.html_content = ''
+        self.search_html = ''
+        self.page = b''
+        self.generation = 0
+        self.clients = 0
+        self.changed = threading.Condition()
+    
+    def inputs(self):
+        return build_inputs(self.markdown_file, self.template_file, self.css_file,
+                            self.favicon_file, self.buttons_dir, self.script_file)
+    
+    def build(self, changed=None):
+        """
+        Rebuild what the changed paths affect (everything when None) and
+        return the names of the stages that ran
+        """
+        import io
+        
+        stages = []
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                shared_inputs = {str(path) for path in self.inputs()} - {
+                    str(Path(self.markdown_file)), str(Path(self.css_file)), str(Path(self.script_file))}
+                if self.shared is None or changed is None or shared_inputs.intersection(changed):
+                    self.shared = prepare_shared_inputs(self.template_file, self.favicon_file,
+                                                        buttons_dir=self.buttons_dir)
+                    stages.append('template')
+                
+                with open(self.markdown_file, 'r', encoding='utf-8') as f:
+                    markdown_content = f.read()
+                markdown_hash = hash_bytes(markdown_content)
+                if markdown_hash != self.markdown_hash:
+                    assets = MemoryAssets()
+                    patches = []
+                    processed = process_diagram_blocks(markdown_content, self.diagram_cache,
+                                                       self.jobs, self.renderer, assets,
+                                                       patches=patches)
+                    self.diagram_cache.sweep()
+                    self.html_content = convert_markdown_to_html(processed, self.section_cache)
+                    stages += ['diagrams', 'markdown']
+                    self.search_html = ''
+                    if self.search:
+                        self.html_content, index = build_search_index(self.html_content, patches)
+                        self.search_html = search_index_html(index, 'inline', None)
+                        stages.append('search')
+                    self.assets, self.markdown_hash = assets, markdown_hash
+                
+                page = self.shared['page_template'].render({'MARKDOWN_CONTENT': self.html_content,
+                                                            SEARCH_SLOT: self.search_html})
+        except Exception as e:
+            import traceback
+            page = (f"<!DOCTYPE html>\n<title>Build failed</title>\n"
+                    f"<pre>{html.escape(traceback.format_exc())}</pre>\n")
+            stages.append('error')
+            print(f"❌ Build failed: {e}")
+        
+        for line in log.getvalue().splitlines():
+            if _SERVE_LOG_PATTERN.match(line):
+                print(line.strip())
+        
+        body_end = page.rfind('</body>')
+        if body_end == -1:
+            body_end = len(page)
+        self.page = (page[:body_end] + LIVE_RELOAD_SCRIPT + page[body_end:]).encode('utf-8')
+        return stages
+    
+    def notify(self):
+        """Tell every open page to reload"""
+        with self.changed:
+            self.generation += 1
+            self.changed.notify_all()
+    
+    def wait_for_change(self, generation, timeout):
+        """Block until the generation moves past `generation` or timeout; returns the current one"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+    
+    def static_file(self, url_path):
+        """
+        The file a request path may read from disk: the stylesheet, script,
+        favicon, fonts and split pages. Everything else is None (404).
+        """
+        from urllib.parse import unquote
+        
+        root = self.root
+        path = (root / unquote(url_path).lstrip('/')).resolve()
+        inputs = {Path(name).resolve() for name in (self.css_file, self.script_file, self.favicon_file)}
+        allowed = (path in inputs
+                   or path.is_relative_to((root / FONTS_DIR).resolve())
+                   or (path.parent == root and _STATIC_PAGE_PATTERN.fullmatch(path.name)))
+        return path if allowed and path.is_file() else None
+    
+    def handler(self):
+        """Request handler class bound to this server"""
+        from http.server import SimpleHTTPRequestHandler
+        from urllib.parse import urlsplit
+        dev = self
+        
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=str(dev.root), **kwargs)
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def end_headers(self):
+                # Always revalidate, so a reload picks up edited CSS and JS
+                self.send_header('Cache-Control', 'no-cache')
+                super().end_headers()
+            
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path in ('/', '/index.html'):
+                    self._send(dev.page, 'text/html; charset=utf-8')
+                elif path == LIVE_RELOAD_PATH:
+                    self._events()
+                elif path.startswith(f"/{MemoryAssets.url_prefix}/"):
+                    name = path.rsplit('/', 1)[1]
+                    data = dev.assets.files.get(name)
+                    if data is None:
+                        self.send_error(404)
+                    else:
+                        self._send(data, ASSET_MIME_TYPES[name.rsplit('.', 1)[1]])
+                elif dev.static_file(path) is None:
+                    self.send_error(404)
+                else:
+                    super().do_GET()
+            
+            def _send(self, data, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _events(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                with dev.changed:
+                    generation = dev.generation
+                    dev.clients += 1
+                try:
+                    while True:
+                        current = dev.wait_for_change(generation, timeout=15)
+                        if current == generation:
+                            self.wfile.write(b": ping\n\n")
+                        else:
+                            self.wfile.write(f"event: reload\ndata: {current}\n\n".encode('utf-8'))
+                            generation = current
+                        self.wfile.flush()
+                except OSError:
+                    pass
+                finally:
+                    with dev.changed:
+                        dev.clients -= 1
+        
+        return Handler
+
+def serve_manual(build_options, host='127.0.0.1', port=8000, interval=0.05):
+    """
+    Serve the manual from memory on host:port and rebuild it whenever an
+    input changes, reloading open pages. Runs until interrupted.
+    """
+    from http.server import ThreadingHTTPServer
+    import ipaddress
+    
+    try:
+        loopback = host == 'localhost' or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        print(f"Warning: serving on {host} makes the dev server reachable from other machines")
+    
+    cache = DiagramCache(build_options['cache_dir']) if build_options.get('use_cache', True) else None
+    dev = DevServer(build_options['markdown_file'], build_options['template_file'],
+                    build_options['css_file'], build_options['favicon_file'],
+                    build_options.get('script_file', "script.js"), build_options.get('buttons_dir', '.'),
+                    build_options.get('renderer', 'png'), build_options.get('jobs', 1), cache,
+                    build_options.get('search', 'off') != 'off')
+    
+    start = time.perf_counter()
+    dev.build()
+    print(f"✅ Built {build_options['markdown_file']} in memory in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    httpd = ThreadingHTTPServer((host, port), dev.handler())
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"🌐 Serving on http://{host}:{httpd.server_address[1]}/ (Ctrl+C to stop)")
+    
+    last = snapshot_inputs(dev.inputs())
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot_inputs(dev.inputs())
+            if current == last:
+                continue
+            
+            changed = changed_inputs(current, last)
+            last = current
+            start = time.perf_counter()
+            page = dev.page
+            stages = dev.build(changed)
+            elapsed = (time.perf_counter() - start) * 1000
+            static_changed = {str(Path(dev.css_file)), str(Path(dev.script_file))}.intersection(changed)
+            if dev.page != page or static_changed:
+                dev.notify()
+            print(f"🔄 {', '.join(changed)}: rebuilt {', '.join(stages) or 'nothing'} "
+                  f"in {elapsed:.0f} ms, reloading {dev.clients} page(s)")
+    except KeyboardInterrupt:
+        print()
+        print("👋 Stopped serving")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
 def main():
     """Main function with command line support"""
     
-    markdown_file = "Echo-Bridge.md"
+    parser = argparse.ArgumentParser(
+        description="Build the Echo Bridge manual",
+        epilog="Run 'build_manual.py serve [markdown_file] [options]' for a live-reloading "
+               "dev server that builds in memory"
+    )
+    parser.add_argument('markdown_file', nargs='?', default="Echo-Bridge.md",
+                        help="Markdown source (default: Echo-Bridge.md)")
+    parser.add_argument('output_file', nargs='?', default="index.html",
+                        help="Output HTML file (default: index.html)")
+    parser.add_argument('--buttons-dir', default='.', metavar='DIR',
+                        help="Directory with the *button*.html files (default: .)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Render every diagram without using the diagram cache")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Empty the diagram cache before building")
+    parser.add_argument('--cache-dir', default=DIAGRAM_CACHE_DIR,
+                        help=f"Diagram cache directory (default: {DIAGRAM_CACHE_DIR})")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Render diagrams on N worker processes (0 = one per CPU)")
+    parser.add_argument('--renderer', choices=['png', 'agg', 'svg', 'client'], default='png',
+                        help="Diagram renderer: matplotlib PNG, pre-drawn Agg chassis "
+                             "with per-patch overlay, inline SVG, or drawn by script.js "
+                             "from the patch settings (default: png)")
+    parser.add_argument('--noscript-diagrams', action='store_true',
+                        help="With --renderer client: add an SVG image of each diagram "
+                             "for browsers without JavaScript")
+    parser.add_argument('--assets-dir', metavar='DIR',
+                        help="Write diagrams as content-hashed files in DIR (plus a JSON "
+                             "manifest) instead of inlining them")
+    parser.add_argument('--batch', metavar='SOURCES',
+                        help="Build many manuals in one run: a glob (quote it) or a file "
+                             "listing one markdown path per line")
+    parser.add_argument('--out-dir', default='.',
+                        help="Output directory for --batch builds (default: .)")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-run every build stage instead of skipping unchanged ones")
+    parser.add_argument('--watch', action='store_true',
+                        help="Rebuild incrementally whenever an input file changes")
+    parser.add_argument('--stream', action='store_true',
+                        help="Write the page chunk by chunk, base64-encoding diagram "
+                             "data straight into the output file")
+    parser.add_argument('--optimize-css', action='store_true',
+                        help="Merge, deduplicate, prune and minify all CSS into <output>.min.css")
+    parser.add_argument('--critical-css', action='store_true',
+                        help="With --optimize-css: inline above-the-fold CSS and defer the rest")
+    parser.add_argument('--optimize-images', action='store_true',
+                        help="Palette-quantize raster diagrams and report size and pixel difference")
+    parser.add_argument('--palette-colors', type=int, default=DIAGRAM_PALETTE_COLORS, metavar='N',
+                        help=f"Palette size for --optimize-images (default: {DIAGRAM_PALETTE_COLORS})")
+    parser.add_argument('--webp', action='store_true',
+                        help="With --assets-dir: add lossless WebP diagram variants")
+    parser.add_argument('--hidpi', action='store_true',
+                        help="With --assets-dir: add 2x diagram variants to a srcset")
+    parser.add_argument('--subset-fonts', action='store_true',
+                        help="Subset the variable fonts to the characters and weights the page "
+                             "uses and load them instead of Google Fonts")
+    parser.add_argument('--fonts-dir', default=FONTS_DIR, metavar='DIR',
+                        help=f"Directory with the *-VariableFont_wght.ttf files (default: {FONTS_DIR})")
+    parser.add_argument('--search', choices=SEARCH_MODES, default='off',
+                        help="Search index: embedded in the page (inline), written to "
+                             "<output>.search.json and fetched on first use (file), or none (off, default)")
+    parser.add_argument('--split-pages', action='store_true',
+                        help="Write one page per ## section, with a shared contents list, "
+                             "previous/next links and a prefetch of the next page")
+    parser.add_argument('--page-budget', type=float, metavar='KB',
+                        help="With --split-pages: fail the build when a page is larger than KB")
+    parser.add_argument('--precompress', action='store_true',
+                        help="Write .gz (and .br with brotli installed) copies of the page, "
+                             "CSS, script and favicon and print their sizes")
+    parser.add_argument('--size-budget', type=float, metavar='KB',
+                        help="Fail the build when the gzipped outputs exceed KB in total "
+                             "(implies --precompress)")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Address for serve to listen on (default: 127.0.0.1; other addresses print a warning)")
+    parser.add_argument('--port', type=int, default=8000,
+                        help="Port for serve (default: 8000, 0 picks a free one)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Report peak Python memory use of the build (tracemalloc)")
+    parser.add_argument('--trace-json', metavar='PATH',
+                        help="Write per-stage and per-diagram timings as Chrome trace-event JSON")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Run the build under cProfile and dump the stats to PATH")
+    parser.add_argument('--timings', action='store_true',
+                        help="Print a startup report of module import times")
+    parser.add_argument('--compare-renderers', action='store_true',
+                        help="Print per-diagram render times for every renderer and exit")
+    argv = sys.argv[1:]
+    serve = argv[:1] == ['serve']
+    args = parser.parse_args(argv[1:] if serve else argv)
+    
+    markdown_file = args.markdown_file
     template_file = "template.html"
-    output_file = "index.html"
+    output_file = args.output_file
     css_file = "styles.css"
     favicon_file = "favicon.svg"
     
-    if len(sys.argv) > 1:
-        markdown_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+    report_capabilities([flag for flag, enabled in (('--optimize-images', args.optimize_images),
+                                                    ('--webp', args.webp), ('--hidpi', args.hidpi),
+                                                    ('--precompress', args.precompress),
+                                                    ('--subset-fonts', args.subset_fonts))
+                         if enabled])
+    
+    if args.compare_renderers:
+        compare_diagram_renderers(markdown_file)
+        return
     
     print("🔨 Building Echo Bridge Manual with LUFS-Styled Diagrams...")
-    print(f"   Source: {markdown_file}")
-    print(f"   Output: {output_file}")
+    if args.batch:
+        print(f"   Sources: {args.batch}")
+        print(f"   Output: {args.out_dir}")
+    else:
+        print(f"   Source: {markdown_file}")
+        print(f"   Output: {'served from memory' if serve else output_file}")
     print()
     
-    success = build_manual(markdown_file, template_file, output_file, css_file, favicon_file)
+    build_options = dict(
+        markdown_file=markdown_file,
+        template_file=template_file,
+        output_file=output_file,
+        css_file=css_file,
+        favicon_file=favicon_file,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        clear_cache=args.clear_cache,
+        jobs=args.jobs or os.cpu_count() or 1,
+        renderer=args.renderer,
+        noscript_diagrams=args.noscript_diagrams,
+        assets_dir=args.assets_dir,
+        incremental=not args.force,
+        stream=args.stream,
+        buttons_dir=args.buttons_dir,
+        optimize_css=args.optimize_css,
+        critical_css=args.critical_css,
+        optimize_images=args.optimize_images,
+        palette_colors=args.palette_colors,
+        webp=args.webp,
+        hidpi=args.hidpi,
+        subset_fonts=args.subset_fonts,
+        fonts_dir=args.fonts_dir,
+        search=args.search,
+        split_pages=args.split_pages,
+        page_budget=round(args.page_budget * 1024) if args.page_budget is not None else None,
+        precompress=args.precompress,
+        size_budget=round(args.size_budget * 1024) if args.size_budget is not None else None
+    )
+    
+    if serve:
+        serve_manual(build_options, args.host, args.port)
+        return
+    
+    if args.watch:
+        watch_manual(build_options)
+        return
+    
+    if args.batch:
+        success = build_batch(args.batch, args.out_dir, build_options, build_options['jobs'])
+        sys.exit(0 if success else 1)
+    
+    if args.trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    
+    trace = start_trace() if args.trace_json else None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
+    build_start = time.perf_counter()
+    success = build_manual(**build_options)
+    
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print()
+        print(f"🔬 Profile written to {args.profile} - top functions by cumulative time:")
+        import pstats
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(12)
+    
+    peak = None
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print()
+        print(f"🧠 Peak traced memory: {peak / (1024 * 1024):.1f} MB")
+    
+    if trace is not None:
+        stop_trace()
+        trace.write(args.trace_json, success=success, peak_memory_bytes=peak)
+        print()
+        trace.report()
+        print(f"   Trace written to {args.trace_json} ({len(trace.events)} events)")
+    
+    if args.timings:
+        print()
+        report_timings(time.perf_counter() - build_start)
     
     if success:
         print()
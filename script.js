@@ -1,138 +1,290 @@
 // Echo Bridge Manual v2 - Retro, Flat, DIY Aesthetic with Fun Background Animations
 // LUFS Audio - Brand Aligned
 
-document.addEventListener('DOMContentLoaded', function() {
-    initializeStickyHeader();
-    initializeRetroEffects();
-    initializeScrollEffects();
-    initializeRetroButtons();
-    initializeAnimatedBackground();
-});
+// Animated Background: one canvas, one requestAnimationFrame loop and a
+// fixed pool of shapes, instead of a DOM node and CSS animation per shape
+const BACKGROUND_SHAPE_COUNT = 15;
+const BACKGROUND_PULSE_COUNT = 5;
+const BACKGROUND_COLORS = {
+    square: '#78BEBA',
+    circle: '#2069af',
+    triangle: '#E7B225',
+    diamond: '#D35233',
+    outline: '#fbf9e2'
+};
+
+// Keyframes for each motion path: [offset, x, y, rotation (deg), scale, opacity]
+const BACKGROUND_PATHS = {
+    floatAround: [
+        [0, 0, 0, 0, 1, 0.05],
+        [0.25, 20, -30, 90, 1, 0.15],
+        [0.5, -15, -10, 180, 1, 0.1],
+        [0.75, 10, -40, 270, 1, 0.2],
+        [1, 0, 0, 360, 1, 0.05]
+    ],
+    floatSlow: [
+        [0, 0, 0, 0, 1, 0.08],
+        [0.5, 15, -20, 0, 1, 0.15],
+        [1, 0, 0, 0, 1, 0.08]
+    ],
+    floatFast: [
+        [0, 0, 0, 0, 1, 0.1],
+        [0.33, -10, -15, 0, 1.1, 0.2],
+        [0.66, 20, -25, 0, 0.9, 0.15],
+        [1, 0, 0, 0, 1, 0.1]
+    ]
+};
+const BACKGROUND_PULSE_PATH = [
+    [0, 0, 0, 0, 1, 0.03],
+    [0.5, 0, 0, 0, 1.2, 0.08],
+    [1, 0, 0, 0, 1, 0.03]
+];
 
-// Animated Background with Floating Shapes
 function initializeAnimatedBackground() {
     const background = document.getElementById('animated-background');
     if (!background) return;
     
-    // Create floating shapes
-    createFloatingShapes(background);
-    createPulsingElements(background);
+    const canvas = document.createElement('canvas');
+    canvas.className = 'background-canvas';
+    canvas.setAttribute('aria-hidden', 'true');
+    background.appendChild(canvas);
+    
+    const engine = createBackgroundEngine(canvas);
+    const reducedMotion = window.matchMedia('(prefers-reduced-motion: reduce)');
+    let pageVisible = !document.hidden;
+    let onScreen = true;
+    
+    function update() {
+        if (pageVisible && onScreen && !reducedMotion.matches) {
+            engine.start();
+        } else {
+            engine.stop();
+            // Reduced motion still gets the shapes, just standing still
+            if (reducedMotion.matches) engine.drawFrame(0);
+        }
+    }
+    
+    document.addEventListener('visibilitychange', function() {
+        pageVisible = !document.hidden;
+        update();
+    });
+    
+    new IntersectionObserver(function(entries) {
+        onScreen = entries[entries.length - 1].isIntersecting;
+        update();
+    }).observe(canvas);
+    
+    reducedMotion.addEventListener('change', update);
+    
+    // Gentle parallax: only the latest pointer position is kept, and it is
+    // applied when the next frame is drawn
+    document.addEventListener('mousemove', function(e) {
+        engine.pointer.x = (e.clientX / window.innerWidth - 0.5) * 20;
+        engine.pointer.y = (e.clientY / window.innerHeight - 0.5) * 20;
+    }, { passive: true });
+    
+    window.addEventListener('resize', debounce(engine.resize, 100), { passive: true });
+    engine.resize();
+    update();
 }
 
-function createFloatingShapes(container) {
-    const shapes = ['square', 'circle', 'triangle', 'diamond'];
-    const animations = ['floatAround', 'floatSlow', 'floatFast'];
+function createBackgroundEngine(canvas) {
+    const context = canvas.getContext('2d');
+    const kinds = ['square', 'circle', 'triangle', 'diamond'];
+    const pathNames = Object.keys(BACKGROUND_PATHS);
+    const pointer = { x: 0, y: 0 };
+    const sample = [0, 0, 0, 1, 0];
+    let width = 0;
+    let height = 0;
+    let frame = 0;
+    let startTime = 0;
+    let lastTime = 0;
     
-    // Create 15 floating shapes
-    for (let i = 0; i < 15; i++) {
-        const shape = document.createElement('div');
-        const shapeType = shapes[Math.floor(Math.random() * shapes.length)];
-        const animation = animations[Math.floor(Math.random() * animations.length)];
-        
-        shape.className = `floating-shape ${shapeType}`;
-        
-        // Random size between 8px and 25px
-        const size = Math.random() * 17 + 8;
-        if (shapeType !== 'triangle') {
-            shape.style.width = size + 'px';
-            shape.style.height = size + 'px';
+    // The pool is created once; frames only update numbers
+    const shapes = [];
+    for (let i = 0; i < BACKGROUND_SHAPE_COUNT; i++) {
+        shapes.push({
+            kind: kinds[Math.floor(Math.random() * kinds.length)],
+            path: BACKGROUND_PATHS[pathNames[Math.floor(Math.random() * pathNames.length)]],
+            size: Math.random() * 17 + 8,
+            left: Math.random(),
+            top: Math.random(),
+            duration: (Math.random() * 10 + 10) * 1000,
+            delay: Math.random() * 5000,
+            parallax: i % 3 === 0
+        });
+    }
+    
+    const pulses = [];
+    for (let i = 0; i < BACKGROUND_PULSE_COUNT; i++) {
+        pulses.push({
+            size: Math.random() * 100 + 50,
+            left: Math.random(),
+            top: Math.random(),
+            duration: 8000,
+            delay: Math.random() * 8000
+        });
+    }
+    
+    // One unit-radius gradient, scaled per pulse
+    const glow = context.createRadialGradient(0, 0, 0, 0, 0, 1);
+    glow.addColorStop(0, BACKGROUND_COLORS.square);
+    glow.addColorStop(0.7, 'rgba(120, 190, 186, 0)');
+    
+    function resize() {
+        const ratio = window.devicePixelRatio || 1;
+        width = canvas.clientWidth;
+        height = canvas.clientHeight;
+        canvas.width = Math.round(width * ratio);
+        canvas.height = Math.round(height * ratio);
+        context.setTransform(ratio, 0, 0, ratio, 0, 0);
+        if (!frame) drawFrame(lastTime);
+    }
+    
+    // Interpolate a keyframe path with ease-in-out between stops
+    function samplePath(path, progress) {
+        let i = 1;
+        while (i < path.length - 1 && path[i][0] < progress) i++;
+        const from = path[i - 1];
+        const to = path[i];
+        const t = (progress - from[0]) / (to[0] - from[0]);
+        const eased = t * t * (3 - 2 * t);
+        for (let j = 0; j < 5; j++) {
+            sample[j] = from[j + 1] + (to[j + 1] - from[j + 1]) * eased;
         }
+        return sample;
+    }
+    
+    function progressAt(item, time) {
+        const cycle = ((time - item.delay) / item.duration) % 1;
+        return cycle < 0 ? cycle + 1 : cycle;
+    }
+    
+    function drawShape(shape, time) {
+        const [x, y, rotation, scale, opacity] = samplePath(shape.path, progressAt(shape, time));
+        const half = shape.size / 2;
+        context.globalAlpha = opacity;
+        context.save();
+        context.translate(
+            shape.left * width + half + x + (shape.parallax ? pointer.x : 0),
+            shape.top * height + half + y + (shape.parallax ? pointer.y : 0)
+        );
+        context.rotate((rotation + (shape.kind === 'diamond' ? 45 : 0)) * Math.PI / 180);
+        context.scale(scale, scale);
         
-        // Random position
-        shape.style.left = Math.random() * 100 + '%';
-        shape.style.top = Math.random() * 100 + '%';
-        
-        // Random animation duration and delay
-        const duration = Math.random() * 10 + 10; // 10-20 seconds
-        const delay = Math.random() * 5; // 0-5 seconds delay
-        
-        shape.style.animation = `${animation} ${duration}s ease-in-out infinite`;
-        shape.style.animationDelay = delay + 's';
-        
-        container.appendChild(shape);
+        context.beginPath();
+        if (shape.kind === 'circle') {
+            context.arc(0, 0, half, 0, Math.PI * 2);
+        } else if (shape.kind === 'triangle') {
+            context.moveTo(0, -10);
+            context.lineTo(10, 10);
+            context.lineTo(-10, 10);
+            context.closePath();
+        } else {
+            context.rect(-half, -half, shape.size, shape.size);
+        }
+        context.fillStyle = BACKGROUND_COLORS[shape.kind];
+        context.fill();
+        if (shape.kind !== 'triangle') {
+            context.strokeStyle = BACKGROUND_COLORS.outline;
+            context.lineWidth = 1;
+            context.stroke();
+        }
+        context.restore();
+    }
+    
+    function drawPulse(pulse, time) {
+        const [, , , scale, opacity] = samplePath(BACKGROUND_PULSE_PATH, progressAt(pulse, time));
+        const radius = pulse.size / 2 * scale;
+        context.globalAlpha = opacity;
+        context.save();
+        context.translate(pulse.left * width + pulse.size / 2, pulse.top * height + pulse.size / 2);
+        context.scale(radius, radius);
+        context.fillStyle = glow;
+        context.fillRect(-1, -1, 2, 2);
+        context.restore();
     }
+    
+    function drawFrame(time) {
+        lastTime = time;
+        context.clearRect(0, 0, width, height);
+        for (let i = 0; i < pulses.length; i++) drawPulse(pulses[i], time);
+        for (let i = 0; i < shapes.length; i++) drawShape(shapes[i], time);
+        context.globalAlpha = 1;
+    }
+    
+    function tick(now) {
+        drawFrame(now - startTime);
+        frame = requestAnimationFrame(tick);
+    }
+    
+    return {
+        pointer: pointer,
+        resize: resize,
+        drawFrame: drawFrame,
+        start: function() {
+            if (frame) return;
+            if (!startTime) startTime = performance.now();
+            frame = requestAnimationFrame(tick);
+        },
+        stop: function() {
+            cancelAnimationFrame(frame);
+            frame = 0;
+        }
+    };
 }
 
-function createPulsingElements(container) {
-    // Create 5 pulsing background elements
-    for (let i = 0; i < 5; i++) {
-        const pulse = document.createElement('div');
-        pulse.className = 'pulse-element';
-        
-        // Random size between 50px and 150px
-        const size = Math.random() * 100 + 50;
-        pulse.style.width = size + 'px';
-        pulse.style.height = size + 'px';
-        
-        // Random position
-        pulse.style.left = Math.random() * 100 + '%';
-        pulse.style.top = Math.random() * 100 + '%';
-        
-        // Random animation delay
-        const delay = Math.random() * 8;
-        pulse.style.animationDelay = delay + 's';
-        
-        container.appendChild(pulse);
+// Scroll Scheduler: one passive scroll listener and at most one update per
+// frame. Every task's read() runs before any task's write(), so layout is
+// measured once per frame and never forced again by a style change.
+const scrollTasks = [];
+let scrollFrameRequested = false;
+
+function onScrollFrame(task) {
+    scrollTasks.push(task);
+    if (scrollTasks.length === 1) {
+        window.addEventListener('scroll', requestScrollFrame, { passive: true });
+        window.addEventListener('resize', requestScrollFrame, { passive: true });
     }
+    requestScrollFrame();
 }
 
-// Add interactive background effects
-function addInteractiveBackgroundEffects() {
-    const background = document.getElementById('animated-background');
-    if (!background) return;
-    
-    // Add mouse interaction for fun
-    document.addEventListener('mousemove', function(e) {
-        const shapes = background.querySelectorAll('.floating-shape');
-        const mouseX = e.clientX / window.innerWidth;
-        const mouseY = e.clientY / window.innerHeight;
-        
-        shapes.forEach((shape, index) => {
-            if (index % 3 === 0) { // Only affect every 3rd shape for performance
-                const offsetX = (mouseX - 0.5) * 20;
-                const offsetY = (mouseY - 0.5) * 20;
-                shape.style.transform += ` translate(${offsetX}px, ${offsetY}px)`;
-            }
-        });
-    });
+function requestScrollFrame() {
+    if (scrollFrameRequested) return;
+    scrollFrameRequested = true;
+    requestAnimationFrame(runScrollFrame);
+}
+
+function runScrollFrame() {
+    scrollFrameRequested = false;
+    const metrics = {
+        scrollTop: window.pageYOffset || document.documentElement.scrollTop,
+        viewportHeight: window.innerHeight,
+        documentHeight: document.body.scrollHeight
+    };
+    const values = scrollTasks.map(task => task.read ? task.read(metrics) : undefined);
+    scrollTasks.forEach((task, index) => task.write(values[index], metrics));
 }
 
 // Sticky Header Functionality
 function initializeStickyHeader() {
     const stickyHeader = document.getElementById('sticky-header');
     const mainHeader = document.querySelector('.main-header');
-    let lastScrollTop = 0;
+    if (!stickyHeader || !mainHeader) return;
     let headerVisible = false;
 
-    function updateStickyHeader() {
-        const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
-        const mainHeaderBottom = mainHeader.offsetTop + mainHeader.offsetHeight;
-        
-        // Show sticky header when scrolled past main header
-        if (scrollTop > mainHeaderBottom && !headerVisible) {
-            stickyHeader.classList.add('visible');
-            headerVisible = true;
-        } else if (scrollTop <= mainHeaderBottom && headerVisible) {
-            stickyHeader.classList.remove('visible');
-            headerVisible = false;
-        }
-        
-        lastScrollTop = scrollTop;
-    }
-
-    // Throttled scroll handler for performance
-    let ticking = false;
-    function handleScroll() {
-        if (!ticking) {
-            requestAnimationFrame(function() {
-                updateStickyHeader();
-                ticking = false;
-            });
-            ticking = true;
+    onScrollFrame({
+        read: function(metrics) {
+            // Show sticky header when scrolled past main header
+            return metrics.scrollTop > mainHeader.offsetTop + mainHeader.offsetHeight;
+        },
+        write: function(pastHeader) {
+            if (pastHeader !== headerVisible) {
+                stickyHeader.classList.toggle('visible', pastHeader);
+                headerVisible = pastHeader;
+            }
         }
-    }
-
-    window.addEventListener('scroll', handleScroll);
+    });
     
     // Smooth scroll to top functionality
     const logoLinks = document.querySelectorAll('.logo-link');
@@ -149,44 +301,52 @@ function initializeStickyHeader() {
 
 // Retro Effects and Animations
 function initializeRetroEffects() {
-    addPixelatedHoverEffects();
-    initializeRetroTableEffects();
+    const content = document.querySelector('.manual-content');
+    if (content) {
+        addPixelatedHoverEffects(content);
+        initializeRetroTableEffects(content);
+    }
     addRetroGlitchEffects();
 }
 
-// Pixelated hover effects for retro feel
-function addPixelatedHoverEffects() {
-    const headers = document.querySelectorAll('.manual-content h1, .manual-content h2, .manual-content h3');
+// Hover effects use one delegated listener pair on the content, however
+// long the manual is. mouseover/mouseout bubble; moves between children
+// of the same element are ignored.
+function delegateHover(container, selector, enter, leave) {
+    function target(e) {
+        const element = e.target.closest(selector);
+        if (!element || !container.contains(element)) return null;
+        return e.relatedTarget && element.contains(e.relatedTarget) ? null : element;
+    }
     
-    headers.forEach(header => {
-        header.addEventListener('mouseenter', function() {
-            this.style.textShadow = '2px 2px 0 #78BEBA, 4px 4px 0 #2069af';
-            this.style.transition = 'text-shadow 0.1s ease';
-        });
-        
-        header.addEventListener('mouseleave', function() {
-            this.style.textShadow = '1px 1px 0 #111111';
-        });
+    container.addEventListener('mouseover', function(e) {
+        const element = target(e);
+        if (element) enter(element);
+    });
+    
+    container.addEventListener('mouseout', function(e) {
+        const element = target(e);
+        if (element) leave(element);
+    });
+}
+
+// Pixelated hover effects for retro feel
+function addPixelatedHoverEffects(content) {
+    delegateHover(content, 'h1, h2, h3', function(header) {
+        header.style.textShadow = '2px 2px 0 #78BEBA, 4px 4px 0 #2069af';
+        header.style.transition = 'text-shadow 0.1s ease';
+    }, function(header) {
+        header.style.textShadow = '1px 1px 0 #111111';
     });
 }
 
 // Retro table effects
-function initializeRetroTableEffects() {
-    const tables = document.querySelectorAll('.manual-content table');
-    
-    tables.forEach(table => {
-        const rows = table.querySelectorAll('tr');
-        
-        rows.forEach(row => {
-            row.addEventListener('mouseenter', function() {
-                this.style.transform = 'translateX(2px)';
-                this.style.transition = 'transform 0.1s ease';
-            });
-            
-            row.addEventListener('mouseleave', function() {
-                this.style.transform = '';
-            });
-        });
+function initializeRetroTableEffects(content) {
+    delegateHover(content, 'table tr', function(row) {
+        row.style.transform = 'translateX(2px)';
+        row.style.transition = 'transform 0.1s ease';
+    }, function(row) {
+        row.style.transform = '';
     });
 }
 
@@ -240,24 +400,28 @@ function initializeScrollReveal() {
 // Retro-style progress bar
 function initializeRetroProgressBar() {
     const progressBar = document.createElement('div');
+    // Scaled rather than resized, so updating it never triggers layout
     progressBar.style.cssText = `
         position: fixed;
         top: 0;
         left: 0;
-        width: 0%;
+        width: 100%;
         height: 3px;
         background: linear-gradient(90deg, #78BEBA, #2069af, #E7B225, #D35233);
         z-index: 1001;
-        transition: width 0.1s ease;
+        transform: scaleX(0);
+        transform-origin: 0 0;
+        transition: transform 0.1s ease;
         image-rendering: pixelated;
     `;
     document.body.appendChild(progressBar);
     
-    window.addEventListener('scroll', function() {
-        const scrollTop = window.pageYOffset;
-        const docHeight = document.body.scrollHeight - window.innerHeight;
-        const scrollPercent = (scrollTop / docHeight) * 100;
-        progressBar.style.width = scrollPercent + '%';
+    onScrollFrame({
+        write: function(_, metrics) {
+            const scrollable = metrics.documentHeight - metrics.viewportHeight;
+            const progress = scrollable > 0 ? Math.min(metrics.scrollTop / scrollable, 1) : 0;
+            progressBar.style.transform = `scaleX(${progress})`;
+        }
     });
 }
 
@@ -292,6 +456,272 @@ function initializeRetroButtons() {
     });
 }
 
+// Client-side Diagrams: with --renderer client the build leaves an empty,
+// correctly sized <svg> per patch with its settings in data attributes.
+// The chassis is the shared sprite's <symbol>; only the knob and switch
+// indicators, values and title are drawn here, as each diagram nears the
+// viewport. The geometry comes from the sprite so it matches the SVG renderer.
+function initializeClientDiagrams() {
+    const pending = Array.from(document.querySelectorAll('svg.pedal-diagram-pending'));
+    const sprite = document.querySelector('.pedal-diagram-sprite[data-geometry]');
+    if (!pending.length || !sprite) return;
+    const geometry = JSON.parse(sprite.dataset.geometry);
+
+    function draw(svg) {
+        if (!svg.classList.contains('pedal-diagram-pending')) return;
+        svg.innerHTML = pedalDiagramMarkup(geometry, svg.dataset.patch,
+            svg.dataset.knobs.split(',').map(Number), svg.dataset.switches.split(',').map(Number));
+        svg.classList.remove('pedal-diagram-pending');
+    }
+
+    // Printing should not leave empty boxes
+    window.addEventListener('beforeprint', () => pending.forEach(draw), { once: true });
+
+    if (!('IntersectionObserver' in window)) {
+        pending.forEach(draw);
+        return;
+    }
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                draw(entry.target);
+            }
+        });
+    }, { rootMargin: '200px 0px' });
+    pending.forEach(svg => observer.observe(svg));
+}
+
+// Inner markup of one diagram; mirrors render_pedal_svg in build_manual.py
+function pedalDiagramMarkup(geometry, name, knobs, switches) {
+    const [minX, minY, width, height] = geometry.viewBox;
+    const colors = geometry.colors;
+    const path = [];
+    const values = [];
+
+    geometry.knobs.forEach(([x, y], i) => {
+        const angle = (knobs[i] * 270 - 135) * (Math.PI / 180);
+        const indicatorX = x + 12 * Math.sin(angle);
+        const indicatorY = y + 12 * Math.cos(angle);
+        path.push(`M${x} ${-y}L${svgNumber(indicatorX)} ${svgNumber(-indicatorY)}`);
+        values.push(svgText(x, y - 10, `${Math.trunc(knobs[i] * 100)}%`, geometry.valueSize, colors.value));
+    });
+    geometry.switches.forEach(([x, y], i) => {
+        const indicatorY = switches[i] < 0.33 ? y - 4 : switches[i] < 0.67 ? y : y + 4;
+        path.push(`M${x - 8} ${-indicatorY}H${x + 8}`);
+    });
+
+    return `<rect x="${minX}" y="${minY}" width="${width}" height="${height}" fill="${colors.background}"/>` +
+        '<use href="#eb-chassis"/>' +
+        svgText(0, 160, name, geometry.titleSize, colors.title) +
+        `<path d="${path.join('')}" stroke="${colors.indicator}" stroke-width="${geometry.stroke}" ` +
+        'stroke-linecap="square" fill="none"/>' +
+        values.join('');
+}
+
+function svgNumber(value) {
+    return String(Number(value.toFixed(2)));
+}
+
+function svgText(x, y, text, size, color) {
+    const escaped = String(text).replace(/[&<>"']/g, character => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'
+    })[character]);
+    return `<text x="${svgNumber(x)}" y="${svgNumber(-y)}" font-size="${size}" fill="${color}">${escaped}</text>`;
+}
+
+// Manual Search: the index is built with the page (see build_search_index in
+// build_manual.py). Terms are sorted, so a prefix is a binary search away
+// and only the postings of matching terms are decoded.
+const SEARCH_RESULT_LIMIT = 12;
+const SEARCH_KINDS = ['Section', 'Patch', 'Control'];
+
+function searchTerms(text) {
+    return text.toLowerCase().normalize('NFKD').replace(/\p{M}/gu, '').match(/[\p{L}\p{N}]+/gu) || [];
+}
+
+function createSearchIndex(data) {
+    return { docs: data.docs, terms: data.terms, postings: data.postings, decoded: new Map() };
+}
+
+// Index of the first term >= key
+function searchLowerBound(terms, key) {
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (terms[middle] < key) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+    return low;
+}
+
+function searchPostings(index, termIndex) {
+    let docs = index.decoded.get(termIndex);
+    if (!docs) {
+        const deltas = index.postings[termIndex];
+        docs = new Int32Array(deltas.length);
+        let doc = 0;
+        for (let i = 0; i < deltas.length; i++) {
+            docs[i] = doc += deltas[i];
+        }
+        index.decoded.set(termIndex, docs);
+    }
+    return docs;
+}
+
+// Documents containing every word of the query; the last word may be a prefix.
+// hits[doc] counts the words matched so far, so no sets are built or sorted.
+function searchManual(index, query, limit = SEARCH_RESULT_LIMIT) {
+    const words = searchTerms(query).slice(0, 255);
+    if (!words.length) return [];
+
+    const hits = new Uint8Array(index.docs.length);
+    for (let i = 0; i < words.length; i++) {
+        const word = words[i];
+        const isPrefix = i === words.length - 1;
+        let termIndex = searchLowerBound(index.terms, word);
+        let matched = false;
+        while (termIndex < index.terms.length &&
+               (isPrefix ? index.terms[termIndex].startsWith(word) : index.terms[termIndex] === word)) {
+            const docs = searchPostings(index, termIndex);
+            for (let j = 0; j < docs.length; j++) {
+                if (hits[docs[j]] === i) {
+                    hits[docs[j]] = i + 1;
+                    matched = true;
+                }
+            }
+            termIndex++;
+        }
+        if (!matched) return [];
+    }
+
+    // Sections first, then patches, then table rows, each in page order
+    const buckets = SEARCH_KINDS.map(() => []);
+    for (let doc = 0; doc < hits.length; doc++) {
+        if (hits[doc] === words.length) {
+            const bucket = buckets[index.docs[doc][0]];
+            if (bucket.length < limit) bucket.push(doc);
+        }
+    }
+    return [].concat(...buckets).slice(0, limit).map(doc => {
+        const [kind, title, anchor, context, parent] = index.docs[doc];
+        const section = parent >= 0 && index.docs[parent][1] !== title ? index.docs[parent][1] : '';
+        return { kind, title, anchor, context: [section, context].filter(Boolean).join(' · ') };
+    });
+}
+
+function initializeSearch() {
+    const container = document.getElementById('manual-search');
+    const source = document.getElementById('search-index');
+    if (!container || !source) return;
+    const input = document.getElementById('search-input');
+    const list = document.getElementById('search-results');
+    let loading = null;
+    let results = [];
+    let selected = -1;
+
+    // Parse (or fetch) the index on first use, not on page load
+    function loadIndex() {
+        if (!loading) {
+            const data = source.dataset.src
+                ? fetch(source.dataset.src).then(response => response.json())
+                : Promise.resolve(JSON.parse(source.textContent));
+            loading = data.then(createSearchIndex);
+        }
+        return loading;
+    }
+
+    function showResults(query) {
+        loadIndex().then(index => {
+            if (input.value !== query) return;
+            results = searchManual(index, query);
+            selected = results.length ? 0 : -1;
+            list.replaceChildren(...results.map((result, i) => {
+                const item = document.createElement('li');
+                item.setAttribute('role', 'option');
+                item.className = `search-result search-kind-${result.kind}`;
+                const link = document.createElement('a');
+                // Split manuals index anchors as '<page>#<id>'
+                link.href = result.anchor.includes('#') ? result.anchor : `#${result.anchor}`;
+                link.textContent = result.title;
+                const kind = document.createElement('span');
+                kind.className = 'search-result-kind';
+                kind.textContent = SEARCH_KINDS[result.kind];
+                link.prepend(kind);
+                if (result.context) {
+                    const context = document.createElement('small');
+                    context.textContent = result.context;
+                    link.appendChild(context);
+                }
+                item.appendChild(link);
+                item.addEventListener('mouseenter', () => select(i));
+                return item;
+            }));
+            list.hidden = !query.trim();
+            if (!results.length && query.trim()) {
+                const empty = document.createElement('li');
+                empty.className = 'search-empty';
+                empty.textContent = 'No matches';
+                list.appendChild(empty);
+            }
+            select(selected);
+        });
+    }
+
+    function select(i) {
+        selected = i;
+        Array.from(list.children).forEach((item, index) => {
+            item.setAttribute('aria-selected', index === i ? 'true' : 'false');
+        });
+    }
+
+    function close() {
+        list.hidden = true;
+        input.blur();
+    }
+
+    container.hidden = false;
+    input.addEventListener('focus', () => showResults(input.value));
+    input.addEventListener('input', () => showResults(input.value));
+    input.addEventListener('keydown', function(e) {
+        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+            e.preventDefault();
+            if (results.length) {
+                const step = e.key === 'ArrowDown' ? 1 : -1;
+                select((selected + step + results.length) % results.length);
+            }
+        } else if (e.key === 'Enter' && selected >= 0) {
+            e.preventDefault();
+            list.children[selected].querySelector('a').click();
+        } else if (e.key === 'Escape') {
+            input.value = '';
+            close();
+        }
+    });
+    list.addEventListener('click', function(e) {
+        if (e.target.closest('a')) close();
+    });
+    // Keep focus in the input so a click on a result is not lost to focusout
+    list.addEventListener('mousedown', e => e.preventDefault());
+    container.addEventListener('focusout', function(e) {
+        if (!container.contains(e.relatedTarget)) list.hidden = true;
+    });
+
+    // "/" focuses the search box from anywhere on the page
+    document.addEventListener('keydown', function(e) {
+        if (e.key === '/' && !e.ctrlKey && !e.metaKey && !e.altKey &&
+            !e.target.closest('input, textarea, [contenteditable]')) {
+            e.preventDefault();
+            input.focus();
+            input.select();
+        }
+    });
+}
+
 // Retro keyboard navigation
 document.addEventListener('keydown', function(e) {
     // Arrow key navigation for retro feel
@@ -359,6 +789,7 @@ console.log(`
 ║  Keyboard shortcuts:                 ║
 ║  Ctrl + ↑  : Scroll to top           ║
 ║  Ctrl + ↓  : Scroll to bottom        ║
+║  /         : Search the manual       ║
 ╚══════════════════════════════════════╝
 
 Built with ♥ by LUFS Audio
@@ -378,19 +809,14 @@ function debounce(func, wait) {
     };
 }
 
-// Optimized scroll handler
-const optimizedScrollHandler = debounce(function() {
-    // Additional scroll-based retro effects can go here
-}, 16); // ~60fps
-
-window.addEventListener('scroll', optimizedScrollHandler);
-
 document.addEventListener('DOMContentLoaded', function() {
     initializeStickyHeader();
     initializeRetroEffects();
     initializeScrollEffects();
     initializeRetroButtons();
     initializeAnimatedBackground();
+    initializeClientDiagrams();
+    initializeSearch();
     setCurrentYear();
 });
 
@@ -0,0 +1,22 @@
+"""
+Shared fixtures: a scratch copy of the manual's sources to build in
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+SOURCES = ["Echo-Bridge.md", "template.html", "styles.css", "favicon.svg", "script.js"]
+
+@pytest.fixture
+def manual_dir(tmp_path, monkeypatch):
+    """A directory holding the manual's sources and button files, made the cwd"""
+    for name in SOURCES:
+        shutil.copy(REPO_DIR / name, tmp_path / name)
+    for button_file in REPO_DIR.glob('*button*.html'):
+        shutil.copy(button_file, tmp_path / button_file.name)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,26 @@
+"""
+Regression tests for extract_button_content's early stop
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+
+def test_style_after_button_on_same_line(tmp_path):
+    button_file = tmp_path / "one-line-button.html"
+    button_file.write_text('<a class="webring-button">x</a><style>.a{}</style>', encoding='utf-8')
+    button_html, button_styles = build_manual.extract_button_content(button_file)
+    assert button_html == '<a class="webring-button">x</a>'
+    assert button_styles == "\n/* Styles from one-line-button.html */\n.a{}"
+
+def test_every_style_block_is_kept(tmp_path):
+    button_file = tmp_path / "multi-button.html"
+    button_file.write_text('<style>.z{}</style>\n'
+                           '<a class="webring-button">x</a><style>.a{}</style><STYLE>.b{}</STYLE>\n'
+                           '<p>tail</p>', encoding='utf-8')
+    _, button_styles = build_manual.extract_button_content(button_file)
+    header = "\n/* Styles from multi-button.html */\n"
+    assert button_styles == f"{header}.z{{}}{header}.a{{}}{header}.b{{}}"
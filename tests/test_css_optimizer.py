@@ -0,0 +1,68 @@
+"""
+Tests for the CSS parse, prune and minify stage
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from build_manual import DocumentNames, critical_css, optimize_css, parse_css, serialize_css
+
+PAGE = """<html><body>
+<div class="manual-content" id="top"><p>Text</p><a class="button" href="#top">Top</a></div>
+<script>element.classList.add('is-open'); element.style.animation = 'spin 1s';</script>
+</body></html>"""
+
+def document_names(page=PAGE):
+    document = DocumentNames()
+    document.feed(page)
+    return document
+
+def test_parse_css_nodes():
+    nodes, _ = parse_css('@import "a.css"; a { color: red } @media (min-width: 1px) { p { margin: 0 } }'
+                         '@keyframes fade { from { opacity: 0 } to { opacity: 1 } }')
+    assert [node[0] for node in nodes] == ['statement', 'rule', 'group', 'keyframes']
+    assert nodes[2][2] == [('rule', 'p', ' margin: 0 ')]
+    assert nodes[3][2] == 'fade'
+
+def test_serialize_minifies():
+    nodes, _ = parse_css('div  >  p ,\n a:hover { color : red ;  margin: 0 auto  !important; }')
+    assert serialize_css(nodes) == 'div>p,a:hover{color:red;margin:0 auto!important}'
+
+def test_braces_inside_strings_do_not_end_rules():
+    nodes, _ = parse_css('a::after { content: "}" } p { color: blue }')
+    assert serialize_css(nodes) == 'a::after{content:"}"}p{color:blue}'
+
+def test_selector_may_match():
+    document = document_names()
+    assert document.selector_may_match('.manual-content > p')
+    assert document.selector_may_match('#top a.button:hover')
+    assert document.selector_may_match('.is-open')
+    assert document.selector_may_match('a[href^="#"]::before')
+    assert not document.selector_may_match('.sidebar')
+    assert not document.selector_may_match('table td')
+    assert not document.selector_may_match('#missing')
+
+def test_optimize_prunes_and_deduplicates():
+    css = [
+        '/* base */ p { color: red } .sidebar { width: 10px } p { color: red }',
+        '@media print { .sidebar { display: none } } p, .gone { margin: 0 }',
+    ]
+    nodes, stats = optimize_css(css, document_names())
+    assert serialize_css(nodes) == 'p{color:red}p{margin:0}'
+    assert stats == {'keyframes': 0, 'rules': 1, 'selectors': 3}
+
+def test_optimize_merges_and_drops_keyframes():
+    css = ['@keyframes pulse { to { opacity: 0 } } @keyframes blink { to { opacity: 0 } }'
+           '@keyframes unused { to { color: red } } @keyframes spin { to { transform: rotate(1turn) } }'
+           'p { animation: blink 1s infinite }']
+    nodes, stats = optimize_css(css, document_names())
+    assert serialize_css(nodes) == ('@keyframes pulse{to{opacity:0}}@keyframes spin{to{transform:rotate(1turn)}}'
+                                    'p{animation:pulse 1s infinite}')
+    assert stats['keyframes'] == 2
+
+def test_critical_css_keeps_only_matching_rules():
+    nodes, _ = parse_css('.manual-content { color: red } .button { color: blue }')
+    top = document_names('<div class="manual-content"></div>')
+    assert serialize_css(critical_css(nodes, top)) == '.manual-content{color:red}'
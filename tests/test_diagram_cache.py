@@ -0,0 +1,74 @@
+"""
+Tests for DiagramCache keying, eviction and derived entries
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+from build_manual import DiagramCache
+
+SETTINGS = [0.5, 0.25, 1, 0, 0.75, 0.1, 0.2, 0.5, 0.9]
+
+def test_key_depends_on_settings_name_and_renderer():
+    key = DiagramCache.key(SETTINGS, "Hall")
+    assert key == DiagramCache.key([float(value) for value in SETTINGS], "Hall")
+    assert key != DiagramCache.key(SETTINGS[:-1] + [0.8], "Hall")
+    assert key != DiagramCache.key(SETTINGS, "Plate")
+    assert key != DiagramCache.key(SETTINGS, "Hall", renderer='agg')
+
+def test_derived_key_depends_on_source_and_transform():
+    key = DiagramCache.derived_key(b'png bytes', 'quantize-64')
+    assert key != DiagramCache.derived_key(b'other bytes', 'quantize-64')
+    assert key != DiagramCache.derived_key(b'png bytes', 'webp-lossless')
+
+def test_put_get_counts_hits_and_misses(tmp_path):
+    cache = DiagramCache(tmp_path)
+    key = DiagramCache.key(SETTINGS, "Hall")
+    assert cache.get(key) is None
+    cache.put(key, b'data')
+    assert cache.get(key) == b'data'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [path.name for path in tmp_path.iterdir()] == [f"{key}.png"]
+
+def test_derived_entries_use_their_format_suffix(tmp_path):
+    cache = DiagramCache(tmp_path)
+    key = DiagramCache.derived_key(b'png bytes', 'webp-lossless')
+    cache.put(key, b'webp', 'webp')
+    assert cache.get(key, 'webp') == b'webp'
+    assert cache.get(key) is None
+    assert (tmp_path / f"{key}.webp").exists()
+
+    cache.clear()
+    assert list(tmp_path.iterdir()) == []
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = DiagramCache(tmp_path, max_age=60)
+    cache.put('old', b'data')
+    old = time.time() - 120
+    os.utime(tmp_path / 'old.png', (old, old))
+    assert cache.get('old') is None
+    assert not (tmp_path / 'old.png').exists()
+
+def test_prune_evicts_least_recently_used_first(tmp_path):
+    cache = DiagramCache(tmp_path, max_bytes=25)
+    now = time.time()
+    for age, (key, suffix) in enumerate([('c', 'png'), ('b', 'webp'), ('a', 'png')]):
+        cache.put(key, b'x' * 10, suffix)
+        os.utime(tmp_path / f"{key}.{suffix}", (now - age * 10, now - age * 10))
+    cache.prune()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['b.webp', 'c.png']
+
+def test_read_only_cache_still_serves_hits(tmp_path, monkeypatch):
+    cache = DiagramCache(tmp_path)
+    cache.put('key', b'data')
+
+    def refuse(*args, **kwargs):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(build_manual.os, 'utime', refuse)
+    assert cache.get('key') == b'data'
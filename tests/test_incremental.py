@@ -0,0 +1,35 @@
+"""
+Tests for incremental builds: same bytes as --force, no rewrite when nothing changed
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+
+def build(output_file="index.html", **options):
+    # Each build reads stage outputs back from disk, like a separate run would
+    build_manual.BuildManifest._memory.clear()
+    return build_manual.build_manual(output_file=output_file, renderer='svg', use_cache=False, **options)
+
+def test_noop_rebuild_does_not_rewrite(manual_dir):
+    assert build(search='inline')
+    output = manual_dir / "index.html"
+    os.utime(output, ns=(0, 0))
+    assert build(search='inline')
+    assert output.stat().st_mtime_ns == 0
+
+def test_incremental_matches_force_after_edits(manual_dir):
+    markdown = manual_dir / "Echo-Bridge.md"
+    original = markdown.read_text(encoding='utf-8')
+    assert build(search='inline')
+    markdown.write_text(original + "\n## Added\n\nMore text.\n", encoding='utf-8')
+    assert build(search='inline')
+    markdown.write_text(original, encoding='utf-8')
+    assert build(search='inline')
+    assert build(search='inline')
+    assert build("forced.html", search='inline', incremental=False)
+    assert (manual_dir / "index.html").read_bytes() == (manual_dir / "forced.html").read_bytes()
@@ -0,0 +1,69 @@
+"""
+Tests for per-section Markdown conversion and its memo
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+
+pytest.importorskip('markdown')
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+DOCUMENT = """# Manual
+
+Intro with a [link][ref].
+
+## Controls
+
+| Knob | Use |
+|------|-----|
+| Mix  | Wet |
+
+## Controls
+
+```
+## not a heading
+```
+
+<div class="note">
+
+## inside a div
+
+</div>
+
+[ref]: https://example.com
+"""
+
+def whole_document(markdown_content):
+    return build_manual.markdown_converter().convert(markdown_content)
+
+@pytest.mark.parametrize('markdown_content', [
+    DOCUMENT,
+    (REPO_DIR / "Echo-Bridge.md").read_text(encoding='utf-8'),
+])
+def test_sections_match_whole_document(markdown_content):
+    assert build_manual.convert_markdown_to_html(markdown_content) == whole_document(markdown_content)
+
+def test_split_skips_fences_and_divs():
+    sections = build_manual.split_markdown_sections(DOCUMENT)
+    assert [section.split('\n', 1)[0] for section in sections] == ["# Manual", "## Controls", "## Controls"]
+
+def test_memo_reuses_unchanged_sections(monkeypatch):
+    section_cache = {}
+    build_manual.convert_markdown_to_html(DOCUMENT, section_cache)
+    converted = []
+    convert_section = build_manual._convert_section
+    monkeypatch.setattr(build_manual, '_convert_section',
+                        lambda section: converted.append(section) or convert_section(section))
+
+    edited = DOCUMENT.replace("Intro with", "Introduction with")
+    html_content = build_manual.convert_markdown_to_html(edited, section_cache)
+    assert len(converted) == 1 and converted[0].startswith("# Manual")
+    assert html_content == whole_document(edited)
+    assert len(section_cache) == len(build_manual.split_markdown_sections(edited))
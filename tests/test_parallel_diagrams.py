@@ -0,0 +1,21 @@
+"""
+Tests that rendering diagrams in parallel gives the same page as serially
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+
+@pytest.mark.parametrize('renderer', ['svg', 'png'])
+def test_jobs_match_serial(manual_dir, renderer):
+    if renderer == 'png':
+        pytest.importorskip('matplotlib')
+    for jobs, output_file in ((1, "serial.html"), (4, "parallel.html")):
+        assert build_manual.build_manual(output_file=output_file, jobs=jobs, renderer=renderer,
+                                         use_cache=False, incremental=False)
+    assert (manual_dir / "serial.html").read_bytes() == (manual_dir / "parallel.html").read_bytes()
@@ -0,0 +1,86 @@
+"""
+Tests for the build-time search index
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+from build_manual import SEARCH_HEADING, SEARCH_PATCH, SEARCH_ROW, build_search_index
+
+HTML = """<h2 id="controls">Controls</h2>
+<table><thead><tr><th>Knob</th><th>Use</th></tr></thead>
+<tbody><tr><td>Mix</td><td>Wet &amp; dry balance</td></tr>
+<tr><td>Décay</td><td>Tail length</td></tr></tbody></table>
+<h2>Patches</h2>
+<h3>Hall</h3>
+<div class="pedal-diagram-container"><svg></svg></div>"""
+
+def decode_postings(index):
+    """term -> doc numbers, undoing the delta encoding"""
+    result = {}
+    for term, deltas in zip(index['terms'], index['postings']):
+        docs, total = [], 0
+        for delta in deltas:
+            total += delta
+            docs.append(total)
+        result[term] = docs
+    return result
+
+def test_entries_and_anchors():
+    html_content, index = build_search_index(HTML, ["Big Hall"])
+    assert index['docs'] == [
+        [SEARCH_HEADING, "Controls", "controls", "", -1],
+        [SEARCH_ROW, "Mix", "controls-row-1", "Wet & dry balance", 0],
+        [SEARCH_ROW, "Décay", "controls-row-2", "Tail length", 0],
+        [SEARCH_HEADING, "Patches", "patches", "", -1],
+        [SEARCH_HEADING, "Hall", "hall", "", 3],
+        [SEARCH_PATCH, "Big Hall", "big-hall-diagram", "", 4],
+    ]
+    assert '<tr id="controls-row-1"><td>Mix</td>' in html_content
+    assert '<tr><th>Knob</th>' in html_content
+    assert '<h2 id="patches">Patches</h2>' in html_content
+    assert '<div class="pedal-diagram-container" id="big-hall-diagram">' in html_content
+
+def test_postings_are_sorted_and_delta_encoded():
+    _, index = build_search_index(HTML, ["Big Hall"])
+    assert index['terms'] == sorted(index['terms'])
+    postings = decode_postings(index)
+    assert postings['hall'] == [4, 5]
+    assert postings['wet'] == [1]
+    assert postings['decay'] == [2]
+    for docs in postings.values():
+        assert docs == sorted(set(docs))
+
+def test_every_posting_is_a_term_of_its_entry():
+    _, index = build_search_index(HTML, ["Big Hall"])
+    for term, docs in decode_postings(index).items():
+        for doc in docs:
+            kind, title, anchor, context, parent = index['docs'][doc]
+            assert term in build_manual.search_terms(f"{title} {context}")
+
+def test_existing_ids_are_not_reused():
+    html_content, index = build_search_index('<h2 id="hall">Hall</h2><h3>Hall</h3>')
+    assert [doc[2] for doc in index['docs']] == ['hall', 'hall_1']
+    assert '<h3 id="hall_1">Hall</h3>' in html_content
+
+def test_search_terms_fold_case_and_accents():
+    assert build_manual.search_terms("Décay TIME, pre-delay") == ['decay', 'time', 'pre', 'delay']
+
+def test_index_html_is_stable_and_escaped():
+    index = {'terms': ['a'], 'postings': [[0]], 'docs': [[0, "</script>", "a", "", -1]]}
+    reordered = {'docs': index['docs'], 'postings': index['postings'], 'terms': index['terms']}
+    markup = build_manual.search_index_html(index, 'inline', None)
+    assert markup == build_manual.search_index_html(reordered, 'inline', None)
+    assert '</script>"' not in markup
+    payload = markup.split('id="search-index">', 1)[1].rsplit('</script>', 1)[0]
+    assert json.loads(payload.replace('<\\/', '</')) == index
+
+def test_file_mode_writes_the_index(tmp_path):
+    index = {'terms': [], 'postings': [], 'docs': []}
+    markup = build_manual.search_index_html(index, 'file', tmp_path / "index.html")
+    assert 'data-src="index.search.json"' in markup
+    assert json.loads((tmp_path / "index.search.json").read_text(encoding='utf-8')) == index
@@ -0,0 +1,19 @@
+"""
+Tests that the streaming writer produces the same file as a normal write
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import build_manual
+
+@pytest.mark.parametrize('assets_dir', [None, 'assets'])
+def test_stream_matches_write(manual_dir, assets_dir):
+    for stream, output_file in ((False, "written.html"), (True, "streamed.html")):
+        assert build_manual.build_manual(output_file=output_file, stream=stream, renderer='svg',
+                                         assets_dir=assets_dir, use_cache=False, incremental=False)
+    assert (manual_dir / "written.html").read_bytes() == (manual_dir / "streamed.html").read_bytes()
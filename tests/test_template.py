@@ -0,0 +1,58 @@
+"""
+Tests for CompiledTemplate slot rendering
+"""
+
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from build_manual import CompiledTemplate
+
+TEMPLATE = """<html>
+<head>
+    <title>{{TITLE}}</title>
+</head>
+<body>
+    {{MARKDOWN_CONTENT}}
+    {{SEARCH_INDEX}}
+    <script src="script.js"></script>
+</body>
+</html>"""
+
+def test_render_matches_str_replace():
+    template = CompiledTemplate.compile(TEMPLATE)
+    values = {'TITLE': "Manual", 'MARKDOWN_CONTENT': "<p>{{TITLE}}</p>", 'HEAD_INJECTION': "<style></style>"}
+    expected = (TEMPLATE.replace('{{TITLE}}', "Manual")
+                .replace('{{MARKDOWN_CONTENT}}', "<p>{{TITLE}}</p>")
+                .replace('</head>', "<style></style></head>"))
+    assert template.render(values) == expected
+
+def test_unfilled_slots_stay_as_written():
+    template = CompiledTemplate.compile(TEMPLATE)
+    assert template.render({}) == TEMPLATE
+
+def test_empty_line_slot_leaves_no_blank_line():
+    template = CompiledTemplate.compile(TEMPLATE)
+    page = template.render({'SEARCH_INDEX': ''})
+    assert "    {{MARKDOWN_CONTENT}}\n    <script" in page
+
+def test_line_slot_value_replaces_the_whole_line():
+    template = CompiledTemplate.compile(TEMPLATE)
+    page = template.render({'SEARCH_INDEX': "    <div></div>\n"})
+    assert "    {{MARKDOWN_CONTENT}}\n    <div></div>\n    <script" in page
+
+def test_bind_then_render_equals_one_pass():
+    template = CompiledTemplate.compile(TEMPLATE)
+    values = {'TITLE': "Manual", 'MARKDOWN_CONTENT': "<p>text</p>", 'SEARCH_INDEX': ''}
+    bound = template.bind(TITLE="Manual", HEAD_INJECTION="")
+    assert bound.slots == ['MARKDOWN_CONTENT', 'SEARCH_INDEX']
+    assert bound.render(values) == template.render(dict(values, HEAD_INJECTION=""))
+
+def test_write_to_streams_the_rendered_page():
+    template = CompiledTemplate.compile(TEMPLATE)
+    values = {'TITLE': "Manual", 'MARKDOWN_CONTENT': "<p>text</p>", 'SEARCH_INDEX': ''}
+    stream = io.StringIO()
+    template.write_to(stream, values)
+    assert stream.getvalue() == template.render(values)